@@ -0,0 +1,60 @@
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine, pool
+from sqlmodel import SQLModel
+
+import app.models  # noqa: F401  注册全部表到 SQLModel.metadata
+from app.core.config import settings
+from app.services.alarm_partitions import is_alarm_partition
+
+config = context.config
+
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = SQLModel.metadata
+
+
+def _include_name(name, type_, parent_names) -> bool:
+    # alarm_events 的按月分区由 app/services/alarm_partitions.py 在运行时创建，不在模型中声明
+    return not (type_ == "table" and is_alarm_partition(name))
+
+
+def _configure(**kwargs) -> None:
+    context.configure(
+        target_metadata=target_metadata,
+        # 列类型变化也要生成迁移（autogenerate 默认比较类型，显式写出以免误关）
+        compare_type=True,
+        include_name=_include_name,
+        **kwargs,
+    )
+
+
+def run_migrations_offline() -> None:
+    """--sql 模式：只输出 SQL，不连接数据库"""
+    _configure(url=settings.DATABASE_URL, literal_binds=True, dialect_opts={"paramstyle": "named"})
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    # init_db / 检查脚本可通过 config.attributes["connection"] 传入已有连接
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _configure(connection=connection)
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
+    engine = create_engine(settings.DATABASE_URL, poolclass=pool.NullPool)
+    with engine.connect() as connection:
+        _configure(connection=connection)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
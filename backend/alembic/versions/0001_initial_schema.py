@@ -0,0 +1,126 @@
+"""初始表结构
+
+与最初由 create_all 建出的结构一致（报警差异匹配 / 绝对时间 / 处理状态 / 聚合表等
+后续新增的结构见 0001a）；已由 create_all 建好表的数据库，init_db 会直接将其标记（stamp）
+为本版本，再升级到最新。
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 00:36:44.457457
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel  # noqa: F401  自动生成的列类型可能引用 sqlmodel.sql.sqltypes
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('username', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('password_hash', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_users_username'), 'users', ['username'], unique=True)
+    op.create_table('video_sources',
+    sa.Column('video_id', sa.Uuid(), nullable=False),
+    sa.Column('file_name', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('file_path', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('duration', sa.Float(), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=False),
+    sa.Column('upload_time', sa.DateTime(), nullable=False),
+    sa.Column('ext', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('size', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('is_demo', sa.Boolean(), nullable=False),
+    sa.Column('analysis_status', sa.Enum('PENDING', 'PROCESSING', 'COMPLETED', 'FAILED', name='analysisstatus', native_enum=False), nullable=True),
+    sa.Column('raw_tracks_path', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('analysis_json_path', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.PrimaryKeyConstraint('video_id')
+    )
+    op.create_index(op.f('ix_video_sources_file_name'), 'video_sources', ['file_name'], unique=False)
+    op.create_index(op.f('ix_video_sources_is_active'), 'video_sources', ['is_active'], unique=False)
+    op.create_index(op.f('ix_video_sources_is_demo'), 'video_sources', ['is_demo'], unique=False)
+    op.create_index(op.f('ix_video_sources_upload_time'), 'video_sources', ['upload_time'], unique=False)
+    op.create_index(op.f('ix_video_sources_video_id'), 'video_sources', ['video_id'], unique=False)
+    op.create_table('alarm_events',
+    sa.Column('event_id', sa.Uuid(), nullable=False),
+    sa.Column('video_id', sa.Uuid(), nullable=False),
+    sa.Column('video_timestamp', sa.Float(), nullable=False),
+    sa.Column('object_type', sa.Enum('PERSON', 'VEHICLE', name='objecttype'), nullable=False),
+    sa.Column('threat_level', sa.Enum('CRITICAL', 'WARNING', name='threatlevel'), nullable=False),
+    sa.Column('snapshot_path', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('is_read', sa.Boolean(), nullable=False),
+    sa.ForeignKeyConstraint(['video_id'], ['video_sources.video_id'], ),
+    sa.PrimaryKeyConstraint('event_id')
+    )
+    op.create_index(op.f('ix_alarm_events_event_id'), 'alarm_events', ['event_id'], unique=False)
+    op.create_index(op.f('ix_alarm_events_is_read'), 'alarm_events', ['is_read'], unique=False)
+    op.create_index(op.f('ix_alarm_events_video_id'), 'alarm_events', ['video_id'], unique=False)
+    op.create_table('system_settings',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('current_source_id', sa.Uuid(), nullable=True),
+    sa.Column('online', sa.Boolean(), nullable=False),
+    sa.Column('fps', sa.Integer(), nullable=False),
+    sa.Column('version', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.ForeignKeyConstraint(['current_source_id'], ['video_sources.video_id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_system_settings_current_source_id'), 'system_settings', ['current_source_id'], unique=False)
+    op.create_table('zone_configs',
+    sa.Column('zone_id', sa.Uuid(), nullable=False),
+    sa.Column('video_id', sa.Uuid(), nullable=False),
+    sa.Column('zone_type', sa.Enum('WARNING_ZONE', 'CORE_ZONE', name='zonetype'), nullable=False),
+    sa.Column('coordinates', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.ForeignKeyConstraint(['video_id'], ['video_sources.video_id'], ),
+    sa.PrimaryKeyConstraint('zone_id')
+    )
+    op.create_index(op.f('ix_zone_configs_video_id'), 'zone_configs', ['video_id'], unique=False)
+    op.create_index(op.f('ix_zone_configs_zone_id'), 'zone_configs', ['zone_id'], unique=False)
+    op.create_table('zones',
+    sa.Column('id', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('source_id', sa.Uuid(), nullable=False),
+    sa.Column('name', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('type', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('threshold', sa.Float(), nullable=False),
+    sa.Column('motion', sa.Boolean(), nullable=False),
+    sa.Column('polygon_points', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.ForeignKeyConstraint(['source_id'], ['video_sources.video_id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_zones_id'), 'zones', ['id'], unique=False)
+    op.create_index(op.f('ix_zones_source_id'), 'zones', ['source_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_zones_source_id'), table_name='zones')
+    op.drop_index(op.f('ix_zones_id'), table_name='zones')
+    op.drop_table('zones')
+    op.drop_index(op.f('ix_zone_configs_zone_id'), table_name='zone_configs')
+    op.drop_index(op.f('ix_zone_configs_video_id'), table_name='zone_configs')
+    op.drop_table('zone_configs')
+    op.drop_index(op.f('ix_system_settings_current_source_id'), table_name='system_settings')
+    op.drop_table('system_settings')
+    op.drop_index(op.f('ix_alarm_events_video_id'), table_name='alarm_events')
+    op.drop_index(op.f('ix_alarm_events_is_read'), table_name='alarm_events')
+    op.drop_index(op.f('ix_alarm_events_event_id'), table_name='alarm_events')
+    op.drop_table('alarm_events')
+    op.drop_index(op.f('ix_video_sources_video_id'), table_name='video_sources')
+    op.drop_index(op.f('ix_video_sources_upload_time'), table_name='video_sources')
+    op.drop_index(op.f('ix_video_sources_is_demo'), table_name='video_sources')
+    op.drop_index(op.f('ix_video_sources_is_active'), table_name='video_sources')
+    op.drop_index(op.f('ix_video_sources_file_name'), table_name='video_sources')
+    op.drop_table('video_sources')
+    op.drop_index(op.f('ix_users_username'), table_name='users')
+    op.drop_table('users')
+    # drop_table 不会删除 PostgreSQL 原生枚举类型
+    for enum_name in ('zonetype', 'threatlevel', 'objecttype'):
+        op.execute(f'DROP TYPE IF EXISTS {enum_name}')
@@ -0,0 +1,118 @@
+"""报警差异匹配 / 绝对时间 / 处理状态列、alarm_rollups、缩略图雪碧图路径
+
+这些结构在引入迁移之前由 create_all 建表的版本中陆续加入，最初建出的库（0001）没有：
+- alarm_events：track_id / zone_id / match_key（重算报警时差异匹配）、occurred_at（绝对时间，
+  按 视频上传时间 + video_timestamp 回填后设为 NOT NULL）、is_acked / acked_at（处理状态）
+  以及对应索引；match_key 按 app/services/alarm_store.py 的 alarm_match_key 回填
+  （只回填为空的行，已有的值保留）
+- alarm_rollups：小时聚合表；已有报警的库由启动时的 ensure_alarm_rollups 全量重建
+- video_sources.sprite_index_path
+
+旧库可能停在这些结构陆续加入过程中的任一状态，已存在的列 / 索引 / 表跳过。
+
+Revision ID: 0001a
+Revises: 0001
+Create Date: 2026-10-19 02:10:31.508214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel  # noqa: F401  自动生成的列类型可能引用 sqlmodel.sql.sqltypes
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '0001a'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _alarm_columns():
+    """alarm_events 新增的列；occurred_at 先建为可空，回填后再设为 NOT NULL"""
+    return (
+        sa.Column('occurred_at', sa.DateTime(), nullable=True),
+        sa.Column('track_id', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('zone_id', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('match_key', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('is_acked', sa.Boolean(), server_default=sa.false(), nullable=False),
+        sa.Column('acked_at', sa.DateTime(), nullable=True),
+    )
+
+
+# (名称, 列)
+_ALARM_INDEXES = (
+    ('ix_alarm_events_is_acked', ['is_acked']),
+    ('ix_alarm_events_occurred_event', ['occurred_at', 'event_id']),
+    ('ix_alarm_events_video_level_occurred', ['video_id', 'threat_level', 'occurred_at']),
+)
+
+
+def upgrade() -> None:
+    # 引入迁移之前各版本的 create_all 只会建出缺失的表、不会给已有表加列，旧库可能停在
+    # 上述结构的任意中间状态（如已有 track_id 却没有 occurred_at），因此逐项检查后再补齐
+    inspector = sa.inspect(op.get_bind())
+    video_columns = {c['name'] for c in inspector.get_columns('video_sources')}
+    alarm_columns = {c['name'] for c in inspector.get_columns('alarm_events')}
+    alarm_indexes = {i['name'] for i in inspector.get_indexes('alarm_events')}
+
+    if 'sprite_index_path' not in video_columns:
+        op.add_column('video_sources', sa.Column('sprite_index_path', sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+
+    for column in _alarm_columns():
+        if column.name not in alarm_columns:
+            op.add_column('alarm_events', column)
+    if 'is_acked' not in alarm_columns:
+        # 默认值只用于填充已有行，模型中没有 server_default
+        op.alter_column('alarm_events', 'is_acked', server_default=None)
+
+    op.execute(
+        """
+        UPDATE alarm_events AS a
+        SET occurred_at = v.upload_time + a.video_timestamp * interval '1 second'
+        FROM video_sources AS v
+        WHERE v.video_id = a.video_id AND a.occurred_at IS NULL
+        """
+    )
+    op.alter_column('alarm_events', 'occurred_at', nullable=False)
+    # 没有 track_id / zone_id 的旧记录，键中对应部分为空串（与 alarm_match_key 一致）
+    op.execute(
+        sa.text(
+            """
+            UPDATE alarm_events
+            SET match_key = coalesce(track_id, '') || '|' || coalesce(zone_id, '') || '|' || threat_level::text
+            WHERE match_key IS NULL
+            """
+        )
+    )
+
+    # 按 video_timestamp 排序时期的索引，已被 (occurred_at, event_id) 取代
+    if 'ix_alarm_events_ts_event' in alarm_indexes:
+        op.drop_index('ix_alarm_events_ts_event', table_name='alarm_events')
+    for name, columns in _ALARM_INDEXES:
+        if name not in alarm_indexes:
+            op.create_index(name, 'alarm_events', columns, unique=False)
+
+    if not inspector.has_table('alarm_rollups'):
+        op.create_table('alarm_rollups',
+        sa.Column('bucket_start', sa.DateTime(), nullable=False),
+        sa.Column('video_id', sa.Uuid(), nullable=False),
+        sa.Column('zone_id', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        # 枚举类型已随 alarm_events 创建
+        sa.Column('threat_level', postgresql.ENUM('CRITICAL', 'WARNING', name='threatlevel', create_type=False), nullable=False),
+        sa.Column('object_type', postgresql.ENUM('PERSON', 'VEHICLE', name='objecttype', create_type=False), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['video_id'], ['video_sources.video_id'], ),
+        sa.PrimaryKeyConstraint('bucket_start', 'video_id', 'zone_id', 'threat_level', 'object_type')
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('alarm_rollups')
+    op.drop_index('ix_alarm_events_video_level_occurred', table_name='alarm_events')
+    op.drop_index('ix_alarm_events_occurred_event', table_name='alarm_events')
+    op.drop_index(op.f('ix_alarm_events_is_acked'), table_name='alarm_events')
+    for column in ('acked_at', 'is_acked', 'match_key', 'zone_id', 'track_id', 'occurred_at'):
+        op.drop_column('alarm_events', column)
+    op.drop_column('video_sources', 'sprite_index_path')
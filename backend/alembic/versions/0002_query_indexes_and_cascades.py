@@ -0,0 +1,110 @@
+"""按查询形态重建索引，外键加 ON DELETE
+
+alarm_events：
+- 去掉与主键重复的 event_id 索引，以及区分度低的 is_read / is_acked 单列索引
+- 等值过滤列 + (occurred_at, event_id) 的组合索引，覆盖 /alarms 列表的 视频 / 视频+等级 / 等级 过滤
+  （video_id 单列索引被 (video_id, occurred_at, event_id) 取代）
+- 未读 / 未处理的部分索引：未读计数与批量标记 UPDATE 只扫描少量行
+- 大表上的索引用 CREATE INDEX CONCURRENTLY 创建，不阻塞报警写入
+
+其他表：去掉与主键重复的索引、ILIKE '%…%' 用不上的 file_name 索引、布尔列与单行表上的索引；
+alarm_rollups 增加 (video_id, bucket_start)。
+
+外键：删除视频时级联删除报警 / 聚合 / 防区，system_settings.current_source_id 置空。
+
+Revision ID: 0002
+Revises: 0001a
+Create Date: 2026-10-19 00:37:48.601757
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel  # noqa: F401  自动生成的列类型可能引用 sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (表, 列, 引用列, 新的 ON DELETE 行为)；约束名沿用 PostgreSQL 默认命名
+_FOREIGN_KEYS = (
+    ('alarm_events', 'video_id', 'video_id', 'CASCADE'),
+    ('alarm_rollups', 'video_id', 'video_id', 'CASCADE'),
+    ('zones', 'source_id', 'video_id', 'CASCADE'),
+    ('zone_configs', 'video_id', 'video_id', 'CASCADE'),
+    ('system_settings', 'current_source_id', 'video_id', 'SET NULL'),
+)
+
+# alarm_events 新增索引：(名称, 列, 部分索引条件)
+_ALARM_INDEXES = (
+    ('ix_alarm_events_video_occurred', ['video_id', 'occurred_at', 'event_id'], None),
+    ('ix_alarm_events_video_level_occurred', ['video_id', 'threat_level', 'occurred_at', 'event_id'], None),
+    ('ix_alarm_events_level_occurred', ['threat_level', 'occurred_at', 'event_id'], None),
+    ('ix_alarm_events_unread', ['occurred_at'], 'NOT is_read'),
+    ('ix_alarm_events_unacked', ['occurred_at'], 'NOT is_acked'),
+)
+
+
+def _replace_foreign_keys(with_ondelete: bool) -> None:
+    for table, column, ref_column, ondelete in _FOREIGN_KEYS:
+        name = f'{table}_{column}_fkey'
+        op.drop_constraint(name, table, type_='foreignkey')
+        op.create_foreign_key(
+            name, table, 'video_sources', [column], [ref_column], ondelete=ondelete if with_ondelete else None
+        )
+
+
+def upgrade() -> None:
+    op.drop_index('ix_alarm_events_event_id', table_name='alarm_events')
+    op.drop_index('ix_alarm_events_is_read', table_name='alarm_events')
+    op.drop_index('ix_alarm_events_is_acked', table_name='alarm_events')
+    op.drop_index('ix_alarm_events_video_level_occurred', table_name='alarm_events')
+
+    op.create_index('ix_alarm_rollups_video_bucket', 'alarm_rollups', ['video_id', 'bucket_start'], unique=False)
+    op.drop_index('ix_system_settings_current_source_id', table_name='system_settings')
+    op.drop_index('ix_video_sources_video_id', table_name='video_sources')
+    op.drop_index('ix_video_sources_file_name', table_name='video_sources')
+    op.drop_index('ix_video_sources_is_active', table_name='video_sources')
+    op.drop_index('ix_video_sources_is_demo', table_name='video_sources')
+    op.drop_index('ix_zone_configs_zone_id', table_name='zone_configs')
+    op.drop_index('ix_zones_id', table_name='zones')
+    _replace_foreign_keys(with_ondelete=True)
+
+    # CONCURRENTLY 不能在事务内执行：先提交上面的变更，再逐个建索引
+    with op.get_context().autocommit_block():
+        for name, columns, where in _ALARM_INDEXES:
+            op.create_index(
+                name,
+                'alarm_events',
+                columns,
+                unique=False,
+                postgresql_where=sa.text(where) if where else None,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+        # 新的 (video_id, occurred_at, event_id) 建好后再删除被它取代的单列索引
+        op.drop_index('ix_alarm_events_video_id', table_name='alarm_events', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    _replace_foreign_keys(with_ondelete=False)
+    op.create_index('ix_zones_id', 'zones', ['id'], unique=False)
+    op.create_index('ix_zone_configs_zone_id', 'zone_configs', ['zone_id'], unique=False)
+    op.create_index('ix_video_sources_is_demo', 'video_sources', ['is_demo'], unique=False)
+    op.create_index('ix_video_sources_is_active', 'video_sources', ['is_active'], unique=False)
+    op.create_index('ix_video_sources_file_name', 'video_sources', ['file_name'], unique=False)
+    op.create_index('ix_video_sources_video_id', 'video_sources', ['video_id'], unique=False)
+    op.create_index('ix_system_settings_current_source_id', 'system_settings', ['current_source_id'], unique=False)
+    op.drop_index('ix_alarm_rollups_video_bucket', table_name='alarm_rollups')
+
+    for name, _, _ in _ALARM_INDEXES:
+        op.drop_index(name, table_name='alarm_events')
+    op.create_index('ix_alarm_events_video_id', 'alarm_events', ['video_id'], unique=False)
+    op.create_index('ix_alarm_events_video_level_occurred', 'alarm_events', ['video_id', 'threat_level', 'occurred_at'], unique=False)
+    op.create_index('ix_alarm_events_is_acked', 'alarm_events', ['is_acked'], unique=False)
+    op.create_index('ix_alarm_events_is_read', 'alarm_events', ['is_read'], unique=False)
+    op.create_index('ix_alarm_events_event_id', 'alarm_events', ['event_id'], unique=False)
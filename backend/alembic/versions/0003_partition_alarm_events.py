@@ -0,0 +1,110 @@
+"""alarm_events 改为按 occurred_at 按月分区
+
+- 主键改为 (event_id, occurred_at)（分区表的主键必须包含分区键）
+- 按已有数据的时间范围建月分区 alarm_events_pYYYYMM，外加默认分区 alarm_events_default；
+  之后的月份由应用启动 / 定时维护时创建（app/services/alarm_partitions.py）
+- 已有数据整体复制到新表：执行期间 alarm_events 不可写，报警量大时请在停机窗口内升级
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 02:10:12.318054
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel  # noqa: F401  自动生成的列类型可能引用 sqlmodel.sql.sqltypes
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_COLUMNS = (
+    'event_id', 'video_id', 'video_timestamp', 'occurred_at', 'object_type', 'threat_level', 'snapshot_path',
+    'track_id', 'zone_id', 'match_key', 'is_read', 'is_acked', 'acked_at',
+)
+
+# (名称, 列, 部分索引条件)
+_INDEXES = (
+    ('ix_alarm_events_occurred_event', ['occurred_at', 'event_id'], None),
+    ('ix_alarm_events_video_occurred', ['video_id', 'occurred_at', 'event_id'], None),
+    ('ix_alarm_events_video_level_occurred', ['video_id', 'threat_level', 'occurred_at', 'event_id'], None),
+    ('ix_alarm_events_level_occurred', ['threat_level', 'occurred_at', 'event_id'], None),
+    ('ix_alarm_events_unread', ['occurred_at'], 'NOT is_read'),
+    ('ix_alarm_events_unacked', ['occurred_at'], 'NOT is_acked'),
+)
+
+
+def _create_alarm_events(primary_key: Sequence[str], **kw) -> None:
+    op.create_table('alarm_events',
+    sa.Column('event_id', sa.Uuid(), nullable=False),
+    sa.Column('video_id', sa.Uuid(), nullable=False),
+    sa.Column('video_timestamp', sa.Float(), nullable=False),
+    sa.Column('occurred_at', sa.DateTime(), nullable=False),
+    sa.Column('object_type', postgresql.ENUM('PERSON', 'VEHICLE', name='objecttype', create_type=False), nullable=False),
+    sa.Column('threat_level', postgresql.ENUM('CRITICAL', 'WARNING', name='threatlevel', create_type=False), nullable=False),
+    sa.Column('snapshot_path', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('track_id', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('zone_id', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('match_key', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('is_read', sa.Boolean(), nullable=False),
+    sa.Column('is_acked', sa.Boolean(), nullable=False),
+    sa.Column('acked_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['video_id'], ['video_sources.video_id'], name='alarm_events_video_id_fkey', ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint(*primary_key, name='alarm_events_pkey'),
+    **kw
+    )
+    for name, columns, where in _INDEXES:
+        op.create_index(name, 'alarm_events', columns, unique=False, postgresql_where=sa.text(where) if where else None)
+
+
+def _retire_alarm_events(new_name: str) -> None:
+    """旧表改名并释放约束 / 索引名，以便按原名称创建新表"""
+    for name, _, _ in _INDEXES:
+        op.drop_index(name, table_name='alarm_events')
+    op.rename_table('alarm_events', new_name)
+    op.execute(f'ALTER TABLE {new_name} RENAME CONSTRAINT alarm_events_pkey TO {new_name}_pkey')
+    op.execute(f'ALTER TABLE {new_name} RENAME CONSTRAINT alarm_events_video_id_fkey TO {new_name}_video_id_fkey')
+
+
+def _copy_rows(source: str) -> None:
+    columns = ', '.join(_COLUMNS)
+    op.execute(f'INSERT INTO alarm_events ({columns}) SELECT {columns} FROM {source}')
+    op.drop_table(source)
+
+
+def _next_month(dt: datetime) -> datetime:
+    return dt.replace(year=dt.year + dt.month // 12, month=dt.month % 12 + 1)
+
+
+def upgrade() -> None:
+    _retire_alarm_events('alarm_events_unpartitioned')
+    _create_alarm_events(['event_id', 'occurred_at'], postgresql_partition_by='RANGE (occurred_at)')
+
+    op.execute('CREATE TABLE alarm_events_default PARTITION OF alarm_events DEFAULT')
+    first, last = op.get_bind().execute(
+        sa.text("SELECT date_trunc('month', min(occurred_at)), date_trunc('month', max(occurred_at)) FROM alarm_events_unpartitioned")
+    ).one()
+    month = first
+    while month is not None and month <= last:
+        end = _next_month(month)
+        op.execute(
+            f"CREATE TABLE alarm_events_p{month:%Y%m} PARTITION OF alarm_events "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+        )
+        month = end
+
+    _copy_rows('alarm_events_unpartitioned')
+
+
+def downgrade() -> None:
+    _retire_alarm_events('alarm_events_partitioned')
+    _create_alarm_events(['event_id'])
+    # 删除分区表时其分区一并删除
+    _copy_rows('alarm_events_partitioned')
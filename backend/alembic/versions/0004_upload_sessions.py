@@ -0,0 +1,50 @@
+"""分片上传会话与分片记录（/api/videos/uploads，可续传的并行分片上传）
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 00:56:48.414934
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel  # noqa: F401  自动生成的列类型可能引用 sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('upload_sessions',
+    sa.Column('upload_id', sa.Uuid(), nullable=False),
+    sa.Column('file_name', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('ext', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('total_size', sa.BigInteger(), nullable=False),
+    sa.Column('chunk_size', sa.Integer(), nullable=False),
+    sa.Column('temp_path', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('video_id', sa.Uuid(), nullable=True),
+    sa.Column('completed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['video_id'], ['video_sources.video_id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('upload_id')
+    )
+    op.create_table('upload_chunks',
+    sa.Column('upload_id', sa.Uuid(), nullable=False),
+    sa.Column('chunk_index', sa.Integer(), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('sha256', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('received_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['upload_id'], ['upload_sessions.upload_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('upload_id', 'chunk_index')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('upload_chunks')
+    op.drop_table('upload_sessions')
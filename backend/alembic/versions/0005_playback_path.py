@@ -0,0 +1,29 @@
+"""video_sources 增加播放用 fast-start MP4 路径
+
+已有视频为空（继续播放源文件），可用 scripts/backfill_playback.py 补生成
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 01:02:12.447214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel  # noqa: F401  自动生成的列类型可能引用 sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('video_sources', sa.Column('playback_path', sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('video_sources', 'playback_path')
@@ -0,0 +1,68 @@
+"""video_sources 增加媒体元数据列，文件大小改为整数字节数
+
+- 新增 width / height / video_codec / audio_codec / fps / frame_count / bit_rate（已有视频为空，
+  可用 scripts/backfill_metadata.py 重新探测）
+- size（格式化字符串，e.g., 128.0 MB）改为 size_bytes：升级时按字符串换算（精度只到一位小数，
+  重新探测后为准确值），降级时按原格式重新格式化
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 01:06:24.670863
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel  # noqa: F401  自动生成的列类型可能引用 sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+_FORMATTED_SIZE = r"^[0-9.]+ (B|KB|MB|GB)$"
+
+
+def upgrade() -> None:
+    op.add_column('video_sources', sa.Column('size_bytes', sa.BigInteger(), server_default='0', nullable=False))
+    op.execute(
+        "UPDATE video_sources SET size_bytes = round(split_part(size, ' ', 1)::numeric * CASE split_part(size, ' ', 2) "
+        "WHEN 'GB' THEN 1073741824 WHEN 'MB' THEN 1048576 WHEN 'KB' THEN 1024 ELSE 1 END)::bigint "
+        f"WHERE size ~ '{_FORMATTED_SIZE}'"
+    )
+    op.alter_column('video_sources', 'size_bytes', server_default=None)
+    op.drop_column('video_sources', 'size')
+
+    op.add_column('video_sources', sa.Column('width', sa.Integer(), nullable=True))
+    op.add_column('video_sources', sa.Column('height', sa.Integer(), nullable=True))
+    op.add_column('video_sources', sa.Column('video_codec', sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+    op.add_column('video_sources', sa.Column('audio_codec', sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+    op.add_column('video_sources', sa.Column('fps', sa.Float(), nullable=True))
+    op.add_column('video_sources', sa.Column('frame_count', sa.Integer(), nullable=True))
+    op.add_column('video_sources', sa.Column('bit_rate', sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('video_sources', 'bit_rate')
+    op.drop_column('video_sources', 'frame_count')
+    op.drop_column('video_sources', 'fps')
+    op.drop_column('video_sources', 'audio_codec')
+    op.drop_column('video_sources', 'video_codec')
+    op.drop_column('video_sources', 'height')
+    op.drop_column('video_sources', 'width')
+
+    # 与 app/routers/video.py 原 _format_size 的格式一致
+    op.add_column('video_sources', sa.Column('size', sa.VARCHAR(), server_default='', nullable=False))
+    op.execute(
+        "UPDATE video_sources SET size = CASE "
+        "WHEN size_bytes > 1073741824 THEN to_char(size_bytes / 1073741824.0, 'FM999999990.0') || ' GB' "
+        "WHEN size_bytes > 1048576 THEN to_char(size_bytes / 1048576.0, 'FM999999990.0') || ' MB' "
+        "WHEN size_bytes > 1024 THEN to_char(size_bytes / 1024.0, 'FM999999990.0') || ' KB' "
+        "ELSE size_bytes || ' B' END"
+    )
+    op.alter_column('video_sources', 'size', server_default=None)
+    op.drop_column('video_sources', 'size_bytes')
@@ -1,10 +1,17 @@
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from typing import AsyncGenerator
+from pathlib import Path
 import os
 
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect, text
+
 from .config import settings
+from .db_metrics import TimedAsyncQueuePool, TimedQueuePool, instrument_engine
 
 # 确保上传目录存在
 os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
@@ -12,7 +19,8 @@ os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
 # 同步引擎（用于 SQLModel 模型创建和同步操作）
 sync_engine = create_engine(
     settings.DATABASE_URL,
-    echo=True,  # 开发时开启 SQL 日志
+    echo=settings.DB_ECHO,
+    poolclass=TimedQueuePool,
     pool_pre_ping=True,
     pool_recycle=3600,
 )
@@ -22,17 +30,26 @@ sync_engine = create_engine(
 # 异步驱动应使用 "postgresql+asyncpg://..."（而不是 "postgresql+asyncpgpsycopg://..."）
 async_engine = create_async_engine(
     str(settings.DATABASE_URL).replace("postgresql+psycopg://", "postgresql+asyncpg://"),
-    echo=True,
-    pool_pre_ping=True,
+    echo=settings.DB_ECHO,
+    poolclass=TimedAsyncQueuePool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    # 不开 pre_ping：asyncpg 的 ping 每次借出连接要多 3 次往返（BEGIN / ; / ROLLBACK）；
+    # 连接失效时驱动报断连错误，SQLAlchemy 会作废连接池，配合 pool_recycle 定期重建
     pool_recycle=3600,
 )
 
+# 语句耗时 / 每请求查询次数 / 慢查询统计（见 app/core/db_metrics.py，/api/system/db-metrics 查看）
+instrument_engine(sync_engine)
+instrument_engine(async_engine.sync_engine)
+
 # 同步会话工厂（SQLAlchemy Session）。
 # 注意：sqlmodel.Session 才有 exec()；所以我们提供一个额外的 get_sqlmodel_db() 依赖。
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=sync_engine)
 
-# 异步会话工厂
-AsyncSessionLocal = sessionmaker(
+# 异步会话工厂（sqlmodel 的 AsyncSession：支持 await db.exec(stmt)；
+# 同步的 service 函数通过 await db.run_sync(fn, ...) 在同一会话/事务内执行）
+AsyncSessionLocal = async_sessionmaker(
     bind=async_engine,
     class_=AsyncSession,
     expire_on_commit=False,
@@ -56,7 +73,7 @@ def get_sqlmodel_db() -> Session:
         yield session
 
 
-# 依赖项：获取异步会话
+# 依赖项：获取异步会话（routers 统一使用）
 async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
     async with AsyncSessionLocal() as session:
         try:
@@ -65,19 +82,56 @@ async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
             await session.close()
 
 
-# 创建数据库表（同步）
+# Alembic 配置（backend/alembic.ini）
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+
+# 迁移时持有的 PostgreSQL advisory lock：多 worker 同时启动时只有一个执行迁移
+_MIGRATION_LOCK_KEY = 7_402_0044
+
+# 引入迁移之前由 create_all 建出的库对应的版本
+_BASELINE_REVISION = "0001"
+
+
+def alembic_config(connection=None) -> Config:
+    cfg = Config(str(ALEMBIC_INI))
+    # 由应用调用时不重新配置 logging（fileConfig 会禁用 uvicorn 已有的 logger）
+    cfg.attributes["configure_logger"] = False
+    if connection is not None:
+        cfg.attributes["connection"] = connection
+    return cfg
+
+
+# 创建数据库表（同步）：执行全部迁移
 def create_db_and_tables():
-    from app.models import VideoSource, AlarmEvent, ZoneConfig, User, Zone, SystemSettings  # 避免循环导入
+    from app.models import VideoSource, AlarmEvent, AlarmRollup, ZoneConfig, User, Zone, SystemSettings  # 避免循环导入
 
-    SQLModel.metadata.create_all(sync_engine)
+    with sync_engine.connect() as conn:
+        # 会话级锁，提交后仍然持有；连接上不能留有未结束的事务，
+        # 否则 alembic 无法自行开启事务（迁移中的 CONCURRENTLY 建索引需要退出事务执行）
+        conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": _MIGRATION_LOCK_KEY})
+        conn.commit()
+        try:
+            cfg = alembic_config(conn)
+            inspector = inspect(conn)
+            legacy = inspector.has_table(VideoSource.__tablename__) and not inspector.has_table("alembic_version")
+            conn.commit()
+            if legacy:
+                # 旧库：表已由 create_all 建好，标记为基线版本后再升级
+                command.stamp(cfg, _BASELINE_REVISION)
+            command.upgrade(cfg, "head")
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _MIGRATION_LOCK_KEY})
+            conn.commit()
 
 
 # 删除数据库表（开发用）
 def drop_all_tables():
-    SQLModel.metadata.drop_all(sync_engine)
+    with sync_engine.connect() as conn:
+        command.downgrade(alembic_config(conn), "base")
+        conn.commit()
 
 
-# 初始化数据库（创建表）
+# 初始化数据库（迁移到最新版本）
 def init_db():
     create_db_and_tables()
-    print("✅ Database tables created")
+    print("✅ Database migrated to head")
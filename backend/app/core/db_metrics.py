@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from .config import settings
+
+# 延迟直方图桶上界（毫秒），最后一个桶为 +Inf
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class LatencyHistogram:
+    """固定桶延迟直方图（毫秒）；分位数按桶上界估算"""
+
+    __slots__ = ("counts", "count", "total_ms", "max_ms")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms: float) -> None:
+        self.counts[bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return float(BUCKETS_MS[i]) if i < len(BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "totalMs": round(self.total_ms, 3),
+            "avgMs": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "maxMs": round(self.max_ms, 3),
+            "p50Ms": self.quantile(0.50),
+            "p95Ms": self.quantile(0.95),
+            "p99Ms": self.quantile(0.99),
+            "buckets": {
+                **{f"le{b}": n for b, n in zip(BUCKETS_MS, self.counts)},
+                "inf": self.counts[-1],
+            },
+        }
+
+
+class RequestQueries:
+    """单个 HTTP 请求内的查询统计（通过 ContextVar 关联，响应发送完毕后停止计数）"""
+
+    __slots__ = ("scope", "count", "total_ms", "templates", "active")
+
+    def __init__(self, scope: Dict[str, Any]):
+        self.scope = scope
+        self.count = 0
+        self.total_ms = 0.0
+        self.templates: Counter = Counter()
+        self.active = True
+
+    @property
+    def route(self) -> str:
+        # 路由匹配后 FastAPI 把 APIRoute 写入 scope["route"]；未匹配的路径统一归为一类，避免基数膨胀
+        route = self.scope.get("route")
+        return f"{self.scope['method']} {getattr(route, 'path', '<unmatched>')}"
+
+
+_current_request: ContextVar[Optional[RequestQueries]] = ContextVar("db_request_queries", default=None)
+
+
+class DatabaseMetrics:
+    """数据库访问指标：按语句模板的延迟直方图、连接池借出等待、每个路由的查询次数、慢查询记录"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started_at = datetime.now(timezone.utc)
+            self.statements: Dict[str, LatencyHistogram] = {}
+            self.dropped_templates = 0
+            self.pool_wait: Dict[str, LatencyHistogram] = {}
+            self.routes: Dict[str, Dict[str, Any]] = {}
+            self.slow_queries: Deque[Dict[str, Any]] = deque(maxlen=settings.DB_SLOW_QUERY_LOG_SIZE)
+            self.n_plus_one: Deque[Dict[str, Any]] = deque(maxlen=settings.DB_SLOW_QUERY_LOG_SIZE)
+
+    # ---- 采集 ----
+
+    def record_statement(self, template: str, ms: float, parameters: Any) -> None:
+        req = _current_request.get()
+        if req is not None and req.active:
+            req.count += 1
+            req.total_ms += ms
+            req.templates[template] += 1
+
+        slow = None
+        if ms >= settings.DB_SLOW_QUERY_MS:
+            slow = {
+                "at": datetime.now(timezone.utc).isoformat(),
+                "ms": round(ms, 3),
+                "route": req.route if req is not None else "",
+                "statement": template,
+                "parameters": _short_repr(parameters),
+            }
+            print(f"[slow-query] {ms:.1f} ms {slow['route']} {template} params={slow['parameters']}")
+
+        with self._lock:
+            hist = self.statements.get(template)
+            if hist is None:
+                # 模板数量封顶：动态拼接的 SQL 不至于撑爆内存
+                if len(self.statements) >= settings.DB_METRICS_MAX_TEMPLATES:
+                    self.dropped_templates += 1
+                    hist = None
+                else:
+                    hist = self.statements[template] = LatencyHistogram()
+            if hist is not None:
+                hist.observe(ms)
+            if slow is not None:
+                self.slow_queries.append(slow)
+
+    def record_pool_wait(self, pool_name: str, ms: float) -> None:
+        with self._lock:
+            hist = self.pool_wait.get(pool_name)
+            if hist is None:
+                hist = self.pool_wait[pool_name] = LatencyHistogram()
+            hist.observe(ms)
+
+    def record_request(self, req: RequestQueries) -> None:
+        repeated = req.templates.most_common(1)
+        top_template, top_count = repeated[0] if repeated else ("", 0)
+        route = req.route
+        with self._lock:
+            stats = self.routes.get(route)
+            if stats is None:
+                stats = self.routes[route] = {"requests": 0, "queries": 0, "maxQueries": 0, "dbMs": 0.0}
+            stats["requests"] += 1
+            stats["queries"] += req.count
+            stats["maxQueries"] = max(stats["maxQueries"], req.count)
+            stats["dbMs"] += req.total_ms
+            if top_count >= settings.DB_N_PLUS_ONE_THRESHOLD:
+                self.n_plus_one.append(
+                    {
+                        "at": datetime.now(timezone.utc).isoformat(),
+                        "route": route,
+                        "statement": top_template,
+                        "repeats": top_count,
+                        "queries": req.count,
+                    }
+                )
+        if top_count >= settings.DB_N_PLUS_ONE_THRESHOLD:
+            print(f"[n+1] {route}: 同一语句执行 {top_count} 次（共 {req.count} 次查询）: {top_template}")
+
+    # ---- 导出 ----
+
+    def snapshot(self, top: int = 50) -> Dict[str, Any]:
+        with self._lock:
+            statements = sorted(self.statements.items(), key=lambda kv: kv[1].total_ms, reverse=True)[:top]
+            routes = sorted(
+                self.routes.items(), key=lambda kv: kv[1]["queries"] / max(kv[1]["requests"], 1), reverse=True
+            )
+            return {
+                "since": self.started_at.isoformat(),
+                "slowQueryMs": settings.DB_SLOW_QUERY_MS,
+                "statements": [{"statement": sql, **hist.to_dict()} for sql, hist in statements],
+                "statementTemplates": len(self.statements),
+                "droppedTemplates": self.dropped_templates,
+                "poolWait": {name: hist.to_dict() for name, hist in self.pool_wait.items()},
+                "routes": [
+                    {
+                        "route": route,
+                        **{k: round(v, 3) if isinstance(v, float) else v for k, v in stats.items()},
+                        "avgQueries": round(stats["queries"] / max(stats["requests"], 1), 2),
+                    }
+                    for route, stats in routes
+                ],
+                "nPlusOne": list(self.n_plus_one),
+                "slowQueries": list(self.slow_queries),
+            }
+
+
+db_metrics = DatabaseMetrics()
+
+
+def _short_repr(value: Any, limit: int = 300) -> str:
+    text = repr(value)
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+def _template(statement: str, context: Any) -> str:
+    # 优先取编译后的语句（IN 列表展开前），同一模板不因参数个数不同而拆成多条
+    compiled = getattr(context, "compiled", None)
+    sql = compiled.string if compiled is not None else statement
+    return _WHITESPACE.sub(" ", sql).strip()[:1000]
+
+
+def instrument_engine(engine: Engine) -> None:
+    """在（同步）Engine 上挂载语句计时事件；异步引擎传入 async_engine.sync_engine"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        db_metrics.record_statement(_template(statement, context), (time.perf_counter() - started) * 1000, parameters)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
+
+
+class _TimedPoolMixin:
+    """连接池借出计时：包括等待空闲连接与新建连接的时间"""
+
+    metrics_name = "sync"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_metrics.record_pool_wait(self.metrics_name, (time.perf_counter() - started) * 1000)
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    metrics_name = "sync"
+
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    metrics_name = "async"
+
+
+class DBMetricsMiddleware:
+    """ASGI 中间件：统计每个请求执行的查询次数与耗时，按路由模板（如 /api/videos/{video_id}）聚合"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        req = RequestQueries(scope)
+        token = _current_request.set(req)
+
+        async def send_wrapper(message):
+            await send(message)
+            # 响应体发送完毕即结束计数，之后执行的后台任务不计入本请求
+            if message["type"] == "http.response.body" and not message.get("more_body", False) and req.active:
+                req.active = False
+                db_metrics.record_request(req)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            req.active = False
+            _current_request.reset(token)
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Set
+
+# 推送主题
+TOPIC_ALARM_CREATED = "alarm.created"  # 新入库的报警（列表，字段同 /alarms 列表项）
+TOPIC_ALARM_UNREAD = "alarm.unread"  # 未读报警数变化 {count}
+TOPIC_ANALYSIS_STATUS = "analysis.status"  # 视频分析任务状态变化 {videoId, status}
+
+ALL_TOPICS = (TOPIC_ALARM_CREATED, TOPIC_ALARM_UNREAD, TOPIC_ANALYSIS_STATUS)
+
+
+class Subscription:
+    """单个推送连接的订阅：按主题（及可选 videoId）过滤，消息放入该连接所在事件循环的队列"""
+
+    def __init__(self, bus: "EventBus", topics: Set[str], video_id: Optional[str], maxsize: int):
+        self._bus = bus
+        self.topics = topics
+        self.video_id = video_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def matches(self, topic: str, video_id: Optional[str]) -> bool:
+        if topic not in self.topics:
+            return False
+        return self.video_id is None or video_id is None or video_id == self.video_id
+
+    def _offer(self, message: Dict[str, Any]) -> None:
+        # 慢消费者：丢弃最旧的消息，保证发布方永不阻塞
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self) -> None:
+        self._bus._unsubscribe(self)
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class EventBus:
+    """进程内发布/订阅总线。
+
+    publish 可在任意线程调用（同步路由运行在线程池、后台任务运行在工作线程），
+    消息通过 call_soon_threadsafe 投递到各订阅连接的事件循环。
+    """
+
+    def __init__(self, maxsize: int = 1000):
+        self._subscribers: Set[Subscription] = set()
+        self._lock = threading.Lock()
+        self._seq = itertools.count(1)
+        self._maxsize = maxsize
+
+    def subscribe(self, topics: Optional[Iterable[str]] = None, video_id: Optional[str] = None) -> Subscription:
+        """须在事件循环内调用（SSE / WebSocket 路由中）"""
+        wanted = set(topics or ALL_TOPICS) & set(ALL_TOPICS)
+        sub = Subscription(self, wanted, video_id, self._maxsize)
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def _unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def publish(self, topic: str, data: Any, *, video_id: Optional[str] = None) -> int:
+        """发布一条消息，返回投递到的订阅数"""
+        message = {"id": next(self._seq), "topic": topic, "ts": time.time(), "data": data}
+        if video_id is not None:
+            message["videoId"] = video_id
+
+        with self._lock:
+            targets = [s for s in self._subscribers if s.matches(topic, video_id)]
+        for sub in targets:
+            try:
+                sub.loop.call_soon_threadsafe(sub._offer, message)
+            except RuntimeError:
+                # 事件循环已关闭（连接所在循环退出），直接移除
+                self._unsubscribe(sub)
+        return len(targets)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+
+event_bus = EventBus()
+
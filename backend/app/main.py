@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
@@ -10,11 +11,19 @@ from sqlmodel import Session as SQLModelSession
 
 from app.core.auth import hash_password
 from app.core.database import SessionLocal, init_db
+from app.core.db_metrics import DBMetricsMiddleware
 from app.models import User
+from app.services.alarm_partitions import alarm_maintenance_loop, run_alarm_maintenance
+from app.services.alarm_rollup import ensure_alarm_rollups
+from app.services.chunked_upload import remove_expired_uploads
+from app.services.recent_events import warm_recent_alarms
+from app.services.settings_cache import system_settings_cache
+from app.services.video_export import remove_expired_exports
 from app.routers import auth, video
 from app.routers import config as config_router
 from app.routers import dashboard as dashboard_router
 from app.routers import alarms as alarms_router
+from app.routers import stream as stream_router
 
 
 @asynccontextmanager
@@ -30,10 +39,29 @@ async def lifespan(app: FastAPI):
             admin = User(username="admin", password_hash=hash_password("123456"))
             db.add(admin)
             db.commit()
+
+        # 3) 预热仪表盘最近报警缓冲
+        warm_recent_alarms(db)
+
+        # 4) 报警分区：补建当月及之后的分区，删除过期分区
+        run_alarm_maintenance(db)
+
+        # 5) 报警聚合表：历史数据首次升级时全量重建
+        ensure_alarm_rollups(db)
+
+        # 6) 清理过期的未完成分片上传与导出文件
+        remove_expired_uploads(db)
+        remove_expired_exports()
     finally:
         db.close()
 
+    # 之后定时执行分区维护
+    maintenance = asyncio.create_task(alarm_maintenance_loop())
+    # system_settings 缓存：LISTEN 其他 worker 的变更通知
+    system_settings_cache.start_listener()
     yield
+    system_settings_cache.stop_listener()
+    maintenance.cancel()
 
 
 def create_app() -> FastAPI:
@@ -51,6 +79,9 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
 
+    # 每个请求的查询次数 / 数据库耗时（/api/system/db-metrics）
+    app.add_middleware(DBMetricsMiddleware)
+
     # 认证：/api/token
     app.include_router(auth.router, prefix="/api")
 
@@ -66,6 +97,9 @@ def create_app() -> FastAPI:
     # 告警记录：/api/alarms*
     app.include_router(alarms_router.router, prefix="/api")
 
+    # 推送通道：/api/stream/events (SSE), /api/ws (WebSocket)
+    app.include_router(stream_router.router, prefix="/api")
+
     app.mount("/static", StaticFiles(directory="static"), name="static")
 
     return app
@@ -5,7 +5,7 @@ from enum import Enum
 from typing import Optional, Dict, Any, List
 from uuid import UUID, uuid4
 
-from sqlalchemy import Column, Enum as SAEnum
+from sqlalchemy import BigInteger, Column, Enum as SAEnum, Index, text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, relationship
 from sqlmodel import Field, Relationship, SQLModel
@@ -48,19 +48,31 @@ class AnalysisStatus(str, Enum):
 class VideoSource(SQLModel, table=True):
     __tablename__ = "video_sources"
 
-    video_id: UUID = Field(default_factory=uuid4, primary_key=True, index=True)
+    # 主键自带唯一索引；文件名只做 ILIKE '%关键字%' 模糊查询、布尔列区分度太低，均不建索引
+    video_id: UUID = Field(default_factory=uuid4, primary_key=True)
 
-    file_name: str = Field(index=True)
+    file_name: str
     file_path: str
 
-    duration: float = Field(default=0.0)
-    is_active: bool = Field(default=False, index=True)
+    duration: float = Field(default=0.0, description="时长（秒），上传时探测")
+    is_active: bool = Field(default=False)
 
+    # 列表按上传时间倒序、当前源缺省时取最新一条
     upload_time: datetime = Field(default_factory=datetime.utcnow, index=True)
 
     ext: str = Field(default="", description="文件扩展名, e.g., MP4")
-    size: str = Field(default="", description="格式化后的文件大小, e.g., 128 MB")
-    is_demo: bool = Field(default=False, index=True, description="是否为演示视频")
+    size_bytes: int = Field(default=0, sa_type=BigInteger, description="文件字节数")
+    is_demo: bool = Field(default=False, description="是否为演示视频")
+
+    # 媒体元数据：上传时探测一次（app/services/media_probe.py），列表 / 缩略图 / 分析任务直接读取，不再打开文件；
+    # 探测不到的项为空
+    width: Optional[int] = Field(default=None)
+    height: Optional[int] = Field(default=None)
+    video_codec: Optional[str] = Field(default=None, description="视频编码, e.g., h264")
+    audio_codec: Optional[str] = Field(default=None, description="音频编码, e.g., aac；无音轨为空")
+    fps: Optional[float] = Field(default=None, description="平均帧率")
+    frame_count: Optional[int] = Field(default=None)
+    bit_rate: Optional[int] = Field(default=None, sa_type=BigInteger, description="总码率（bit/s）")
 
     analysis_status: AnalysisStatus = Field(
         default=AnalysisStatus.PENDING,
@@ -77,32 +89,63 @@ class VideoSource(SQLModel, table=True):
     )
     raw_tracks_path: Optional[str] = Field(default=None, description="原始轨迹JSON文件路径")
     analysis_json_path: Optional[str] = Field(default=None, description="分析结果JSON文件路径")
+    sprite_index_path: Optional[str] = Field(default=None, description="缩略图雪碧图索引JSON文件路径")
+    playback_path: Optional[str] = Field(default=None, description="播放用 fast-start MP4 路径（可能就是源文件）")
 
+    # 外键为 ON DELETE CASCADE：删除视频时由数据库删除子行，ORM 不必先加载报警 / 防区
     alarms: Mapped[List["AlarmEvent"]] = Relationship(
         back_populates="video",
-        sa_relationship=relationship("AlarmEvent", back_populates="video"),
+        sa_relationship=relationship("AlarmEvent", back_populates="video", passive_deletes=True),
     )
     zones: Mapped[List["ZoneConfig"]] = Relationship(
         back_populates="video",
-        sa_relationship=relationship("ZoneConfig", back_populates="video"),
+        sa_relationship=relationship("ZoneConfig", back_populates="video", passive_deletes=True),
     )
 
 
 class AlarmEvent(SQLModel, table=True):
     __tablename__ = "alarm_events"
+    # 索引与 /alarms 列表的查询形态一一对应：等值过滤列在前，排序键 (occurred_at, event_id) 在后，
+    # 倒序扫描即得到 ALARM_ORDER，keyset 分页与日期范围都落在同一索引区间内
+    __table_args__ = (
+        # 无过滤 / 仅日期范围
+        Index("ix_alarm_events_occurred_event", "occurred_at", "event_id"),
+        # 按视频（含重算报警时按视频取全部已有记录）
+        Index("ix_alarm_events_video_occurred", "video_id", "occurred_at", "event_id"),
+        # 按视频 + 等级
+        Index("ix_alarm_events_video_level_occurred", "video_id", "threat_level", "occurred_at", "event_id"),
+        # 仅按等级
+        Index("ix_alarm_events_level_occurred", "threat_level", "occurred_at", "event_id"),
+        # 未读 / 未处理只占少数：部分索引，未读计数与批量标记已读/已处理的 UPDATE 只扫描这一小部分
+        Index("ix_alarm_events_unread", "occurred_at", postgresql_where=text("NOT is_read")),
+        Index("ix_alarm_events_unacked", "occurred_at", postgresql_where=text("NOT is_acked")),
+        # 按 occurred_at 按月分区（分区的创建与过期清理见 app/services/alarm_partitions.py）：
+        # 时间范围 / keyset 分页只扫描相关分区，过期数据整个分区删除
+        {"postgresql_partition_by": "RANGE (occurred_at)"},
+    )
 
-    event_id: UUID = Field(default_factory=uuid4, primary_key=True, index=True)
+    # 分区表的主键必须包含分区键：(event_id, occurred_at)；event_id 本身仍全局唯一（uuid4）
+    event_id: UUID = Field(default_factory=uuid4, primary_key=True)
 
-    video_id: UUID = Field(foreign_key="video_sources.video_id", index=True)
+    video_id: UUID = Field(foreign_key="video_sources.video_id", ondelete="CASCADE")
 
     video_timestamp: float = Field(description="报警发生在视频内的时间点（秒或时间戳字符串）")
+    occurred_at: datetime = Field(primary_key=True, description="报警发生的绝对时间（UTC）：视频起始时间 + video_timestamp")
     object_type: ObjectType = Field(default=ObjectType.PERSON)
     threat_level: ThreatLevel = Field(default=ThreatLevel.WARNING)
 
     snapshot_path: str
 
+    # 目标轨迹与命中防区（用于重算报警时与已有记录做差异匹配）
+    track_id: Optional[str] = Field(default=None, description="目标轨迹 ID, e.g., t12")
+    zone_id: Optional[str] = Field(default=None, description="命中的防区 ID")
+    match_key: Optional[str] = Field(default=None, description="差异匹配分组：track|zone|level")
+
     # 新增：是否已读（用于侧边栏 badge）
-    is_read: bool = Field(default=False, index=True)
+    is_read: bool = Field(default=False)
+    # 是否已处理（历史记录页的“已处理/未处理”）；处理时同时视为已读
+    is_acked: bool = Field(default=False)
+    acked_at: Optional[datetime] = Field(default=None, description="处理时间（UTC）")
 
     video: Mapped[Optional["VideoSource"]] = Relationship(
         back_populates="alarms",
@@ -110,13 +153,64 @@ class AlarmEvent(SQLModel, table=True):
     )
 
 
+# 报警按小时聚合的计数（统计接口直接读取，不扫描 alarm_events），随报警写入/重算增量维护
+class AlarmRollup(SQLModel, table=True):
+    __tablename__ = "alarm_rollups"
+    __table_args__ = (
+        # 主键以 bucket_start 开头服务全局时间范围统计；按视频统计 / 删除视频时走此索引
+        Index("ix_alarm_rollups_video_bucket", "video_id", "bucket_start"),
+    )
+
+    bucket_start: datetime = Field(primary_key=True, description="小时桶起点（UTC）")
+    video_id: UUID = Field(foreign_key="video_sources.video_id", ondelete="CASCADE", primary_key=True)
+    # 无防区时为空串（主键列不可为 NULL）
+    zone_id: str = Field(default="", primary_key=True)
+    threat_level: ThreatLevel = Field(primary_key=True)
+    object_type: ObjectType = Field(primary_key=True)
+
+    count: int = Field(default=0)
+
+
+# 分片上传会话（/api/videos/uploads）：分片按偏移写入临时文件，全部收到后合并为 VideoSource；
+# 行数很少（进行中的上传 + 保留期内已完成的上传），不建额外索引
+class UploadSession(SQLModel, table=True):
+    __tablename__ = "upload_sessions"
+
+    upload_id: UUID = Field(default_factory=uuid4, primary_key=True)
+
+    file_name: str
+    ext: str = Field(default="", description="文件扩展名（不含点）, e.g., mp4")
+    total_size: int = Field(sa_type=BigInteger, description="文件总字节数")
+    chunk_size: int = Field(description="分片字节数（最后一片可以更小）")
+    temp_path: str = Field(description="接收中的临时文件路径")
+
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    # 最后一次收到分片的时间：超过 UPLOAD_SESSION_TTL_HOURS 未更新的会话连同临时文件一并清理
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    # 合并完成后生成的视频；重复提交 complete 时直接返回该视频
+    video_id: Optional[UUID] = Field(default=None, foreign_key="video_sources.video_id", ondelete="SET NULL")
+    completed_at: Optional[datetime] = Field(default=None)
+
+
+class UploadChunk(SQLModel, table=True):
+    __tablename__ = "upload_chunks"
+
+    upload_id: UUID = Field(foreign_key="upload_sessions.upload_id", ondelete="CASCADE", primary_key=True)
+    chunk_index: int = Field(primary_key=True)
+    size: int
+    sha256: str = Field(description="分片内容的 SHA-256（十六进制）")
+    received_at: datetime = Field(default_factory=datetime.utcnow)
+
+
 class SystemSettings(SQLModel, table=True):
     __tablename__ = "system_settings"
 
     # 仅一行配置，使用固定主键
     id: int = Field(default=1, primary_key=True)
 
-    current_source_id: Optional[UUID] = Field(default=None, foreign_key="video_sources.video_id", index=True)
+    # 删除当前源视频时自动置空
+    current_source_id: Optional[UUID] = Field(default=None, foreign_key="video_sources.video_id", ondelete="SET NULL")
 
     online: bool = Field(default=True)
     fps: int = Field(default=24)
@@ -127,10 +221,10 @@ class SystemSettings(SQLModel, table=True):
 class Zone(SQLModel, table=True):
     __tablename__ = "zones"
 
-    id: str = Field(primary_key=True, index=True)
+    id: str = Field(primary_key=True)
 
     # 外键：配置中心用的 sourceId 实际是 video_sources.video_id（UUID 字符串）
-    source_id: UUID = Field(foreign_key="video_sources.video_id", index=True)
+    source_id: UUID = Field(foreign_key="video_sources.video_id", ondelete="CASCADE", index=True)
 
     name: str = Field(default="新建区域")
     type: str = Field(default="core")  # core / warning
@@ -143,9 +237,9 @@ class Zone(SQLModel, table=True):
 class ZoneConfig(SQLModel, table=True):
     __tablename__ = "zone_configs"
 
-    zone_id: UUID = Field(default_factory=uuid4, primary_key=True, index=True)
+    zone_id: UUID = Field(default_factory=uuid4, primary_key=True)
 
-    video_id: UUID = Field(foreign_key="video_sources.video_id", index=True)
+    video_id: UUID = Field(foreign_key="video_sources.video_id", ondelete="CASCADE", index=True)
 
     zone_type: ZoneType = Field(default=ZoneType.CORE_ZONE)
 
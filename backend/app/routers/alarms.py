@@ -1,104 +1,216 @@
 from __future__ import annotations
 
-from typing import Optional
+from datetime import datetime, timedelta, timezone
+from typing import Any, List, Optional
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlmodel import Session, select
-
-from app.core.database import get_sqlmodel_db
-from app.models import AlarmEvent, VideoSource
+from fastapi.responses import StreamingResponse
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.database import get_async_db
+from app.models import AlarmEvent, VideoSource, Zone
+from app.services.alarm_export import EXPORT_FORMATS, iter_alarm_export
+from app.services.alarm_query import (
+    ALARM_ORDER,
+    after_cursor,
+    approximate_alarm_count,
+    build_alarm_filters,
+    count_alarms,
+    encode_cursor,
+    get_alarm,
+    parse_date_range,
+)
+from app.services.alarm_rollup import alarm_stats
+from app.services.alarm_store import alarm_to_dict, mark_alarms, publish_unread_count
+from app.services.unread_counter import unread_counter
 
 router = APIRouter(tags=["alarms"])
 
 
-def _alarm_to_dict(a: AlarmEvent) -> dict:
-    return {
-        "id": f"#{a.event_id}",
-        "thumb": a.snapshot_path,
-        "time": a.video_timestamp,
-        "target": a.object_type.value,
-        "severity": "critical" if a.threat_level == 1 else "warning",
-        "status": "pending",  # 暂时固定，后续可扩展状态字段
-        "videoId": str(a.video_id),
-    }
-
-
-@router.get("/alarms")
-def list_alarms(
-    page: int = Query(default=1, ge=1),
-    pageSize: int = Query(default=10, ge=1, le=100),
+async def alarm_filters(
     query: Optional[str] = Query(default=""),
     level: Optional[str] = Query(default=""),
     startDate: Optional[str] = Query(default=""),
     endDate: Optional[str] = Query(default=""),
-    db: Session = Depends(get_sqlmodel_db),
-):
-    stmt = select(AlarmEvent)
+    videoId: Optional[UUID] = Query(default=None),
+) -> List[Any]:
+    """列表 / 批量操作共用的过滤参数"""
+    # 日期范围按北京时间自然日过滤 occurred_at
+    try:
+        start, end = parse_date_range(startDate, endDate)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="日期格式不正确，应为 YYYY-MM-DD")
 
-    # 按关键字搜索：支持 event_id 或 video_id
-    if query:
-        cleaned = query.replace("#", "")
-        try:
-            uuid_obj = UUID(cleaned)
-            stmt = stmt.where((AlarmEvent.event_id == uuid_obj) | (AlarmEvent.video_id == uuid_obj))
-        except Exception:
-            # 非合法 UUID，跳过过滤
-            pass
+    return build_alarm_filters(query, level, start=start, end=end, video_id=videoId)
 
-    # 按威胁等级过滤
-    if level == "critical":
-        stmt = stmt.where(AlarmEvent.threat_level == 1)
-    elif level == "warning":
-        stmt = stmt.where(AlarmEvent.threat_level == 2)
 
-    # TODO: 按日期范围过滤（需要 video_timestamp 为可解析的时间格式）
-    # 当前 video_timestamp 是字符串（秒或时间戳），暂不实现日期过滤
+def _parse_alarm_id(alarm_id: str) -> UUID:
+    cleaned = alarm_id.replace("#", "")
+    try:
+        return UUID(cleaned)
+    except Exception:
+        raise HTTPException(status_code=400, detail="告警 ID 格式不正确")
+
+
+def _require_filters(conditions: List[Any], all_alarms: bool) -> None:
+    """批量操作未给出任何过滤条件时拒绝执行，避免误操作全部报警（确需全部时显式传 all=true）"""
+    if not conditions and not all_alarms:
+        raise HTTPException(status_code=400, detail="未指定过滤条件；如需操作全部报警请传 all=true")
 
-    total = len(db.exec(stmt).all())
-    items = db.exec(stmt.offset((page - 1) * pageSize).limit(pageSize)).all()
+
+@router.get("/alarms")
+async def list_alarms(
+    page: int = Query(default=1, ge=1),
+    pageSize: int = Query(default=10, ge=1, le=100),
+    cursor: Optional[str] = Query(default=None, description="上一页返回的 nextCursor；提供时忽略 page"),
+    withTotal: bool = Query(default=True, description="是否返回总数（翻页时可关闭以省去 COUNT）"),
+    approxTotal: bool = Query(default=False, description="无过滤条件时使用统计信息估算总数"),
+    conditions: List[Any] = Depends(alarm_filters),
+    db: AsyncSession = Depends(get_async_db),
+):
+    stmt = select(AlarmEvent).where(*conditions).order_by(*ALARM_ORDER)
+    if cursor:
+        # keyset 分页：按排序键定位，深翻页不随偏移量变慢
+        try:
+            stmt = stmt.where(after_cursor(cursor))
+        except Exception:
+            raise HTTPException(status_code=400, detail="分页游标格式不正确")
+    else:
+        stmt = stmt.offset((page - 1) * pageSize)
+
+    # 多取一条判断是否还有下一页
+    rows = (await db.exec(stmt.limit(pageSize + 1))).all()
+    items = rows[:pageSize]
+    next_cursor = encode_cursor(items[-1]) if len(rows) > pageSize else None
+
+    total = None
+    approximate = False
+    if withTotal:
+        if approxTotal and not conditions:
+            total = await db.run_sync(approximate_alarm_count)
+            approximate = total is not None
+        if total is None:
+            total = await db.run_sync(count_alarms, conditions)
 
     return {
         "code": 0,
         "message": "ok",
         "data": {
-            "list": [_alarm_to_dict(a) for a in items],
+            "list": [alarm_to_dict(a) for a in items],
             "total": total,
+            "totalApproximate": approximate,
+            "nextCursor": next_cursor,
         },
     }
 
 
+@router.get("/alarms/export")
+def export_alarms(
+    format: str = Query(default="csv", pattern="^(csv|ndjson)$"),
+    conditions: List[Any] = Depends(alarm_filters),
+):
+    """按过滤条件（同 /alarms 列表）流式导出全部匹配报警"""
+    ts = datetime.now(timezone(timedelta(hours=8))).strftime("%Y%m%d_%H%M%S")
+    return StreamingResponse(
+        iter_alarm_export(conditions, format),
+        media_type=EXPORT_FORMATS[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="alarms_{ts}.{format}"',
+            "Cache-Control": "no-store",
+        },
+    )
+
+
+@router.get("/alarms/stats")
+async def get_alarm_stats(
+    startDate: Optional[str] = Query(default=""),
+    endDate: Optional[str] = Query(default=""),
+    videoId: Optional[UUID] = Query(default=None),
+    level: Optional[str] = Query(default=""),
+    bucket: str = Query(default="hour", pattern="^(hour|day)$"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """报警统计（按小时/天的直方图，及按防区、等级、视频源、目标类型的分布），读取聚合表"""
+    try:
+        start, end = parse_date_range(startDate, endDate)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="日期格式不正确，应为 YYYY-MM-DD")
+
+    data = await db.run_sync(alarm_stats, start=start, end=end, video_id=videoId, level=level, bucket=bucket)
+    return {"code": 0, "message": "ok", "data": data}
+
+
 @router.get("/alarms/unread/count")
-def get_unread_alarms_count(db: Session = Depends(get_sqlmodel_db)):
-    stmt = select(AlarmEvent).where(AlarmEvent.is_read == False)
-    count = len(db.exec(stmt).all())
+async def get_unread_alarms_count(db: AsyncSession = Depends(get_async_db)):
+    # 进程内缓存的未读计数，写入时维护
+    count = await db.run_sync(unread_counter.get)
     return {"code": 0, "message": "ok", "data": {"count": count}}
 
 
 @router.post("/alarms/mark-all-read")
-def mark_all_alarms_read(db: Session = Depends(get_sqlmodel_db)):
-    stmt = select(AlarmEvent).where(AlarmEvent.is_read == False)
-    unread = db.exec(stmt).all()
-    for a in unread:
-        a.is_read = True
-        db.add(a)
-    db.commit()
-    return {"code": 0, "message": "ok", "data": {"updated": len(unread)}}
+async def mark_all_alarms_read(db: AsyncSession = Depends(get_async_db)):
+    updated = await db.run_sync(mark_alarms, [])
+    await db.run_sync(publish_unread_count)
+    return {"code": 0, "message": "ok", "data": {"updated": updated}}
 
 
-@router.get("/alarms/{alarm_id}")
-def get_alarm_detail(alarm_id: str, db: Session = Depends(get_sqlmodel_db)):
-    cleaned = alarm_id.replace("#", "")
-    try:
-        uuid_obj = UUID(cleaned)
-    except Exception:
-        raise HTTPException(status_code=400, detail="告警 ID 格式不正确")
+@router.post("/alarms/read")
+async def mark_alarms_read(
+    all: bool = Query(default=False, description="不带过滤条件时须为 true（全部已读也可用 /alarms/mark-all-read）"),
+    conditions: List[Any] = Depends(alarm_filters),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """按过滤条件（同 /alarms 列表）批量标记已读"""
+    _require_filters(conditions, all)
+    updated = await db.run_sync(mark_alarms, conditions)
+    await db.run_sync(publish_unread_count)
+    return {"code": 0, "message": "ok", "data": {"updated": updated}}
+
+
+@router.post("/alarms/ack")
+async def ack_alarms(
+    all: bool = Query(default=False, description="不带过滤条件时须为 true"),
+    conditions: List[Any] = Depends(alarm_filters),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """按过滤条件（同 /alarms 列表）批量标记已处理"""
+    _require_filters(conditions, all)
+    updated = await db.run_sync(mark_alarms, conditions, ack=True)
+    await db.run_sync(publish_unread_count)
+    return {"code": 0, "message": "ok", "data": {"updated": updated}}
+
+
+@router.post("/alarms/{alarm_id}/read")
+async def mark_alarm_read(alarm_id: str, db: AsyncSession = Depends(get_async_db)):
+    uuid_obj = _parse_alarm_id(alarm_id)
+    if not await db.run_sync(get_alarm, uuid_obj):
+        raise HTTPException(status_code=404, detail="告警不存在")
+    updated = await db.run_sync(mark_alarms, [AlarmEvent.event_id == uuid_obj])
+    await db.run_sync(publish_unread_count)
+    return {"code": 0, "message": "ok", "data": {"updated": updated}}
 
-    alarm = db.get(AlarmEvent, uuid_obj)
+
+@router.post("/alarms/{alarm_id}/ack")
+async def ack_alarm(alarm_id: str, db: AsyncSession = Depends(get_async_db)):
+    uuid_obj = _parse_alarm_id(alarm_id)
+    if not await db.run_sync(get_alarm, uuid_obj):
+        raise HTTPException(status_code=404, detail="告警不存在")
+    updated = await db.run_sync(mark_alarms, [AlarmEvent.event_id == uuid_obj], ack=True)
+    await db.run_sync(publish_unread_count)
+    return {"code": 0, "message": "ok", "data": {"updated": updated}}
+
+
+@router.get("/alarms/{alarm_id}")
+async def get_alarm_detail(alarm_id: str, db: AsyncSession = Depends(get_async_db)):
+    alarm = await db.run_sync(get_alarm, _parse_alarm_id(alarm_id))
     if not alarm:
         raise HTTPException(status_code=404, detail="告警不存在")
 
-    # 详情页额外字段（zone、remark）暂为空，后续可扩展
+    zone = await db.get(Zone, alarm.zone_id) if alarm.zone_id else None
+
+    # 详情页额外字段（remark）暂为空，后续可扩展；trackId 可直接查 /videos/{videoId}/tracks/{trackId}
     return {
         "code": 0,
         "message": "ok",
@@ -108,8 +220,10 @@ def get_alarm_detail(alarm_id: str, db: Session = Depends(get_sqlmodel_db)):
             "time": alarm.video_timestamp,
             "target": alarm.object_type.value,
             "severity": "critical" if alarm.threat_level == 1 else "warning",
-            "status": "pending",
-            "zone": "",  # 暂时留空
+            "status": "done" if alarm.is_acked else "pending",
+            "zone": zone.name if zone else "",
+            "videoId": str(alarm.video_id),
+            "trackId": alarm.track_id,
             "remark": "",  # 暂时留空
         },
     }
\ No newline at end of file
@@ -1,11 +1,13 @@
 from __future__ import annotations
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core.auth import create_access_token, decode_token, verify_password
-from app.core.database import get_sqlmodel_db
+from app.core.database import get_async_db
 from app.models import User
 
 router = APIRouter(tags=["auth"])
@@ -15,11 +17,12 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/token")
 
 
 @router.post("/token")
-def token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_sqlmodel_db)):
+async def token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     stmt = select(User).where(User.username == form_data.username)
-    user = db.exec(stmt).first()
+    user = (await db.exec(stmt)).first()
 
-    if not user or not verify_password(form_data.password, user.password_hash):
+    # bcrypt 校验是 CPU 密集操作，放到线程池，避免阻塞事件循环
+    if not user or not await run_in_threadpool(verify_password, form_data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="用户名或密码错误",
@@ -31,11 +34,11 @@ def token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
 
 
 @router.get("/users/me")
-def read_users_me(token: str = Depends(oauth2_scheme), db: Session = Depends(get_sqlmodel_db)):
+async def read_users_me(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
     username = decode_token(token)
 
     stmt = select(User).where(User.username == username)
-    user = db.exec(stmt).first()
+    user = (await db.exec(stmt)).first()
     if not user:
         raise HTTPException(status_code=401, detail="用户不存在")
 
@@ -43,11 +46,11 @@ def read_users_me(token: str = Depends(oauth2_scheme), db: Session = Depends(get
 
 
 @router.get("/me")
-def read_me(token: str = Depends(oauth2_scheme), db: Session = Depends(get_sqlmodel_db)):
+async def read_me(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
     username = decode_token(token)
 
     stmt = select(User).where(User.username == username)
-    user = db.exec(stmt).first()
+    user = (await db.exec(stmt)).first()
     if not user:
         raise HTTPException(status_code=401, detail="用户不存在")
 
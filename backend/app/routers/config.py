@@ -4,11 +4,18 @@ from datetime import datetime, timezone
 from typing import Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.core.database import get_sqlmodel_db
+from app.core.config import settings as app_settings
+from app.core.database import get_async_db
 from app.models import SystemSettings, VideoSource, Zone
+from app.services.alarm_partitions import list_alarm_partitions, retention_boundary, run_alarm_maintenance_job
+from app.services.alarm_store import publish_unread_count, reconcile_video_alarms
+from app.services.settings_cache import system_settings_cache, update_system_settings
+from app.services.video_analysis import compute_alarms
 
 router = APIRouter(tags=["config"])
 
@@ -69,47 +76,35 @@ def _zone_to_dict(z: Zone) -> dict:
 
 
 @router.get("/sources")
-def list_sources(db: Session = Depends(get_sqlmodel_db)):
-    items = db.exec(select(VideoSource).order_by(VideoSource.upload_time.desc())).all()
+async def list_sources(db: AsyncSession = Depends(get_async_db)):
+    items = (await db.exec(select(VideoSource).order_by(VideoSource.upload_time.desc()))).all()
     return {"code": 0, "message": "ok", "data": [_source_to_dict(x) for x in items]}
 
 
+def _status_to_dict(settings: SystemSettings) -> dict:
+    return {
+        "online": settings.online,
+        "version": settings.version,
+        "fps": settings.fps,
+        "currentSourceId": str(settings.current_source_id) if settings.current_source_id else "",
+    }
+
+
 @router.get("/system/status")
-def get_system_status(db: Session = Depends(get_sqlmodel_db)):
-    settings = db.get(SystemSettings, 1)
-    if not settings:
-        settings = SystemSettings(id=1)
-        db.add(settings)
-        db.commit()
-        db.refresh(settings)
-
-    current = settings.current_source_id
-    if not current:
-        latest = db.exec(select(VideoSource).order_by(VideoSource.upload_time.desc())).first()
+async def get_system_status(db: AsyncSession = Depends(get_async_db)):
+    settings = await db.run_sync(system_settings_cache.get)
+
+    if not settings.current_source_id:
+        latest = (await db.exec(select(VideoSource.video_id).order_by(VideoSource.upload_time.desc()))).first()
         if latest:
-            current = latest.video_id
-            settings.current_source_id = current
-            db.add(settings)
-            db.commit()
+            settings = await db.run_sync(update_system_settings, current_source_id=latest)
 
-    return {
-        "code": 0,
-        "message": "ok",
-        "data": {
-            "online": settings.online,
-            "version": settings.version,
-            "fps": settings.fps,
-            "currentSourceId": str(current) if current else "",
-        },
-    }
+    return {"code": 0, "message": "ok", "data": _status_to_dict(settings)}
 
 
 @router.put("/system/status")
-def update_system_status(patch: dict, db: Session = Depends(get_sqlmodel_db)):
-    settings = db.get(SystemSettings, 1)
-    if not settings:
-        settings = SystemSettings(id=1)
-        db.add(settings)
+async def update_system_status(patch: dict, db: AsyncSession = Depends(get_async_db)):
+    values = {}
 
     current = patch.get("currentSourceId")
     if current is not None:
@@ -118,55 +113,91 @@ def update_system_status(patch: dict, db: Session = Depends(get_sqlmodel_db)):
         except Exception:
             raise HTTPException(status_code=400, detail="currentSourceId 格式不正确")
 
-        exists = db.exec(select(VideoSource).where(VideoSource.video_id == source_uuid)).first()
+        exists = (await db.exec(select(VideoSource.video_id).where(VideoSource.video_id == source_uuid))).first()
         if not exists:
             raise HTTPException(status_code=400, detail="currentSourceId 不存在")
 
-        settings.current_source_id = source_uuid
+        values["current_source_id"] = source_uuid
 
     if "online" in patch:
-        settings.online = bool(patch["online"])
+        values["online"] = bool(patch["online"])
     if "fps" in patch:
-        settings.fps = int(patch["fps"])
+        values["fps"] = int(patch["fps"])
     if "version" in patch:
-        settings.version = str(patch["version"])
+        values["version"] = str(patch["version"])
+
+    # 单条 upsert；切换当前源时 is_demo 同步为单条 UPDATE
+    settings = await db.run_sync(update_system_settings, **values)
+
+    return {"code": 0, "message": "ok", "data": _status_to_dict(settings)}
 
-    db.add(settings)
-    db.commit()
-    db.refresh(settings)
 
-    if settings.current_source_id:
-        all_videos = db.exec(select(VideoSource)).all()
-        for v in all_videos:
-            v.is_demo = v.video_id == settings.current_source_id
-            db.add(v)
-        db.commit()
+@router.get("/system/cache")
+def get_cache_stats():
+    from app.services.analysis_cache import analysis_cache
 
+    return {"code": 0, "message": "ok", "data": analysis_cache.stats()}
+
+
+@router.get("/system/db-metrics")
+def get_db_metrics(top: int = Query(default=50, ge=1, le=500)):
+    """数据库指标：语句模板耗时直方图（按总耗时排序取前 top 条）、连接池借出等待、各路由查询次数、疑似 N+1、慢查询"""
+    from app.core.db_metrics import db_metrics
+
+    return {"code": 0, "message": "ok", "data": db_metrics.snapshot(top)}
+
+
+@router.delete("/system/db-metrics")
+def reset_db_metrics():
+    from app.core.db_metrics import db_metrics
+
+    db_metrics.reset()
+    return {"code": 0, "message": "ok", "data": True}
+
+
+@router.get("/system/alarm-partitions")
+async def get_alarm_partitions(db: AsyncSession = Depends(get_async_db)):
+    """报警表的月分区（起止时间、估算行数）与保留策略"""
+    partitions = await db.run_sync(list_alarm_partitions)
+    boundary = retention_boundary()
     return {
         "code": 0,
         "message": "ok",
         "data": {
-            "online": settings.online,
-            "version": settings.version,
-            "fps": settings.fps,
-            "currentSourceId": str(settings.current_source_id) if settings.current_source_id else "",
+            "retentionDays": app_settings.ALARM_RETENTION_DAYS,
+            "retentionBoundary": boundary.isoformat() if boundary else None,
+            "partitions": [
+                {
+                    **p,
+                    "start": p["start"].isoformat() if p["start"] else None,
+                    "end": p["end"].isoformat() if p["end"] else None,
+                }
+                for p in partitions
+            ],
         },
     }
 
 
+@router.post("/system/alarm-partitions/maintenance")
+async def run_alarm_partition_maintenance():
+    """立即执行一次分区维护：删除（并归档）过期分区、补建分区"""
+    result = await run_in_threadpool(run_alarm_maintenance_job)
+    return {"code": 0, "message": "ok", "data": result}
+
+
 @router.get("/zones")
-def list_zones(sourceId: str, db: Session = Depends(get_sqlmodel_db)):
+async def list_zones(sourceId: str, db: AsyncSession = Depends(get_async_db)):
     try:
         source_uuid = UUID(sourceId)
     except Exception:
         raise HTTPException(status_code=400, detail="sourceId 格式不正确")
 
-    items = db.exec(select(Zone).where(Zone.source_id == source_uuid)).all()
+    items = (await db.exec(select(Zone).where(Zone.source_id == source_uuid))).all()
     return {"code": 0, "message": "ok", "data": [_zone_to_dict(x) for x in items]}
 
 
 @router.post("/zones")
-def create_zone(sourceId: str, payload: dict, db: Session = Depends(get_sqlmodel_db)):
+async def create_zone(sourceId: str, payload: dict, db: AsyncSession = Depends(get_async_db)):
     try:
         source_uuid = UUID(sourceId)
     except Exception:
@@ -191,15 +222,15 @@ def create_zone(sourceId: str, payload: dict, db: Session = Depends(get_sqlmodel
     )
 
     db.add(row)
-    db.commit()
-    db.refresh(row)
+    await db.commit()
+    await db.refresh(row)
 
     return {"code": 0, "message": "ok", "data": _zone_to_dict(row)}
 
 
 @router.put("/zones/{zone_id}")
-def update_zone(zone_id: str, patch: dict, db: Session = Depends(get_sqlmodel_db)):
-    row = db.get(Zone, zone_id)
+async def update_zone(zone_id: str, patch: dict, db: AsyncSession = Depends(get_async_db)):
+    row = await db.get(Zone, zone_id)
     if not row:
         raise HTTPException(status_code=404, detail="区域不存在")
 
@@ -218,26 +249,26 @@ def update_zone(zone_id: str, patch: dict, db: Session = Depends(get_sqlmodel_db
         row.polygon_points = _to_norm_points(pts)
 
     db.add(row)
-    db.commit()
-    db.refresh(row)
+    await db.commit()
+    await db.refresh(row)
 
     return {"code": 0, "message": "ok", "data": _zone_to_dict(row)}
 
 
 @router.delete("/zones/{zone_id}")
-def delete_zone(zone_id: str, db: Session = Depends(get_sqlmodel_db)):
-    row = db.get(Zone, zone_id)
+async def delete_zone(zone_id: str, db: AsyncSession = Depends(get_async_db)):
+    row = await db.get(Zone, zone_id)
     if not row:
         raise HTTPException(status_code=404, detail="区域不存在")
 
-    db.delete(row)
-    db.commit()
+    await db.delete(row)
+    await db.commit()
 
     return {"code": 0, "message": "ok", "data": True}
 
 
 @router.post("/config/save")
-def save_config(sourceId: Optional[str] = None, db: Session = Depends(get_sqlmodel_db)):
+async def save_config(sourceId: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
     if not sourceId:
         raise HTTPException(status_code=400, detail="sourceId 必需")
 
@@ -246,27 +277,23 @@ def save_config(sourceId: Optional[str] = None, db: Session = Depends(get_sqlmod
     except Exception:
         raise HTTPException(status_code=400, detail="sourceId 格式不正确")
 
-    video = db.get(VideoSource, source_uuid)
+    video = await db.get(VideoSource, source_uuid)
     if not video:
         raise HTTPException(status_code=404, detail="视频不存在")
 
     if not video.raw_tracks_path:
         raise HTTPException(status_code=400, detail="该视频尚未完成特征提取，请稍后再试")
 
-    zones = db.exec(select(Zone).where(Zone.source_id == source_uuid)).all()
+    zones = (await db.exec(select(Zone).where(Zone.source_id == source_uuid))).all()
     zones_payload = [
         {"id": z.id, "name": z.name, "type": z.type, "points": z.polygon_points}
         for z in zones
     ]
 
-    from app.models import AlarmEvent, ObjectType, ThreatLevel
-    from app.core.database import sync_engine
-    from app.services.video_analysis import compute_alarms
-    from sqlalchemy import delete
-    from sqlmodel import Session
-
     analysis_json_path = f"analysis_results/{video.video_id}.json"
-    result = compute_alarms(
+    # 重算报警（读轨迹、判定、写分析结果文件）是 CPU/文件密集操作，放到线程池
+    result = await run_in_threadpool(
+        compute_alarms,
         video_id=str(video.video_id),
         video_path=video.file_path,
         raw_tracks_path=video.raw_tracks_path,
@@ -274,23 +301,13 @@ def save_config(sourceId: Optional[str] = None, db: Session = Depends(get_sqlmod
         output_analysis_json_path=analysis_json_path,
     )
 
-    with Session(sync_engine) as tx:
-        tx.exec(delete(AlarmEvent).where(AlarmEvent.video_id == video.video_id))
-        for ev in result.get("alarm_events") or []:
-            alarm = AlarmEvent(
-                event_id=UUID(ev["event_id"]),
-                video_id=UUID(ev["video_id"]),
-                video_timestamp=ev["video_timestamp"],
-                object_type=ObjectType.PERSON if ev["object_type"] == "Person" else ObjectType.VEHICLE,
-                threat_level=ThreatLevel.CRITICAL if ev["threat_level"] == "CRITICAL" else ThreatLevel.WARNING,
-                snapshot_path=ev.get("snapshot_path") or "",
-            )
-            tx.add(alarm)
-        tx.commit()
+    # 与已有报警做差异同步：保留已读状态，只写入变化的部分（新增走 COPY / 多行 INSERT）
+    diff = await db.run_sync(reconcile_video_alarms, video.video_id, result.get("alarm_events") or [])
+    await db.run_sync(publish_unread_count)
 
     video.analysis_json_path = analysis_json_path
     db.add(video)
-    db.commit()
+    await db.commit()
 
     return {
         "code": 0,
@@ -299,5 +316,6 @@ def save_config(sourceId: Optional[str] = None, db: Session = Depends(get_sqlmod
             "sourceId": sourceId,
             "savedAt": datetime.now(tz=timezone.utc).isoformat(),
             "alarmCount": result.get("alarm_count", 0),
+            "alarmDiff": diff,
         },
     }
@@ -1,35 +1,79 @@
 from __future__ import annotations
 
-import json
+import gzip
 import os
+from email.utils import formatdate, parsedate_to_datetime
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import JSONResponse
-from sqlmodel import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.core.database import get_sqlmodel_db
+from app.core.config import settings
+from app.core.database import get_async_db
 from app.models import AnalysisStatus, VideoSource
+from app.services.analysis_cache import load_serialized
+from app.services.recent_events import recent_alarms
+from app.services.settings_cache import system_settings_cache
+from app.services.overlay_store import (
+    HAS_MSGPACK,
+    encode_overlay_delta,
+    overlay_body,
+    pick_compressed_overlays,
+    read_overlay_window,
+)
 
 router = APIRouter(tags=["dashboard"])
 
+OVERLAY_MEDIA_TYPES = {"json": "application/json", "delta": "application/json", "msgpack": "application/x-msgpack"}
+
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    """条件请求判断：If-None-Match 优先（弱比较），其次 If-Modified-Since"""
+    inm = request.headers.get("if-none-match")
+    if inm:
+        tags = {t.strip().removeprefix("W/") for t in inm.split(",")}
+        return "*" in tags or etag.removeprefix("W/") in tags
+
+    ims = request.headers.get("if-modified-since")
+    if ims:
+        try:
+            return int(mtime) <= int(parsedate_to_datetime(ims).timestamp())
+        except (TypeError, ValueError):
+            return False
+    return False
+
 
 @router.get("/dashboard/events")
-def get_dashboard_events(limit: int = 20, db: Session = Depends(get_sqlmodel_db)):
-    return {"code": 0, "message": "ok", "data": []}
+async def get_dashboard_events(
+    limit: int = Query(default=20, ge=1, le=100),
+    sourceId: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """当前源最近 N 条报警（含防区名称），直接读内存缓冲"""
+    if not sourceId:
+        settings_row = await db.run_sync(system_settings_cache.get)
+        sourceId = str(settings_row.current_source_id) if settings_row.current_source_id else ""
+    if not sourceId:
+        return {"code": 0, "message": "ok", "data": []}
+
+    return {"code": 0, "message": "ok", "data": recent_alarms.latest(sourceId, limit)}
 
 
 @router.get("/dashboard/overlays")
-def get_dashboard_overlays(
+async def get_dashboard_overlays(
+    request: Request,
     video_id: Optional[str] = None,
     sourceId: Optional[str] = None,
-    db: Session = Depends(get_sqlmodel_db),
+    format: str = Query(default="json", pattern="^(json|delta|msgpack)$"),
+    db: AsyncSession = Depends(get_async_db),
 ):
     target_id = video_id or sourceId
     if not target_id:
         return {"code": 0, "message": "ok", "data": {"boxes": []}}
 
-    video = db.get(VideoSource, target_id)
+    video = await db.get(VideoSource, target_id)
     if not video:
         raise HTTPException(status_code=404, detail="视频不存在")
 
@@ -39,12 +83,102 @@ def get_dashboard_overlays(
     if not video.analysis_json_path or not os.path.exists(video.analysis_json_path):
         raise HTTPException(status_code=404, detail="分析结果文件不存在")
 
-    try:
-        with open(video.analysis_json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+    if format == "msgpack" and not HAS_MSGPACK:
+        raise HTTPException(status_code=406, detail="服务端未安装 msgpack，无法提供二进制编码")
+
+    # 校验器取自分析结果文件：重新保存防区（重算）后自动变化
+    st = os.stat(video.analysis_json_path)
+    headers = {
+        "ETag": f'W/"{st.st_mtime_ns:x}-{st.st_size:x}-{format}"',
+        "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+    }
+    if _not_modified(request, headers["ETag"], st.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    def build(data: dict) -> dict:
         # 兼容新旧结构：新结构是 {overlays: [...]}，旧结构可能是 {frames: [...]}
         overlays = data.get("overlays") or data.get("frames") or []
         zones = data.get("zones") or []
         return {"code": 0, "message": "ok", "data": {"overlays": overlays, "zones": zones}}
+
+    def render() -> Response:
+        media_type = OVERLAY_MEDIA_TYPES[format]
+        artifact, encoding = pick_compressed_overlays(
+            video.analysis_json_path, format, request.headers.get("accept-encoding", "")
+        )
+        # 客户端接受压缩：直接回传预压缩文件，不做任何解析/序列化/压缩
+        if artifact and encoding != "identity":
+            return FileResponse(artifact, media_type=media_type, headers={**headers, "Content-Encoding": encoding})
+
+        if format == "json":
+            # 序列化后的响应体按 path + mtime 缓存，多个大屏轮询同一视频时不再重复解析
+            body = load_serialized(video.analysis_json_path, "dashboard-overlays", build)
+        elif artifact:
+            with open(artifact, "rb") as f:
+                body = gzip.decompress(f.read())
+        else:
+            # 预压缩文件不可用（如目录不可写、磁盘已满）：现场编码
+            body = overlay_body(video.analysis_json_path, format)
+        return Response(content=body, media_type=media_type, headers=headers)
+
+    try:
+        # 读文件 / 解析 / 解压在线程池中执行，不阻塞事件循环
+        return await run_in_threadpool(render)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"读取分析结果失败: {e}")
+
+
+@router.get("/dashboard/overlays/window")
+async def get_dashboard_overlay_window(
+    start: float = Query(default=0.0, ge=0),
+    end: Optional[float] = Query(default=None),
+    video_id: Optional[str] = None,
+    sourceId: Optional[str] = None,
+    format: str = Query(default="json", pattern="^(json|delta)$"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """按 [start, end) 时间窗口返回 overlays，供播放器边播边预取、拖动时就近加载
+
+    format=delta 时以增量编码返回（data.delta，窗口内首帧为完整值），不再返回 data.overlays。
+    """
+    target_id = video_id or sourceId
+    if not target_id:
+        return {"code": 0, "message": "ok", "data": {"overlays": [], "zones": []}}
+
+    video = await db.get(VideoSource, target_id)
+    if not video:
+        raise HTTPException(status_code=404, detail="视频不存在")
+
+    if video.analysis_status != AnalysisStatus.COMPLETED:
+        raise HTTPException(status_code=202, detail="分析尚未完成")
+
+    if not video.analysis_json_path or not os.path.exists(video.analysis_json_path):
+        raise HTTPException(status_code=404, detail="分析结果文件不存在")
+
+    max_end = start + settings.OVERLAY_WINDOW_MAX_SECONDS
+    end = max_end if end is None else min(end, max_end)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end 必须大于 start")
+
+    try:
+        window = await run_in_threadpool(read_overlay_window, video.analysis_json_path, start, end)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"读取分析结果失败: {e}")
+
+    header = window["header"]
+    data = {
+        "start": start,
+        "end": end,
+        "nextTimestamp": window["next_timestamp"],
+        "fps": header.get("fps"),
+        "frameCount": header.get("frame_count"),
+        "zones": header.get("zones") or [],
+    }
+    if format == "delta":
+        data["encoding"] = "delta"
+        data["delta"] = encode_overlay_delta(window["overlays"])
+    else:
+        data["overlays"] = window["overlays"]
+    return {"code": 0, "message": "ok", "data": data}
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import json
+import time
+from typing import List, Optional
+
+from fastapi import APIRouter, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+from app.core.events import event_bus
+
+router = APIRouter(tags=["stream"])
+
+# 无消息时的心跳间隔（秒）：保持代理连接不被断开，并及时发现已断开的客户端
+HEARTBEAT_SECONDS = 15.0
+
+
+def _parse_topics(topics: Optional[str]) -> Optional[List[str]]:
+    if not topics:
+        return None
+    return [t.strip() for t in topics.split(",") if t.strip()]
+
+
+@router.get("/stream/events")
+async def stream_events(request: Request, topics: Optional[str] = None, videoId: Optional[str] = None):
+    """Server-Sent Events 推送：topics 逗号分隔（默认全部），videoId 可选，只推该视频相关消息"""
+
+    async def gen():
+        with event_bus.subscribe(_parse_topics(topics), videoId) as sub:
+            # 断线后浏览器 EventSource 3s 自动重连
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                msg = await sub.get(timeout=HEARTBEAT_SECONDS)
+                if msg is None:
+                    yield ": ping\n\n"
+                    continue
+                payload = json.dumps(msg, ensure_ascii=False, separators=(",", ":"))
+                yield f"id: {msg['id']}\nevent: {msg['topic']}\ndata: {payload}\n\n"
+
+    return StreamingResponse(
+        gen(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/ws")
+async def ws_events(websocket: WebSocket, topics: Optional[str] = None, videoId: Optional[str] = None):
+    """WebSocket 推送：消息格式与 SSE 的 data 一致 {id, topic, ts, data, videoId?}"""
+    await websocket.accept()
+    with event_bus.subscribe(_parse_topics(topics), videoId) as sub:
+        try:
+            while True:
+                msg = await sub.get(timeout=HEARTBEAT_SECONDS)
+                await websocket.send_json(msg or {"topic": "ping", "ts": time.time()})
+        except WebSocketDisconnect:
+            pass
@@ -1,18 +1,55 @@
 import os
+import shutil
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Optional, List
+from typing import BinaryIO, Optional, List
 from uuid import UUID
 
-import cv2
-from fastapi import APIRouter, BackgroundTasks, Depends, File, HTTPException, UploadFile
-from sqlmodel import Session, select
+from fastapi import APIRouter, BackgroundTasks, Depends, File, Header, HTTPException, Query, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core.config import settings
-from app.core.database import get_sqlmodel_db, sync_engine
-from app.models import AlarmEvent, AnalysisStatus, SystemSettings, VideoSource, Zone, ZoneConfig
-from sqlalchemy import delete
+from app.core.database import get_async_db, sync_engine
+from app.core.events import TOPIC_ANALYSIS_STATUS, event_bus
+from app.models import AnalysisStatus, UploadSession, VideoSource
+from app.services.alarm_query import get_alarm
+from app.services.chunked_upload import (
+    allocate_temp_file,
+    chunk_count,
+    chunk_length,
+    claim_upload,
+    create_upload_session,
+    delete_upload_session,
+    finish_upload,
+    move_back_to_temp,
+    move_to_upload_dir,
+    received_chunks,
+    record_chunk,
+    release_upload,
+    remove_expired_uploads_job,
+    remove_temp_file,
+    upload_status,
+    write_chunk,
+)
+from app.services.media_probe import probe_media, quality_label
+from app.services.overlay_store import remove_overlay_artifacts
+from app.services.recent_events import recent_alarms
+from app.services.settings_cache import notify_settings_changed, system_settings_cache, update_system_settings
+from app.services.track_index import find_tracks, load_track_index
+from app.services.unread_counter import notify_unread_changed, unread_counter
 from app.services.video_analysis import analyze_video
+from app.services.video_export import (
+    create_export_job,
+    export_annotated_video,
+    export_output_path,
+    get_export_job,
+    submit_export,
+    update_export_job,
+)
+from app.services.video_playback import prepare_playback, remove_playback, submit_playback
+from app.services.video_thumbnails import generate_thumbnail_sprite, poster_url, remove_thumbnails, static_url
 
 router = APIRouter(tags=["videos"])
 
@@ -39,6 +76,11 @@ def _format_duration(seconds: float) -> str:
     return f"{h:02d}:{m:02d}:{s:02d}"
 
 
+def _publish_analysis_status(video_id, status: AnalysisStatus) -> None:
+    vid = str(video_id)
+    event_bus.publish(TOPIC_ANALYSIS_STATUS, {"videoId": vid, "status": status.value}, video_id=vid)
+
+
 def _to_beijing(dt: datetime) -> datetime:
     """将 naive/aware datetime 转为北京时间（UTC+8）再用于展示。"""
     if dt.tzinfo is None:
@@ -55,69 +97,116 @@ def _to_ui_dict(v: VideoSource) -> dict:
         "id": str(v.video_id),
         "name": v.file_name,
         "ext": (v.ext or "").upper(),
-        "quality": "",  # 暂时留空，可后续从视频元数据解析
-        "size": v.size,
+        "quality": quality_label(v.height),
+        "size": _format_size(v.size_bytes),
         "duration": _format_duration(v.duration),
+        # 上传时探测的元数据（不打开文件）
+        "sizeBytes": v.size_bytes,
+        "durationSeconds": v.duration,
+        "width": v.width,
+        "height": v.height,
+        "videoCodec": v.video_codec,
+        "audioCodec": v.audio_codec,
+        "fps": v.fps,
+        "frameCount": v.frame_count,
+        "bitRate": v.bit_rate,
         "uploadAt": upload_at,
         "isDemo": v.is_demo,
-        "previewUrl": f"/static/uploads/{Path(v.file_path).name}",
+        # 播放用 fast-start MP4 生成前（或无法生成时）播放源文件
+        "previewUrl": static_url(v.playback_path) or f"/static/uploads/{Path(v.file_path).name}",
+        "originalUrl": f"/static/uploads/{Path(v.file_path).name}",
+        # 悬停拖动预览：索引 JSON（含雪碧图 URL、每格时间戳）；生成前为 None
+        "spriteIndexUrl": static_url(v.sprite_index_path),
+        "thumbnailUrl": poster_url(v.sprite_index_path),
     }
 
 
-@router.post("/videos/upload")
-async def upload_video(
-    background_tasks: BackgroundTasks,
-    file: UploadFile = File(...),
-    db: Session = Depends(get_sqlmodel_db),
-):
-    filename = file.filename or ""
-    ext = os.path.splitext(filename)[1].lower()
-    if ext not in ALLOWED_EXT:
-        raise HTTPException(status_code=400, detail=f"不支持的文件格式：{ext}")
+def _save_upload(src: BinaryIO, save_path: str) -> int:
+    """把已接收的上传内容（Starlette 的临时文件）复制到上传目录，返回字节数"""
+    src.seek(0)
+    with open(save_path, "wb") as dst:
+        shutil.copyfileobj(src, dst, settings.UPLOAD_CHUNK_SIZE)
+        return dst.tell()
 
-    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
 
+def _remove_partial_upload(save_path: str) -> None:
+    try:
+        os.remove(save_path)
+    except FileNotFoundError:
+        pass
+
+
+def _upload_save_path(safe_name: str) -> str:
     # 文件名用北京时间时间戳，方便与前端显示一致
     ts = datetime.utcnow().replace(tzinfo=timezone.utc).astimezone(timezone(timedelta(hours=8))).strftime(
         "%Y%m%d_%H%M%S"
     )
-    safe_name = os.path.basename(filename)
-    save_path = str(Path(settings.UPLOAD_DIR) / f"{ts}_{safe_name}")
+    return str(Path(settings.UPLOAD_DIR) / f"{ts}_{safe_name}")
 
-    size_bytes = 0
-    try:
-        with open(save_path, "wb") as f:
-            while True:
-                chunk = await file.read(1024 * 1024)  # 1MB chunks
-                if not chunk:
-                    break
-                size_bytes += len(chunk)
-                f.write(chunk)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"保存文件失败: {e}")
 
-    cap = cv2.VideoCapture(save_path)
-    duration_sec = 0.0
-    if cap.isOpened():
-        fps = cap.get(cv2.CAP_PROP_FPS) or 0
-        frames = cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0
-        if fps > 0:
-            duration_sec = float(frames / fps)
-    cap.release()
+def _check_ext(filename: str) -> str:
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in ALLOWED_EXT:
+        raise HTTPException(status_code=400, detail=f"不支持的文件格式：{ext}")
+    return ext
+
+
+async def _create_video_source(
+    db: AsyncSession,
+    background_tasks: BackgroundTasks,
+    safe_name: str,
+    ext: str,
+    save_path: str,
+) -> VideoSource:
+    """文件已完整落盘后：探测一次媒体元数据、写入 VideoSource，并注册缩略图、播放副本与分析后台任务"""
+    metadata = await run_in_threadpool(probe_media, save_path)
 
     row = VideoSource(
         file_name=safe_name,
         file_path=save_path,
-        duration=duration_sec,
         ext=ext.replace(".", ""),
-        size=_format_size(size_bytes),
         is_demo=False,
         analysis_status=AnalysisStatus.PROCESSING,
+        **metadata,
     )
     db.add(row)
-    db.commit()
-    db.refresh(row)
+    await db.commit()
+    await db.refresh(row)
+    _publish_analysis_status(row.video_id, AnalysisStatus.PROCESSING)
 
+    # 注册后台任务：缩略图雪碧图（先于分析执行，耗时远小于分析，列表页可尽快显示预览）
+    def run_thumbnails():
+        from sqlmodel import Session
+
+        try:
+            index_path = generate_thumbnail_sprite(save_path, str(row.video_id), metadata)
+            with Session(sync_engine) as db2:
+                video = db2.get(VideoSource, str(row.video_id))
+                if video:
+                    video.sprite_index_path = index_path
+                    db2.add(video)
+                    db2.commit()
+        except Exception as e:
+            print(f"缩略图生成失败: {e}")
+
+    # 播放用 fast-start MP4（浏览器可播的 MP4 只移动 moov，其他格式有 ffmpeg 时转码）：
+    # 转码可能与分析同样耗时，放在独立线程执行，不排在分析任务之前
+    def run_playback():
+        from sqlmodel import Session
+
+        try:
+            playback_path = prepare_playback(
+                save_path, str(row.video_id), metadata["video_codec"], metadata["audio_codec"]
+            )
+            if playback_path:
+                with Session(sync_engine) as db2:
+                    video = db2.get(VideoSource, str(row.video_id))
+                    if video:
+                        video.playback_path = playback_path
+                        db2.add(video)
+                        db2.commit()
+        except Exception as e:
+            print(f"播放副本生成失败: {e}")
 
     # 注册后台任务：视频分析
     def run_analysis():
@@ -127,6 +216,7 @@ async def upload_video(
             result = analyze_video(
                 video_path=save_path,
                 video_id=str(row.video_id),
+                metadata=metadata,
             )
 
             # 第一阶段完成：写入 raw_tracks_path，并标记为 COMPLETED（表示特征提取完成）
@@ -137,6 +227,7 @@ async def upload_video(
                     video.raw_tracks_path = result.get("raw_tracks_path")
                     db2.add(video)
                     db2.commit()
+            _publish_analysis_status(row.video_id, AnalysisStatus.COMPLETED)
         except Exception as e:
             # 失败则标记为失败状态
             with Session(sync_engine) as db2:
@@ -145,23 +236,197 @@ async def upload_video(
                     video.analysis_status = AnalysisStatus.FAILED
                     db2.add(video)
                     db2.commit()
+            _publish_analysis_status(row.video_id, AnalysisStatus.FAILED)
             print(f"分析任务失败: {e}")
 
-    # 将任务注册到 BackgroundTasks（在响应返回后执行）
+    # 将任务注册到 BackgroundTasks（在响应返回后按顺序执行）；播放副本由独立线程生成
+    background_tasks.add_task(run_thumbnails)
     background_tasks.add_task(run_analysis)
+    submit_playback(run_playback)
+
+    return row
+
+
+@router.post("/videos/upload")
+async def upload_video(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_async_db),
+):
+    filename = file.filename or ""
+    ext = _check_ext(filename)
+
+    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+    safe_name = os.path.basename(filename)
+    save_path = _upload_save_path(safe_name)
 
+    # 文件复制与元数据探测都是阻塞调用，放到线程池执行，上传大文件时其他请求不受影响
+    try:
+        await run_in_threadpool(_save_upload, file.file, save_path)
+    except Exception as e:
+        await run_in_threadpool(_remove_partial_upload, save_path)
+        raise HTTPException(status_code=500, detail=f"保存文件失败: {e}")
+
+    row = await _create_video_source(db, background_tasks, safe_name, ext, save_path)
     return {"code": 0, "message": "ok", "data": _to_ui_dict(row)}
 
 
+# ---- 分片上传（可续传、可并行）：POST /videos/uploads -> PUT .../chunks/{offset} -> POST .../complete ----
+
+
+async def _get_upload_session(upload_id: str, db: AsyncSession) -> UploadSession:
+    try:
+        upload_uuid = UUID(upload_id)
+    except Exception:
+        raise HTTPException(status_code=404, detail="上传会话不存在")
+    upload = await db.get(UploadSession, upload_uuid)
+    if not upload:
+        raise HTTPException(status_code=404, detail="上传会话不存在或已过期")
+    return upload
+
+
+async def _read_body(request: Request, limit: int) -> bytes:
+    """读取请求体，超过 limit 字节立即拒绝（不把超大请求读入内存）"""
+    body = bytearray()
+    async for part in request.stream():
+        body += part
+        if len(body) > limit:
+            raise HTTPException(status_code=413, detail="分片大小超出会话约定的 chunkSize")
+    return bytes(body)
+
+
+@router.post("/videos/uploads")
+async def create_upload(payload: dict, db: AsyncSession = Depends(get_async_db)):
+    """创建分片上传会话：{fileName, size, chunkSize?}；客户端保存返回的 uploadId，断线后据此续传"""
+    filename = os.path.basename(str(payload.get("fileName") or ""))
+    ext = _check_ext(filename)
+    try:
+        total_size = int(payload.get("size"))
+        chunk_size = int(payload.get("chunkSize") or settings.UPLOAD_SESSION_CHUNK_SIZE)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="size / chunkSize 必须为整数")
+    if total_size <= 0:
+        raise HTTPException(status_code=400, detail="size 必须大于 0")
+    if not 0 < chunk_size <= settings.UPLOAD_SESSION_MAX_CHUNK_SIZE:
+        raise HTTPException(
+            status_code=400, detail=f"chunkSize 须在 1 ~ {settings.UPLOAD_SESSION_MAX_CHUNK_SIZE} 字节之间"
+        )
+
+    # 顺带清理过期的未完成上传（会话数很少）
+    await run_in_threadpool(remove_expired_uploads_job)
+
+    upload = await db.run_sync(create_upload_session, filename, ext.replace(".", ""), total_size, chunk_size)
+    try:
+        await run_in_threadpool(allocate_temp_file, upload.temp_path, total_size)
+    except Exception as e:
+        await db.run_sync(delete_upload_session, upload.upload_id)
+        raise HTTPException(status_code=500, detail=f"创建临时文件失败: {e}")
+
+    return {"code": 0, "message": "ok", "data": upload_status(upload, [])}
+
+
+@router.get("/videos/uploads/{upload_id}")
+async def get_upload(upload_id: str, db: AsyncSession = Depends(get_async_db)):
+    """上传进度：已收到的分片序号，续传时只需补传其余分片"""
+    upload = await _get_upload_session(upload_id, db)
+    received = await db.run_sync(received_chunks, upload.upload_id)
+    return {"code": 0, "message": "ok", "data": upload_status(upload, received)}
+
+
+@router.put("/videos/uploads/{upload_id}/chunks/{offset}")
+async def put_upload_chunk(
+    upload_id: str,
+    offset: int,
+    request: Request,
+    x_chunk_sha256: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """写入一个分片：请求体为原始字节，offset 须为 chunkSize 的整数倍；
+    可带 X-Chunk-Sha256 头校验内容，服务端记录每个分片的 SHA-256。同一分片可重复上传（覆盖）。"""
+    upload = await _get_upload_session(upload_id, db)
+    if upload.completed_at is not None:
+        raise HTTPException(status_code=409, detail="上传已完成")
+    if offset < 0 or offset >= upload.total_size or offset % upload.chunk_size:
+        raise HTTPException(status_code=400, detail="offset 须为 chunkSize 的整数倍且小于文件大小")
+
+    index = offset // upload.chunk_size
+    expected = chunk_length(upload, index)
+    data = await _read_body(request, expected)
+    if len(data) != expected:
+        raise HTTPException(status_code=400, detail=f"分片长度不正确：期望 {expected} 字节，实际 {len(data)} 字节")
+
+    # 哈希与写盘在线程池执行，多个分片并行上传时互不阻塞
+    try:
+        digest = await run_in_threadpool(write_chunk, upload.temp_path, offset, data, x_chunk_sha256)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError:
+        raise HTTPException(status_code=409, detail="上传会话的临时文件不存在，请重新上传")
+    await db.run_sync(record_chunk, upload.upload_id, index, expected, digest)
+
+    return {"code": 0, "message": "ok", "data": {"index": index, "offset": offset, "size": expected, "sha256": digest}}
+
+
+@router.post("/videos/uploads/{upload_id}/complete")
+async def complete_upload(upload_id: str, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_async_db)):
+    """所有分片到齐后合并：临时文件移入上传目录并创建视频，此时才开始缩略图与分析任务"""
+    upload = await _get_upload_session(upload_id, db)
+
+    if upload.video_id:
+        # 重复提交（如上次响应丢失）：直接返回已生成的视频
+        video = await db.get(VideoSource, upload.video_id)
+        if video:
+            return {"code": 0, "message": "ok", "data": _to_ui_dict(video)}
+    if upload.completed_at is not None:
+        raise HTTPException(status_code=409, detail="上传正在合并或生成的视频已删除")
+
+    received = await db.run_sync(received_chunks, upload.upload_id)
+    missing = chunk_count(upload) - len(received)
+    if missing:
+        raise HTTPException(status_code=400, detail=f"还有 {missing} 个分片未上传")
+
+    if not await db.run_sync(claim_upload, upload.upload_id):
+        raise HTTPException(status_code=409, detail="上传正在合并")
+
+    save_path = _upload_save_path(upload.file_name)
+    try:
+        await run_in_threadpool(move_to_upload_dir, upload.temp_path, save_path)
+    except Exception as e:
+        await db.run_sync(release_upload, upload.upload_id)
+        raise HTTPException(status_code=500, detail=f"保存文件失败: {e}")
+
+    upload_id, temp_path = upload.upload_id, upload.temp_path
+    try:
+        row = await _create_video_source(db, background_tasks, upload.file_name, "." + upload.ext, save_path)
+    except Exception as e:
+        # 撤销 claim 并把文件移回，否则会话永远停在“正在合并”，文件也成了孤儿
+        await db.rollback()
+        await run_in_threadpool(move_back_to_temp, save_path, temp_path)
+        await db.run_sync(release_upload, upload_id)
+        raise HTTPException(status_code=500, detail=f"创建视频失败: {e}")
+    await db.run_sync(finish_upload, upload_id, row.video_id)
+    return {"code": 0, "message": "ok", "data": _to_ui_dict(row)}
+
+
+@router.delete("/videos/uploads/{upload_id}")
+async def abort_upload(upload_id: str, db: AsyncSession = Depends(get_async_db)):
+    """放弃上传：删除会话与临时文件（已合并生成的视频不受影响）"""
+    upload = await _get_upload_session(upload_id, db)
+    await db.run_sync(delete_upload_session, upload.upload_id)
+    if upload.completed_at is None:
+        await run_in_threadpool(remove_temp_file, upload.temp_path)
+    return {"code": 0, "message": "ok", "data": True}
+
+
 @router.get("/videos")
-def list_videos(keyword: Optional[str] = None, db: Session = Depends(get_sqlmodel_db)):
-    settings = db.get(SystemSettings, 1)
-    current_id = str(settings.current_source_id) if settings and settings.current_source_id else ""
+async def list_videos(keyword: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
+    settings = await db.run_sync(system_settings_cache.get)
+    current_id = str(settings.current_source_id) if settings.current_source_id else ""
 
     stmt = select(VideoSource)
     if keyword:
         stmt = stmt.where(VideoSource.file_name.ilike(f"%{keyword}%"))
-    items = db.exec(stmt.order_by(VideoSource.upload_time.desc())).all()
+    items = (await db.exec(stmt.order_by(VideoSource.upload_time.desc()))).all()
 
     data = []
     for v in items:
@@ -177,19 +442,19 @@ def list_videos(keyword: Optional[str] = None, db: Session = Depends(get_sqlmode
 
 
 @router.get("/videos/{video_id}")
-def get_video(video_id: str, db: Session = Depends(get_sqlmodel_db)):
+async def get_video(video_id: str, db: AsyncSession = Depends(get_async_db)):
     # 避免与 /videos/demo 等固定路径冲突：非 UUID 直接 404
     try:
         UUID(video_id)
     except Exception:
         raise HTTPException(status_code=404, detail="视频不存在")
 
-    v = db.get(VideoSource, video_id)
+    v = await db.get(VideoSource, video_id)
     if not v:
         raise HTTPException(status_code=404, detail="视频不存在")
 
-    settings = db.get(SystemSettings, 1)
-    current_id = str(settings.current_source_id) if settings and settings.current_source_id else ""
+    settings = await db.run_sync(system_settings_cache.get)
+    current_id = str(settings.current_source_id) if settings.current_source_id else ""
 
     row = _to_ui_dict(v)
     row["isDemo"] = bool(current_id and str(v.video_id) == current_id)
@@ -200,45 +465,31 @@ def get_video(video_id: str, db: Session = Depends(get_sqlmodel_db)):
 
 
 @router.post("/videos/{video_id}/set-demo")
-def set_demo(video_id: str, db: Session = Depends(get_sqlmodel_db)):
-    target_video = db.get(VideoSource, video_id)
+async def set_demo(video_id: str, db: AsyncSession = Depends(get_async_db)):
+    target_video = await db.get(VideoSource, video_id)
     if not target_video:
         raise HTTPException(status_code=404, detail="视频不存在")
 
-    # 统一写入 system_settings.current_source_id（权威状态）
-    settings = db.get(SystemSettings, 1)
-    if not settings:
-        settings = SystemSettings(id=1)
-        db.add(settings)
-
-    settings.current_source_id = target_video.video_id
-    db.add(settings)
-    db.commit()
-    db.refresh(settings)
-
-    # 保持 is_demo 字段同步（兼容旧逻辑）
-    all_videos = db.exec(select(VideoSource)).all()
-    for v in all_videos:
-        v.is_demo = (v.video_id == target_video.video_id)
-        db.add(v)
-    db.commit()
+    # 统一写入 system_settings.current_source_id（权威状态），is_demo 字段同步（兼容旧逻辑）；
+    # 均为单条语句，与视频数量无关
+    await db.run_sync(update_system_settings, current_source_id=target_video.video_id)
 
     return {"code": 0, "message": "ok", "data": _to_ui_dict(target_video)}
 
 
 @router.get("/videos/demo")
-def get_demo_video(db: Session = Depends(get_sqlmodel_db)):
+async def get_demo_video(db: AsyncSession = Depends(get_async_db)):
     # 仪表盘大屏使用的“当前源视频”：优先 system_settings.current_source_id
-    settings = db.get(SystemSettings, 1)
-    current_id = settings.current_source_id if settings else None
+    settings = await db.run_sync(system_settings_cache.get)
+    current_id = settings.current_source_id
 
     video = None
     if current_id:
-        video = db.get(VideoSource, str(current_id))
+        video = await db.get(VideoSource, current_id)
 
     if not video:
         # fallback：取最新上传视频
-        video = db.exec(select(VideoSource).order_by(VideoSource.upload_time.desc())).first()
+        video = (await db.exec(select(VideoSource).order_by(VideoSource.upload_time.desc()))).first()
 
     if not video:
         return {"code": 0, "message": "ok", "data": None}
@@ -246,32 +497,17 @@ def get_demo_video(db: Session = Depends(get_sqlmodel_db)):
     return {"code": 0, "message": "ok", "data": _to_ui_dict(video)}
 
 
-@router.delete("/videos/{video_id}")
-def delete_video(video_id: str, db: Session = Depends(get_sqlmodel_db)):
-    target_video = db.get(VideoSource, video_id)
-    if not target_video:
-        raise HTTPException(status_code=404, detail="视频不存在")
-
-    # 级联删除关联数据：Zone、AlarmEvent、ZoneConfig
-    try:
-        # 删除 Zone（配置中心区域）
-        db.exec(delete(Zone).where(Zone.source_id == target_video.video_id))
-        # 删除 AlarmEvent（报警记录）
-        db.exec(delete(AlarmEvent).where(AlarmEvent.video_id == target_video.video_id))
-        # 删除 ZoneConfig（区域配置）
-        db.exec(delete(ZoneConfig).where(ZoneConfig.video_id == target_video.video_id))
-    except Exception as e:
-        print(f"Warn: Failed to delete associated data for video {video_id}: {e}")
-
+def _remove_video_files(video: VideoSource) -> None:
+    """删除视频文件、分析结果及其派生文件、缩略图（在线程池中执行）"""
     try:
-        if os.path.exists(target_video.file_path):
-            os.remove(target_video.file_path)
+        if os.path.exists(video.file_path):
+            os.remove(video.file_path)
     except Exception as e:
-        print(f"Warn: Failed to delete file {target_video.file_path}: {e}")
+        print(f"Warn: Failed to delete file {video.file_path}: {e}")
 
     # 删除分析文件（raw_tracks.json 和 display_overlays.json）
     for path_key in ("raw_tracks_path", "analysis_json_path"):
-        file_path = getattr(target_video, path_key)
+        file_path = getattr(video, path_key)
         if file_path and os.path.exists(file_path):
             try:
                 os.remove(file_path)
@@ -279,14 +515,134 @@ def delete_video(video_id: str, db: Session = Depends(get_sqlmodel_db)):
             except Exception as e:
                 print(f"Warn: Failed to delete analysis file {file_path}: {e}")
 
-    # 如果删除的是当前选择源（system_settings.current_source_id），需先清空设置，避免外键约束导致 500
-    settings = db.get(SystemSettings, 1)
-    if settings and settings.current_source_id and str(settings.current_source_id) == str(video_id):
-        settings.current_source_id = None
-        db.add(settings)
-        db.commit()
+    if video.analysis_json_path:
+        try:
+            remove_overlay_artifacts(video.analysis_json_path)
+        except Exception as e:
+            print(f"Warn: Failed to delete overlay artifacts for video {video.video_id}: {e}")
+
+    remove_thumbnails(str(video.video_id))
+    remove_playback(str(video.video_id))
+
+
+@router.delete("/videos/{video_id}")
+async def delete_video(video_id: str, db: AsyncSession = Depends(get_async_db)):
+    target_video = await db.get(VideoSource, video_id)
+    if not target_video:
+        raise HTTPException(status_code=404, detail="视频不存在")
 
-    db.delete(target_video)
-    db.commit()
+    await run_in_threadpool(_remove_video_files, target_video)
+
+    # 报警、报警聚合、防区、防区配置由外键 ON DELETE CASCADE 一并删除；
+    # system_settings.current_source_id 指向该视频时由 ON DELETE SET NULL 置空
+    await db.delete(target_video)
+    # current_source_id 可能被置空、报警被级联删除：通知各 worker 的配置缓存与未读计数失效
+    await db.run_sync(notify_settings_changed)
+    await db.run_sync(notify_unread_changed)
+    await db.commit()
+    system_settings_cache.invalidate()
+    recent_alarms.remove_video(str(target_video.video_id))
+    unread_counter.invalidate()
 
     return {"code": 0, "message": "ok", "data": True}
+
+
+@router.post("/videos/{video_id}/export")
+async def export_video(
+    video_id: str,
+    start: Optional[float] = Query(default=None, ge=0),
+    end: Optional[float] = Query(default=None, gt=0),
+    alarmId: Optional[str] = None,
+    padding: float = Query(default=5.0, ge=0, le=300),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """导出带防区/检测框/报警颜色的标注视频；指定 alarmId 时导出该告警前后 padding 秒"""
+    video = await db.get(VideoSource, video_id)
+    if not video:
+        raise HTTPException(status_code=404, detail="视频不存在")
+
+    if not video.analysis_json_path or not os.path.exists(video.analysis_json_path):
+        raise HTTPException(status_code=400, detail="该视频尚无分析结果，请先在配置中心保存防区")
+
+    if alarmId:
+        try:
+            alarm_uuid = UUID(alarmId.replace("#", ""))
+        except Exception:
+            raise HTTPException(status_code=400, detail="告警 ID 格式不正确")
+        alarm = await db.run_sync(get_alarm, alarm_uuid)
+        if not alarm or alarm.video_id != video.video_id:
+            raise HTTPException(status_code=404, detail="告警不存在")
+        start = max(float(alarm.video_timestamp) - padding, 0.0)
+        end = float(alarm.video_timestamp) + padding
+
+    if start is not None and end is not None and end <= start:
+        raise HTTPException(status_code=400, detail="end 必须大于 start")
+
+    job = create_export_job(str(video.video_id), start, end)
+    output_path = export_output_path(job["jobId"])
+    video_path = video.file_path
+    analysis_json_path = video.analysis_json_path
+
+    def run_export():
+        update_export_job(job["jobId"], status="PROCESSING")
+        try:
+            result = export_annotated_video(
+                video_path=video_path,
+                analysis_json_path=analysis_json_path,
+                output_path=output_path,
+                start=start,
+                end=end,
+                workers=settings.EXPORT_WORKERS or None,
+            )
+            update_export_job(
+                job["jobId"],
+                status="COMPLETED",
+                downloadUrl=f"/static/exports/{Path(output_path).name}",
+                result=result,
+            )
+        except Exception as e:
+            update_export_job(job["jobId"], status="FAILED", error=str(e))
+            print(f"导出任务失败: {e}")
+
+    submit_export(run_export)
+
+    return {"code": 0, "message": "ok", "data": job}
+
+
+@router.get("/videos/exports/{job_id}")
+def get_export_status(job_id: str):
+    job = get_export_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="导出任务不存在")
+    return {"code": 0, "message": "ok", "data": job}
+
+
+async def _get_track_index(video_id: str, db: AsyncSession) -> dict:
+    video = await db.get(VideoSource, video_id)
+    if not video:
+        raise HTTPException(status_code=404, detail="视频不存在")
+    if not video.analysis_json_path or not os.path.exists(video.analysis_json_path):
+        raise HTTPException(status_code=404, detail="分析结果不存在")
+    # 索引缺失时会从 overlays 重建，放到线程池
+    return await run_in_threadpool(load_track_index, video.analysis_json_path)
+
+
+@router.get("/videos/{video_id}/tracks")
+async def list_video_tracks(
+    video_id: str,
+    cls: Optional[str] = Query(default=None, alias="class"),
+    zoneId: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """视频内的轨迹列表（可按类别、经过的防区筛选），按首次出现时间排序"""
+    index = await _get_track_index(video_id, db)
+    items = find_tracks(index, cls=cls, zone_id=zoneId)
+    return {"code": 0, "message": "ok", "data": {"items": items, "total": len(items)}}
+
+
+@router.get("/videos/{video_id}/tracks/{track_id}")
+async def get_video_track(video_id: str, track_id: str, db: AsyncSession = Depends(get_async_db)):
+    track = ((await _get_track_index(video_id, db)).get("tracks") or {}).get(track_id)
+    if not track:
+        raise HTTPException(status_code=404, detail="轨迹不存在")
+    return {"code": 0, "message": "ok", "data": track}
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+from typing import Any, Iterator, List
+
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.database import sync_engine
+from app.models import AlarmEvent, Zone
+from app.services.alarm_query import ALARM_ORDER
+from app.services.alarm_store import alarm_to_dict
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson; charset=utf-8",
+}
+
+# CSV 列：(表头, 列表项字段)
+_CSV_COLUMNS = (
+    ("id", "id"),
+    ("occurredAt", "occurredAt"),
+    ("videoId", "videoId"),
+    ("videoTime", "time"),
+    ("target", "target"),
+    ("severity", "severity"),
+    ("status", "status"),
+    ("isRead", "isRead"),
+    ("trackId", "trackId"),
+    ("zoneId", "zoneId"),
+    ("zoneName", "zoneName"),
+)
+
+
+def iter_alarm_export(conditions: List[Any], fmt: str) -> Iterator[bytes]:
+    """按过滤条件流式导出报警（CSV / NDJSON），内存占用与结果总量无关。
+
+    使用服务端游标（yield_per）分批取数，每批编码后立即输出；
+    会话在生成器内部创建，与请求依赖的会话生命周期无关。
+    """
+    # 只取列（Core 行）而不构造 ORM 对象；行对象按属性名取值，可直接交给 alarm_to_dict
+    stmt = (
+        select(*AlarmEvent.__table__.c, Zone.name.label("zone_name"))
+        .outerjoin(Zone, Zone.id == AlarmEvent.zone_id)
+        .where(*conditions)
+        .order_by(*ALARM_ORDER)
+        .execution_options(yield_per=settings.ALARM_EXPORT_BATCH_SIZE)
+    )
+
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if fmt == "csv":
+        # BOM：Excel 打开 UTF-8 CSV 时中文不乱码
+        buf.write("\ufeff")
+        writer.writerow([name for name, _ in _CSV_COLUMNS])
+
+    with Session(sync_engine) as session:
+        result = session.execute(stmt)
+        for partition in result.partitions():
+            for row in partition:
+                item = {**alarm_to_dict(row), "zoneName": row.zone_name or ""}
+                if fmt == "csv":
+                    writer.writerow(["" if item.get(key) is None else item.get(key) for _, key in _CSV_COLUMNS])
+                else:
+                    buf.write(json.dumps(item, ensure_ascii=False, separators=(",", ":")))
+                    buf.write("\n")
+            # 每批输出一次
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate(0)
+
+    tail = buf.getvalue()
+    if tail:
+        yield tail.encode("utf-8")
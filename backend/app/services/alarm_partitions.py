@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import asyncio
+import gzip
+import os
+import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, text
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.database import sync_engine
+from app.models import AlarmEvent, AlarmRollup
+from app.services.recent_events import recent_alarms, warm_recent_alarms
+from app.services.unread_counter import notify_unread_changed, unread_counter
+
+# alarm_events 按 occurred_at（UTC naive）按月分区：alarm_events_p202610 = [2026-10-01, 2026-11-01)；
+# 不落在任何月分区内的记录（如重算很早以前上传的视频）进入默认分区，下次维护时再拆分出对应月份
+PARENT = AlarmEvent.__tablename__
+DEFAULT_PARTITION = f"{PARENT}_default"
+_PARTITION_NAME = re.compile(rf"^{PARENT}_(p\d{{6}}|default)$")
+_RANGE_BOUND = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+# 分区维护（建分区 / 删除过期分区）串行执行：多 worker 同时维护时只有一个生效
+_MAINTENANCE_LOCK_KEY = 7_402_0045
+
+
+def is_alarm_partition(name: str) -> bool:
+    """alarm_events 的分区表（迁移检查时跳过，分区不在模型中声明）"""
+    return bool(_PARTITION_NAME.match(name))
+
+
+def month_start(dt: datetime) -> datetime:
+    return dt.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(dt: datetime, months: int) -> datetime:
+    index = dt.year * 12 + dt.month - 1 + months
+    return dt.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(start: datetime) -> str:
+    return f"{PARENT}_p{start:%Y%m}"
+
+
+def _literal(dt: datetime) -> str:
+    # DDL 中的分区边界不能使用绑定参数；边界由 datetime 生成，格式固定
+    return f"'{dt:%Y-%m-%d %H:%M:%S}'"
+
+
+def list_alarm_partitions(session: Session) -> List[Dict[str, Any]]:
+    """当前分区（按起始时间排序，默认分区在最后），行数为统计信息估算值"""
+    rows = session.execute(
+        text(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::bigint "
+            "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:parent)"
+        ),
+        {"parent": PARENT},
+    ).all()
+
+    partitions = []
+    for name, bound, reltuples in rows:
+        match = _RANGE_BOUND.search(bound or "")
+        partitions.append(
+            {
+                "name": name,
+                "start": datetime.fromisoformat(match.group(1)) if match else None,
+                "end": datetime.fromisoformat(match.group(2)) if match else None,
+                "estimatedRows": max(int(reltuples), 0),
+            }
+        )
+    partitions.sort(key=lambda p: (p["start"] is None, p["start"] or datetime.min))
+    return partitions
+
+
+def retention_boundary(now: Optional[datetime] = None) -> Optional[datetime]:
+    """早于该时间（整月边界）的报警视为过期；未配置保留期时返回 None"""
+    if settings.ALARM_RETENTION_DAYS <= 0:
+        return None
+    now = now or datetime.utcnow()
+    return month_start(now - timedelta(days=settings.ALARM_RETENTION_DAYS))
+
+
+def _create_month_partition(session: Session, start: datetime) -> str:
+    end = add_months(start, 1)
+    name = partition_name(start)
+    bounds = f"FROM ({_literal(start)}) TO ({_literal(end)})"
+    in_range = {"start": start, "end": end}
+
+    has_default_rows = session.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE occurred_at >= :start AND occurred_at < :end)"),
+        in_range,
+    ).scalar()
+    if not has_default_rows:
+        session.execute(text(f"CREATE TABLE {name} PARTITION OF {PARENT} FOR VALUES {bounds}"))
+        return name
+
+    # 默认分区中已有该月的记录时不能直接建分区：先建独立表，把记录从默认分区移过去，再挂载为分区
+    session.execute(text(f"CREATE TABLE {name} (LIKE {PARENT})"))
+    session.execute(
+        text(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+            f"WHERE occurred_at >= :start AND occurred_at < :end RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ),
+        in_range,
+    )
+    session.execute(text(f"ALTER TABLE {PARENT} ATTACH PARTITION {name} FOR VALUES {bounds}"))
+    return name
+
+
+def ensure_alarm_partitions(session: Session, now: Optional[datetime] = None) -> List[str]:
+    """创建当月及之后 ALARM_PARTITION_PREMAKE_MONTHS 个月的分区，并把默认分区中的记录拆分到对应月份；
+    返回新建的分区名（已提交）"""
+    now = now or datetime.utcnow()
+    session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _MAINTENANCE_LOCK_KEY})
+
+    existing = {p["name"] for p in list_alarm_partitions(session)}
+    if DEFAULT_PARTITION not in existing:
+        session.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {PARENT} DEFAULT"))
+
+    current = month_start(now)
+    months = {add_months(current, i) for i in range(settings.ALARM_PARTITION_PREMAKE_MONTHS + 1)}
+    months.update(
+        month_start(m)
+        for (m,) in session.execute(text(f"SELECT DISTINCT date_trunc('month', occurred_at) FROM {DEFAULT_PARTITION}"))
+    )
+    # 已过保留期的月份不再建分区，其记录随后由 apply_alarm_retention 从默认分区删除
+    boundary = retention_boundary(now)
+    created = [
+        _create_month_partition(session, start)
+        for start in sorted(months)
+        if partition_name(start) not in existing and (boundary is None or start >= boundary)
+    ]
+    session.commit()
+    return created
+
+
+def _archive_path(name: str) -> str:
+    os.makedirs(settings.ALARM_ARCHIVE_DIR, exist_ok=True)
+    return os.path.join(settings.ALARM_ARCHIVE_DIR, f"{name}_{datetime.utcnow():%Y%m%d%H%M%S}.csv.gz")
+
+
+def _archive(session: Session, query: str, name: str) -> str:
+    """COPY (query) TO STDOUT 以 CSV（含表头）写入 gzip 文件；可用 COPY alarm_events FROM ... CSV HEADER 恢复"""
+    path = _archive_path(name)
+    conn = session.connection().connection
+    with gzip.open(path, "wb") as fh, conn.dbapi_connection.cursor() as cur:
+        with cur.copy(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)") as copy:
+            for chunk in copy:
+                fh.write(chunk)
+    return path
+
+
+def apply_alarm_retention(session: Session, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """删除早于保留期的报警：整月分区 DETACH 后 DROP，默认分区中的过期记录逐行删除；
+    删除前按 ALARM_ARCHIVE_DIR 导出归档。对应时间段的聚合计数一并删除，统计与明细保持一致。
+    每个分区单独提交。"""
+    result: Dict[str, Any] = {"boundary": None, "dropped": [], "archives": [], "deletedFromDefault": 0}
+    boundary = retention_boundary(now)
+    if boundary is None:
+        return result
+    result["boundary"] = boundary.isoformat()
+
+    expired = [p for p in list_alarm_partitions(session) if p["end"] is not None and p["end"] <= boundary]
+    for partition in expired:
+        name = partition["name"]
+        session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _MAINTENANCE_LOCK_KEY})
+        # 等锁期间可能已被其他 worker 删除
+        if session.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is None:
+            session.commit()
+            continue
+        if settings.ALARM_ARCHIVE_DIR:
+            result["archives"].append(_archive(session, f"SELECT * FROM {name}", name))
+        session.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {name}"))
+        session.execute(text(f"DROP TABLE {name}"))
+        session.execute(
+            delete(AlarmRollup).where(
+                AlarmRollup.bucket_start >= partition["start"], AlarmRollup.bucket_start < partition["end"]
+            )
+        )
+        session.commit()
+        result["dropped"].append(name)
+
+    session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _MAINTENANCE_LOCK_KEY})
+    stale_default = f"SELECT * FROM {DEFAULT_PARTITION} WHERE occurred_at < {_literal(boundary)}"
+    if session.execute(text(f"SELECT EXISTS ({stale_default})")).scalar():
+        if settings.ALARM_ARCHIVE_DIR:
+            result["archives"].append(_archive(session, stale_default, DEFAULT_PARTITION))
+        result["deletedFromDefault"] = session.execute(
+            text(f"DELETE FROM {DEFAULT_PARTITION} WHERE occurred_at < :boundary"), {"boundary": boundary}
+        ).rowcount
+    # 没有对应明细的旧聚合（如分区早已删除）也一并清理
+    session.execute(delete(AlarmRollup).where(AlarmRollup.bucket_start < boundary))
+    session.commit()
+
+    if result["dropped"] or result["deletedFromDefault"]:
+        notify_unread_changed(session)
+        session.commit()
+        unread_counter.invalidate()
+        recent_alarms.clear()
+        warm_recent_alarms(session)
+    return result
+
+
+def run_alarm_maintenance(session: Session, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """定时任务：先删除过期数据，再补建分区"""
+    retention = apply_alarm_retention(session, now)
+    created = ensure_alarm_partitions(session, now)
+    if retention["dropped"] or retention["deletedFromDefault"] or created:
+        print(
+            f"[alarm-partitions] created={created} dropped={retention['dropped']} "
+            f"deletedFromDefault={retention['deletedFromDefault']} archives={retention['archives']}"
+        )
+    return {**retention, "created": created}
+
+
+def run_alarm_maintenance_job() -> Dict[str, Any]:
+    """使用独立的同步会话执行一次分区维护（归档用 psycopg 的 COPY TO，须走同步引擎）"""
+    with Session(sync_engine) as session:
+        return run_alarm_maintenance(session)
+
+
+async def alarm_maintenance_loop() -> None:
+    """每隔 ALARM_MAINTENANCE_INTERVAL_SECONDS 执行一次分区维护（随应用启动，在线程池中执行）"""
+    while True:
+        await asyncio.sleep(settings.ALARM_MAINTENANCE_INTERVAL_SECONDS)
+        try:
+            await run_in_threadpool(run_alarm_maintenance_job)
+        except Exception as e:
+            print(f"Warn: alarm partition maintenance failed: {e}")
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import base64
+import json
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import and_, func, select, text, tuple_
+from sqlmodel import Session
+
+from app.models import AlarmEvent, ThreatLevel
+
+# 列表稳定排序：发生时间倒序，同一时间点按主键倒序打破并列（keyset 分页依赖该顺序唯一）
+ALARM_ORDER = (AlarmEvent.occurred_at.desc(), AlarmEvent.event_id.desc())
+
+# 前端日期筛选按北京时间的自然日
+_BEIJING = timezone(timedelta(hours=8))
+
+
+def _day_start_utc(day: date) -> datetime:
+    # occurred_at 在库中为 UTC naive
+    return datetime.combine(day, time.min, tzinfo=_BEIJING).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def parse_date_range(
+    start_date: Optional[str], end_date: Optional[str]
+) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """YYYY-MM-DD（北京时间，含首尾两天）-> occurred_at 的 [start, end) 区间；格式错误抛 ValueError"""
+    start = _day_start_utc(date.fromisoformat(start_date)) if start_date else None
+    end = _day_start_utc(date.fromisoformat(end_date) + timedelta(days=1)) if end_date else None
+    return start, end
+
+
+def build_alarm_filters(
+    query: Optional[str] = "",
+    level: Optional[str] = "",
+    *,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    video_id: Optional[UUID] = None,
+) -> List[Any]:
+    """/alarms 列表的过滤条件（列表、计数共用）"""
+    conditions: List[Any] = []
+
+    if video_id is not None:
+        conditions.append(AlarmEvent.video_id == video_id)
+
+    # 按关键字搜索：支持 event_id 或 video_id
+    if query:
+        cleaned = query.replace("#", "")
+        try:
+            uuid_obj = UUID(cleaned)
+            conditions.append((AlarmEvent.event_id == uuid_obj) | (AlarmEvent.video_id == uuid_obj))
+        except Exception:
+            # 非合法 UUID，跳过过滤
+            pass
+
+    # 按威胁等级过滤
+    if level == "critical":
+        conditions.append(AlarmEvent.threat_level == ThreatLevel.CRITICAL)
+    elif level == "warning":
+        conditions.append(AlarmEvent.threat_level == ThreatLevel.WARNING)
+
+    # 日期范围：区间条件直接作用于 occurred_at，可走 (occurred_at, event_id) 或
+    # (video_id, threat_level, occurred_at) 索引
+    if start is not None:
+        conditions.append(AlarmEvent.occurred_at >= start)
+    if end is not None:
+        conditions.append(AlarmEvent.occurred_at < end)
+
+    return conditions
+
+
+def count_alarms(session: Session, conditions: List[Any]) -> int:
+    """SQL COUNT(*)，不把记录加载成 ORM 对象"""
+    stmt = select(func.count()).select_from(AlarmEvent).where(*conditions)
+    return int(session.execute(stmt).scalar_one())
+
+
+def approximate_alarm_count(session: Session) -> Optional[int]:
+    """PostgreSQL 统计信息中的估算行数（各分区 pg_class.reltuples 之和，O(分区数)）；
+    未做过 ANALYZE 或非 PostgreSQL 时返回 None"""
+    if session.get_bind().dialect.name != "postgresql":
+        return None
+    # 分区表自身的 reltuples 恒为 -1，按分区累加；未 ANALYZE 的分区为 -1，不计入
+    value = session.execute(
+        text(
+            "SELECT CASE WHEN bool_or(c.reltuples >= 0) THEN sum(greatest(c.reltuples, 0))::bigint END "
+            "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:name)"
+        ),
+        {"name": AlarmEvent.__tablename__},
+    ).scalar()
+    return int(value) if value is not None else None
+
+
+def encode_cursor(alarm: AlarmEvent) -> str:
+    """分页游标：最后一条记录的排序键，base64url 编码"""
+    raw = json.dumps([alarm.occurred_at.isoformat(), str(alarm.event_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    occurred_at, event_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    return datetime.fromisoformat(occurred_at), UUID(str(event_id))
+
+
+def after_cursor(cursor: str) -> Any:
+    """keyset 条件：排序键严格位于游标之后（与 ALARM_ORDER 一致的行值比较）。
+
+    另加等价的 occurred_at <= 游标时间：分区裁剪不识别行值比较，有了单列范围条件才能跳过更新的月分区。
+    """
+    occurred_at, event_id = decode_cursor(cursor)
+    return and_(
+        AlarmEvent.occurred_at <= occurred_at,
+        tuple_(AlarmEvent.occurred_at, AlarmEvent.event_id) < tuple_(occurred_at, event_id),
+    )
+
+
+def get_alarm(session: Session, event_id: UUID) -> Optional[AlarmEvent]:
+    """按 event_id 取单条报警（主键为 (event_id, occurred_at)，不能用 session.get）"""
+    return session.execute(select(AlarmEvent).where(AlarmEvent.event_id == event_id)).scalar_one_or_none()
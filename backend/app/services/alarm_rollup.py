@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import delete, exists, func, literal, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlmodel import Session
+
+from app.models import AlarmEvent, AlarmRollup, ObjectType, ThreatLevel, VideoSource, Zone
+
+# 统计接口展示按北京时间分桶
+_BEIJING_OFFSET = timedelta(hours=8)
+
+# (bucket_start, video_id, zone_id, threat_level, object_type)
+RollupKey = Tuple[datetime, UUID, str, ThreatLevel, ObjectType]
+
+
+def hour_bucket(dt: datetime) -> datetime:
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+
+def rollup_key(row: Dict[str, Any]) -> RollupKey:
+    """alarm_events 行（event_to_row 的结果或查询出的列）-> 聚合键"""
+    return (
+        hour_bucket(row["occurred_at"]),
+        UUID(str(row["video_id"])),
+        row.get("zone_id") or "",
+        ThreatLevel(row["threat_level"]),
+        ObjectType(row["object_type"]),
+    )
+
+
+def rollup_delta(removed: Iterable[Dict[str, Any]], added: Iterable[Dict[str, Any]]) -> Counter:
+    delta: Counter = Counter()
+    for row in removed:
+        delta[rollup_key(row)] -= 1
+    for row in added:
+        delta[rollup_key(row)] += 1
+    return delta
+
+
+def apply_rollup_delta(session: Session, delta: Counter) -> None:
+    """按增量更新聚合计数（INSERT ... ON CONFLICT 累加），不提交；计数归零的桶随即删除"""
+    changes = [(key, n) for key, n in delta.items() if n]
+    if not changes:
+        return
+
+    table = AlarmRollup.__table__
+    stmt = pg_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[c.name for c in table.primary_key.columns],
+        set_={"count": table.c.count + stmt.excluded.count},
+    )
+    session.execute(
+        stmt,
+        [
+            {
+                "bucket_start": bucket,
+                "video_id": video_id,
+                "zone_id": zone_id,
+                "threat_level": level,
+                "object_type": object_type,
+                "count": n,
+            }
+            for (bucket, video_id, zone_id, level, object_type), n in changes
+        ],
+    )
+    if any(n < 0 for _, n in changes):
+        video_ids = {key[1] for key, n in changes if n < 0}
+        session.execute(delete(AlarmRollup).where(AlarmRollup.video_id.in_(video_ids), AlarmRollup.count <= 0))
+
+
+def rebuild_alarm_rollups(session: Session, video_id: Optional[UUID] = None) -> None:
+    """由 alarm_events 全量重建聚合（首次部署或数据修复时使用），不提交"""
+    scope = [] if video_id is None else [AlarmEvent.video_id == video_id]
+    rollup_scope = [] if video_id is None else [AlarmRollup.video_id == video_id]
+    session.execute(delete(AlarmRollup).where(*rollup_scope))
+
+    bucket = func.date_trunc("hour", AlarmEvent.occurred_at)
+    zone_id = func.coalesce(AlarmEvent.zone_id, literal(""))
+    source = (
+        select(
+            bucket,
+            AlarmEvent.video_id,
+            zone_id,
+            AlarmEvent.threat_level,
+            AlarmEvent.object_type,
+            func.count(),
+        )
+        .where(*scope)
+        .group_by(bucket, AlarmEvent.video_id, zone_id, AlarmEvent.threat_level, AlarmEvent.object_type)
+    )
+    session.execute(
+        AlarmRollup.__table__.insert().from_select(
+            ["bucket_start", "video_id", "zone_id", "threat_level", "object_type", "count"], source
+        )
+    )
+
+
+def ensure_alarm_rollups(session: Session) -> None:
+    """启动时检查：已有报警但聚合表为空（升级前的历史数据）时全量重建一次"""
+    has_alarms = session.execute(select(exists().where(AlarmEvent.event_id.isnot(None)))).scalar()
+    has_rollups = session.execute(select(exists().where(AlarmRollup.count.isnot(None)))).scalar()
+    if has_alarms and not has_rollups:
+        rebuild_alarm_rollups(session)
+        session.commit()
+
+
+def _bucket_label(dt: datetime, bucket: str) -> str:
+    # 小时桶为 UTC，转北京时间展示；天桶在 SQL 中已按北京时间截断
+    if bucket == "day":
+        return dt.strftime("%Y-%m-%d")
+    local = dt.replace(tzinfo=timezone.utc) + _BEIJING_OFFSET
+    return local.strftime("%Y-%m-%d %H:00")
+
+
+def _level_name(level: ThreatLevel) -> str:
+    return "critical" if level == ThreatLevel.CRITICAL else "warning"
+
+
+def alarm_stats(
+    session: Session,
+    *,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    video_id: Optional[UUID] = None,
+    level: Optional[str] = "",
+    bucket: str = "hour",
+) -> Dict[str, Any]:
+    """从聚合表计算统计：时间直方图（按小时/天）及按防区、等级、视频源、目标类型的分布"""
+    conditions: List[Any] = []
+    if start is not None:
+        conditions.append(AlarmRollup.bucket_start >= start)
+    if end is not None:
+        conditions.append(AlarmRollup.bucket_start < end)
+    if video_id is not None:
+        conditions.append(AlarmRollup.video_id == video_id)
+    if level == "critical":
+        conditions.append(AlarmRollup.threat_level == ThreatLevel.CRITICAL)
+    elif level == "warning":
+        conditions.append(AlarmRollup.threat_level == ThreatLevel.WARNING)
+
+    total_count = func.sum(AlarmRollup.count)
+
+    if bucket == "day":
+        bucket_expr = func.date_trunc("day", AlarmRollup.bucket_start + _BEIJING_OFFSET)
+    else:
+        bucket_expr = AlarmRollup.bucket_start
+    histogram: Dict[datetime, Dict[str, Any]] = {}
+    rows = session.execute(
+        select(bucket_expr, AlarmRollup.threat_level, total_count)
+        .where(*conditions)
+        .group_by(bucket_expr, AlarmRollup.threat_level)
+        .order_by(bucket_expr)
+    ).all()
+    for at, lvl, n in rows:
+        item = histogram.setdefault(at, {"time": _bucket_label(at, bucket), "count": 0, "critical": 0, "warning": 0})
+        item["count"] += int(n)
+        item[_level_name(lvl)] += int(n)
+
+    by_zone = [
+        {"zoneId": zone_id or None, "zoneName": name or "", "count": int(n)}
+        for zone_id, name, n in session.execute(
+            select(AlarmRollup.zone_id, Zone.name, total_count)
+            .outerjoin(Zone, Zone.id == AlarmRollup.zone_id)
+            .where(*conditions)
+            .group_by(AlarmRollup.zone_id, Zone.name)
+            .order_by(total_count.desc())
+        ).all()
+    ]
+    by_source = [
+        {"videoId": str(vid), "name": name or "", "count": int(n)}
+        for vid, name, n in session.execute(
+            select(AlarmRollup.video_id, VideoSource.file_name, total_count)
+            .join(VideoSource, VideoSource.video_id == AlarmRollup.video_id)
+            .where(*conditions)
+            .group_by(AlarmRollup.video_id, VideoSource.file_name)
+            .order_by(total_count.desc())
+        ).all()
+    ]
+
+    by_level = {"critical": 0, "warning": 0}
+    by_target = {t.value: 0 for t in ObjectType}
+    for lvl, object_type, n in session.execute(
+        select(AlarmRollup.threat_level, AlarmRollup.object_type, total_count)
+        .where(*conditions)
+        .group_by(AlarmRollup.threat_level, AlarmRollup.object_type)
+    ).all():
+        by_level[_level_name(lvl)] += int(n)
+        by_target[object_type.value] += int(n)
+
+    return {
+        "bucket": bucket,
+        "total": sum(by_level.values()),
+        "histogram": list(histogram.values()),
+        "byLevel": by_level,
+        "byTarget": by_target,
+        "byZone": by_zone,
+        "bySource": by_source,
+    }
+
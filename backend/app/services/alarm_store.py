@@ -0,0 +1,352 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import bindparam, delete, insert, or_, select, update
+from sqlalchemy.util import await_only
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.events import TOPIC_ALARM_CREATED, TOPIC_ALARM_UNREAD, event_bus
+from app.models import AlarmEvent, ObjectType, ThreatLevel, VideoSource
+from app.services.alarm_rollup import apply_rollup_delta, rollup_delta
+from app.services.recent_events import recent_alarm_item, recent_alarms
+from app.services.unread_counter import notify_unread_changed, unread_counter
+
+# 批量写入时 COPY/INSERT 涉及的列（顺序即 COPY 的列顺序）
+_ALARM_COLUMNS = (
+    "event_id",
+    "video_id",
+    "video_timestamp",
+    "occurred_at",
+    "object_type",
+    "threat_level",
+    "snapshot_path",
+    "is_read",
+    "is_acked",
+    "track_id",
+    "zone_id",
+    "match_key",
+)
+
+
+_BEIJING = timezone(timedelta(hours=8))
+
+
+def _format_occurred_at(dt: Optional[datetime]) -> str:
+    # 库中为 UTC naive，前端展示北京时间
+    if dt is None:
+        return ""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(_BEIJING).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def alarm_to_dict(a: AlarmEvent) -> dict:
+    """报警记录 -> 前端列表项（/alarms 列表与推送消息共用）"""
+    return {
+        "id": f"#{a.event_id}",
+        "thumb": a.snapshot_path,
+        "time": a.video_timestamp,
+        "occurredAt": _format_occurred_at(a.occurred_at),
+        "target": a.object_type.value,
+        "severity": "critical" if a.threat_level == 1 else "warning",
+        "status": "done" if a.is_acked else "pending",
+        "isRead": bool(a.is_read),
+        "videoId": str(a.video_id),
+        "trackId": a.track_id,
+        "zoneId": a.zone_id,
+    }
+
+
+def alarm_match_key(ev: Dict[str, Any]) -> str:
+    """报警差异匹配分组：同一目标、同一防区、同一等级；组内再按时间点就近匹配（见 reconcile_video_alarms）"""
+    return f"{ev.get('track_id') or ''}|{ev.get('zone_id') or ''}|{ev.get('threat_level')}"
+
+
+def _match_nearest(existing: List[Any], events: List[Dict[str, Any]], tolerance: float) -> List[Tuple[Any, Dict[str, Any]]]:
+    """同一分组内按时间点一对一就近匹配：时间差不超过 tolerance 的候选对按时间差从小到大依次配对。
+
+    时间桶取整会让相差很小的两个时间点落在桶边界两侧而匹配不上；就近匹配没有边界问题。
+    """
+    candidates = sorted(
+        (abs(float(ev["video_timestamp"]) - row.video_timestamp), i, j)
+        for i, row in enumerate(existing)
+        for j, ev in enumerate(events)
+        if abs(float(ev["video_timestamp"]) - row.video_timestamp) <= tolerance
+    )
+    used_rows, used_events = set(), set()
+    pairs = []
+    for _, i, j in candidates:
+        if i in used_rows or j in used_events:
+            continue
+        used_rows.add(i)
+        used_events.add(j)
+        pairs.append((existing[i], events[j]))
+    return pairs
+
+
+def event_to_row(ev: Dict[str, Any]) -> Dict[str, Any]:
+    """compute_alarms 输出的报警事件 dict -> alarm_events 行（Python 值）"""
+    return {
+        "event_id": UUID(str(ev["event_id"])),
+        "video_id": UUID(str(ev["video_id"])),
+        "video_timestamp": float(ev["video_timestamp"]),
+        "occurred_at": ev["occurred_at"],
+        "object_type": ObjectType.PERSON if ev.get("object_type") == "Person" else ObjectType.VEHICLE,
+        "threat_level": ThreatLevel.CRITICAL if ev.get("threat_level") == "CRITICAL" else ThreatLevel.WARNING,
+        "snapshot_path": ev.get("snapshot_path") or "",
+        "is_read": bool(ev.get("is_read", False)),
+        "is_acked": bool(ev.get("is_acked", False)),
+        "track_id": ev.get("track_id"),
+        "zone_id": ev.get("zone_id"),
+        "match_key": ev.get("match_key") or alarm_match_key(ev),
+    }
+
+
+def _copy_value(value: Any) -> Any:
+    # SQLModel 的 Enum 列在库中存的是成员名（如 CRITICAL / PERSON），COPY 需直接给库内取值
+    if isinstance(value, (ObjectType, ThreatLevel)):
+        return value.name
+    return value
+
+
+def _supports_copy(session: Session) -> bool:
+    bind = session.get_bind()
+    if bind.dialect.name != "postgresql":
+        return False
+    if bind.dialect.driver == "psycopg":
+        return True
+    if bind.dialect.driver == "asyncpg":
+        # asyncpg 的 COPY 直接走驱动连接，绕过 SQLAlchemy 的延迟 BEGIN：
+        # 只有事务已开始（之前执行过语句）时才能保证与当前事务一起提交/回滚
+        return session.connection().connection.driver_connection.is_in_transaction()
+    return False
+
+
+def _copy_rows(session: Session, rows: List[Dict[str, Any]]) -> None:
+    """通过 COPY FROM STDIN 写入（与当前事务共用同一连接）。
+
+    psycopg：cursor.copy；asyncpg（AsyncSession.run_sync 内调用）：copy_records_to_table，
+    在 run_sync 的 greenlet 中以 await_only 等待。
+    """
+    conn = session.connection().connection
+    if session.get_bind().dialect.driver == "asyncpg":
+        records = [tuple(_copy_value(row[c]) for c in _ALARM_COLUMNS) for row in rows]
+        await_only(
+            conn.driver_connection.copy_records_to_table(
+                AlarmEvent.__tablename__, records=records, columns=list(_ALARM_COLUMNS)
+            )
+        )
+        return
+
+    columns = ", ".join(_ALARM_COLUMNS)
+    with conn.dbapi_connection.cursor() as cur:
+        with cur.copy(f"COPY {AlarmEvent.__tablename__} ({columns}) FROM STDIN") as copy:
+            for row in rows:
+                copy.write_row([_copy_value(row[c]) for c in _ALARM_COLUMNS])
+
+
+def bulk_insert_alarms(
+    session: Session,
+    events: Iterable[Dict[str, Any]],
+    *,
+    method: Optional[str] = None,
+) -> int:
+    """批量写入报警事件，不创建 ORM 对象；不提交事务，由调用方决定 commit。
+
+    method:
+    - "copy"：PostgreSQL COPY（psycopg / asyncpg 驱动可用，不可用时自动退回 insert）
+    - "insert"：多行 INSERT（SQLAlchemy insertmanyvalues，按批拼成 INSERT ... VALUES (...), (...)）
+    默认取 settings.ALARM_BULK_METHOD。
+    """
+    rows = [event_to_row(ev) for ev in events]
+    if not rows:
+        return 0
+
+    method = (method or settings.ALARM_BULK_METHOD).lower()
+    if method == "copy" and _supports_copy(session):
+        _copy_rows(session, rows)
+    else:
+        session.execute(insert(AlarmEvent.__table__), rows)
+    return len(rows)
+
+
+def reconcile_video_alarms(session: Session, video_id: UUID, events: List[Dict[str, Any]]) -> Dict[str, int]:
+    """将重算得到的报警与库中已有记录做差异同步（同一事务内完成）。
+
+    按 目标 / 防区 / 等级 分组，组内时间点相差不超过 ALARM_MATCH_BUCKET_SECONDS 的就近一对一匹配：
+    - 匹配上：保留原记录（含 is_read / is_acked），仅在时间点变化时更新 video_timestamp / occurred_at
+    - 未匹配的新报警：批量插入
+    - 未匹配的已有记录：删除
+    - 聚合表（alarm_rollups）按上述增删改在同一事务内增量更新
+
+    命中已有记录的事件会被回填为库中的 event_id，调用方拿到的即是最终入库的 ID。
+    occurred_at 以视频上传时间为起点加上 video_timestamp 计算。
+
+    事务开始时锁住该视频的 video_sources 行（SELECT ... FOR UPDATE）：同一视频的并发重算依次执行，
+    后一次读到的已有记录包含前一次的结果，不会重复插入或重复计入聚合。
+    """
+    video = session.get(VideoSource, video_id, with_for_update=True)
+    started_at = video.upload_time if video else datetime.utcnow()
+
+    existing = session.execute(
+        select(
+            AlarmEvent.event_id,
+            AlarmEvent.video_id,
+            AlarmEvent.video_timestamp,
+            AlarmEvent.occurred_at,
+            AlarmEvent.track_id,
+            AlarmEvent.zone_id,
+            AlarmEvent.threat_level,
+            AlarmEvent.object_type,
+            AlarmEvent.is_read,
+            AlarmEvent.is_acked,
+        ).where(AlarmEvent.video_id == video_id)
+    ).all()
+
+    existing_by_key: Dict[str, List[Any]] = {}
+    for row in existing:
+        key = alarm_match_key(
+            {"track_id": row.track_id, "zone_id": row.zone_id, "threat_level": ThreatLevel(row.threat_level).name}
+        )
+        existing_by_key.setdefault(key, []).append(row)
+
+    events_by_key: Dict[str, List[Dict[str, Any]]] = {}
+    for ev in events:
+        ev["match_key"] = alarm_match_key(ev)
+        ev["occurred_at"] = started_at + timedelta(seconds=float(ev["video_timestamp"]))
+        events_by_key.setdefault(ev["match_key"], []).append(ev)
+
+    to_update: List[Dict[str, Any]] = []
+    # 聚合计数的增减：时间点移动的记录可能换到另一个小时桶
+    moved_from: List[Dict[str, Any]] = []
+    moved_to: List[Dict[str, Any]] = []
+    matched_rows = set()
+    matched_events = set()
+    for key, group in events_by_key.items():
+        for hit, ev in _match_nearest(existing_by_key.get(key, []), group, settings.ALARM_MATCH_BUCKET_SECONDS):
+            matched_rows.add(hit.event_id)
+            matched_events.add(id(ev))
+            # 保留原记录的已读 / 已处理状态（最近报警缓冲按本次结果整体替换）
+            ev["event_id"] = str(hit.event_id)
+            ev["is_read"] = hit.is_read
+            ev["is_acked"] = hit.is_acked
+            if hit.occurred_at != ev["occurred_at"]:
+                to_update.append(
+                    {
+                        "b_event_id": hit.event_id,
+                        "b_old_occurred_at": hit.occurred_at,
+                        "b_video_timestamp": float(ev["video_timestamp"]),
+                        "b_occurred_at": ev["occurred_at"],
+                    }
+                )
+                moved_from.append(hit._mapping)
+                moved_to.append(event_to_row(ev))
+
+    to_insert = [ev for ev in events if id(ev) not in matched_events]
+    stale = [row for row in existing if row.event_id not in matched_rows]
+    stale_ids = [row.event_id for row in stale]
+
+    # 附带 occurred_at 条件（分区键）：只扫描涉及的月分区
+    if stale_ids:
+        stale_times = [row.occurred_at for row in stale]
+        session.execute(
+            delete(AlarmEvent).where(
+                AlarmEvent.event_id.in_(stale_ids),
+                AlarmEvent.occurred_at.between(min(stale_times), max(stale_times)),
+            )
+        )
+    if to_update:
+        table = AlarmEvent.__table__
+        session.execute(
+            update(table)
+            .where(table.c.event_id == bindparam("b_event_id"), table.c.occurred_at == bindparam("b_old_occurred_at"))
+            .values(video_timestamp=bindparam("b_video_timestamp"), occurred_at=bindparam("b_occurred_at")),
+            to_update,
+        )
+    bulk_insert_alarms(session, to_insert)
+    apply_rollup_delta(
+        session,
+        rollup_delta(
+            [*(row._mapping for row in stale), *moved_from],
+            [*(event_to_row(ev) for ev in to_insert), *moved_to],
+        ),
+    )
+    if stale_ids or to_insert:
+        notify_unread_changed(session)
+    session.commit()
+    if stale_ids:
+        # 被删除的记录中已读/未读数量未知，未读计数重新统计
+        unread_counter.invalidate()
+    else:
+        unread_counter.adjust(len(to_insert))
+
+    # 最近报警缓冲以本次结果整体替换（含被删除的记录），新增部分再推送
+    recent_alarms.replace(str(video_id), [_recent_item(ev) for ev in events])
+    publish_new_alarms(to_insert)
+
+    return {
+        "inserted": len(to_insert),
+        "updated": len(to_update),
+        "deleted": len(stale_ids),
+        "unchanged": len(events) - len(to_insert) - len(to_update),
+    }
+
+
+def _recent_item(ev: Dict[str, Any]) -> Dict[str, Any]:
+    return recent_alarm_item(alarm_to_dict(AlarmEvent(**event_to_row(ev))), ev.get("zone_name"))
+
+
+def publish_new_alarms(events: List[Dict[str, Any]]) -> None:
+    """新入库报警的后续处理：写入最近报警缓冲并推送（须在事务提交之后调用）"""
+    if not events:
+        return
+    items = [_recent_item(ev) for ev in events]
+    video_id = items[0]["videoId"]
+    recent_alarms.add(video_id, items)
+    event_bus.publish(TOPIC_ALARM_CREATED, items, video_id=video_id)
+
+
+def publish_unread_count(session: Session) -> int:
+    count = unread_counter.get(session)
+    event_bus.publish(TOPIC_ALARM_UNREAD, {"count": count})
+    return count
+
+
+def mark_alarms(session: Session, conditions: List[Any], *, ack: bool = False) -> int:
+    """按条件批量标记已读（ack=True 时同时标记已处理）：单条 UPDATE，返回实际变更的行数"""
+    values: Dict[str, Any] = {"is_read": True}
+    pending = AlarmEvent.is_read == False  # noqa: E712
+    if ack:
+        values.update(is_acked=True, acked_at=datetime.utcnow())
+        pending = or_(pending, AlarmEvent.is_acked == False)  # noqa: E712
+
+    stmt = update(AlarmEvent).where(*conditions, pending).values(**values).execution_options(synchronize_session=False)
+    updated = session.execute(stmt).rowcount
+    if updated:
+        notify_unread_changed(session)
+    session.commit()
+
+    if ack:
+        # 变更行中有多少原本未读无法从 rowcount 得知
+        unread_counter.invalidate()
+    else:
+        unread_counter.adjust(-updated)
+    if updated:
+        _mark_recent_alarms(session, conditions, ack=ack)
+    return updated
+
+
+def _mark_recent_alarms(session: Session, conditions: List[Any], *, ack: bool) -> None:
+    """同步最近报警缓冲：只在缓冲中的报警里按同样的条件查出被标记的记录（查询量不超过缓冲容量）"""
+    buffered = [UUID(event_id) for event_id in recent_alarms.event_ids()]
+    if not buffered:
+        return
+    marked = session.execute(
+        select(AlarmEvent.event_id).where(*conditions, AlarmEvent.event_id.in_(buffered))
+    ).scalars().all()
+    session.commit()
+    recent_alarms.mark((str(event_id) for event_id in marked), ack=ack)
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from app.core.config import settings
+
+# 解析后的 Python 对象通常是 JSON 文本的数倍大小，按经验系数估算其内存占用
+_PARSED_SIZE_FACTOR = 8
+
+
+class ByteLRUCache:
+    """按字节数限容的 LRU 缓存（线程安全）。
+
+    每个条目带一个 version（这里是文件的 mtime_ns + size），读取时 version 不一致视为失效，
+    文件被重写后无需显式清理即可自动失效。
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[Any, Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, version: Any) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, version: Any, value: Any, size: int) -> None:
+        # 单个条目超过总容量时不缓存，避免把其它条目全部挤出
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (version, value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+    def _drop(self, key: Hashable) -> None:
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "maxBytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hitRate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+# 仪表盘与配置中心共用的分析结果缓存
+analysis_cache = ByteLRUCache(settings.ANALYSIS_CACHE_MAX_BYTES)
+
+
+def _file_version(path: str) -> Tuple[int, int]:
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def load_json(path: str) -> Any:
+    """读取并解析 JSON 文件（按 path + mtime 缓存解析结果）。
+
+    返回的对象在多个请求间共享，调用方只能读取，不要原地修改。
+    """
+    key = ("json", os.path.abspath(path))
+    version = _file_version(path)
+    cached = analysis_cache.get(key, version)
+    if cached is not None:
+        return cached
+
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    analysis_cache.put(key, version, data, version[1] * _PARSED_SIZE_FACTOR)
+    return data
+
+
+def load_serialized(path: str, kind: str, build: Callable[[Any], Any]) -> bytes:
+    """基于 JSON 文件构造响应体并缓存序列化后的字节（按 path + mtime 失效）。
+
+    build 接收解析后的文件内容，返回可 JSON 序列化的响应对象。
+    """
+    key = (kind, os.path.abspath(path))
+    version = _file_version(path)
+    cached = analysis_cache.get(key, version)
+    if cached is not None:
+        return cached
+
+    # 只缓存序列化结果，不再额外缓存解析对象，避免同一文件占两份内存
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    body = json.dumps(build(data), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    analysis_cache.put(key, version, body, len(body))
+    return body
@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from sqlalchemy import delete, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.database import sync_engine
+from app.models import UploadChunk, UploadSession
+
+# 分片上传：init 创建会话并预分配临时文件 -> 各分片按偏移（index * chunk_size）并行 PUT，
+# 直接 pwrite 到临时文件的对应位置 -> complete 校验分片齐全后移动到 UPLOAD_DIR 并创建视频。
+# 已收到的分片记录在 upload_chunks（含 SHA-256），断线后客户端查询会话只补传缺失的分片。
+
+
+def chunk_count(upload: UploadSession) -> int:
+    return max((upload.total_size + upload.chunk_size - 1) // upload.chunk_size, 1)
+
+
+def chunk_length(upload: UploadSession, index: int) -> int:
+    """第 index 片应有的字节数（最后一片为余下部分）"""
+    return max(min(upload.chunk_size, upload.total_size - index * upload.chunk_size), 0)
+
+
+def create_upload_session(session: Session, file_name: str, ext: str, total_size: int, chunk_size: int) -> UploadSession:
+    upload = UploadSession(file_name=file_name, ext=ext, total_size=total_size, chunk_size=chunk_size, temp_path="")
+    upload.temp_path = str(Path(settings.UPLOAD_TEMP_DIR) / f"{upload.upload_id}.part")
+    session.add(upload)
+    session.commit()
+    session.refresh(upload)
+    return upload
+
+
+def received_chunks(session: Session, upload_id: UUID) -> List[int]:
+    return list(
+        session.exec(
+            select(UploadChunk.chunk_index).where(UploadChunk.upload_id == upload_id).order_by(UploadChunk.chunk_index)
+        )
+    )
+
+
+def record_chunk(session: Session, upload_id: UUID, index: int, size: int, sha256: str) -> None:
+    """记录已写入的分片（重传同一分片时覆盖），并刷新会话的最后活动时间"""
+    now = datetime.utcnow()
+    stmt = pg_insert(UploadChunk.__table__).values(
+        upload_id=upload_id, chunk_index=index, size=size, sha256=sha256, received_at=now
+    )
+    session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[UploadChunk.upload_id, UploadChunk.chunk_index],
+            set_={"size": size, "sha256": sha256, "received_at": now},
+        )
+    )
+    session.execute(update(UploadSession).where(UploadSession.upload_id == upload_id).values(updated_at=now))
+    session.commit()
+
+
+def claim_upload(session: Session, upload_id: UUID) -> bool:
+    """标记会话开始合并；同一会话并发 complete 时只有一个请求返回 True"""
+    claimed = session.execute(
+        update(UploadSession)
+        .where(UploadSession.upload_id == upload_id, UploadSession.completed_at.is_(None))
+        .values(completed_at=datetime.utcnow())
+    ).rowcount
+    session.commit()
+    return bool(claimed)
+
+
+def release_upload(session: Session, upload_id: UUID) -> None:
+    """合并失败：撤销 claim，客户端可以重试 complete"""
+    session.execute(update(UploadSession).where(UploadSession.upload_id == upload_id).values(completed_at=None))
+    session.commit()
+
+
+def finish_upload(session: Session, upload_id: UUID, video_id: UUID) -> None:
+    """合并完成：记录生成的视频，分片记录不再需要"""
+    session.execute(update(UploadSession).where(UploadSession.upload_id == upload_id).values(video_id=video_id))
+    session.execute(delete(UploadChunk).where(UploadChunk.upload_id == upload_id))
+    session.commit()
+
+
+def delete_upload_session(session: Session, upload_id: UUID) -> None:
+    session.execute(delete(UploadSession).where(UploadSession.upload_id == upload_id))
+    session.commit()
+
+
+def upload_status(upload: UploadSession, received: List[int]) -> Dict[str, Any]:
+    return {
+        "uploadId": str(upload.upload_id),
+        "fileName": upload.file_name,
+        "size": upload.total_size,
+        "chunkSize": upload.chunk_size,
+        "chunkCount": chunk_count(upload),
+        "receivedChunks": received,
+        "completed": upload.completed_at is not None,
+        "videoId": str(upload.video_id) if upload.video_id else None,
+    }
+
+
+# ---- 临时文件（在线程池中执行）----
+
+
+def allocate_temp_file(path: str, size: int) -> None:
+    """创建临时文件并扩展到最终大小（稀疏文件，不实际写入），各分片随后按偏移写入"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "wb") as fh:
+        fh.truncate(size)
+
+
+def write_chunk(path: str, offset: int, data: bytes, expected_sha256: Optional[str]) -> str:
+    """校验分片内容后写入临时文件的 offset 处，返回内容的 SHA-256。
+
+    校验不通过时不写入；不同分片写入的区间互不重叠，并行上传时无需加锁。
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    if expected_sha256 and digest != expected_sha256.lower():
+        raise ValueError(f"分片校验失败：期望 {expected_sha256}，实际 {digest}")
+
+    fd = os.open(path, os.O_WRONLY)
+    try:
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(fd, view, offset)
+            view = view[written:]
+            offset += written
+    finally:
+        os.close(fd)
+    return digest
+
+
+def move_to_upload_dir(temp_path: str, save_path: str) -> int:
+    """临时文件移动到上传目录（同一文件系统时为重命名），返回文件字节数"""
+    os.makedirs(os.path.dirname(save_path) or ".", exist_ok=True)
+    shutil.move(temp_path, save_path)
+    return os.path.getsize(save_path)
+
+
+def move_back_to_temp(save_path: str, temp_path: str) -> None:
+    """合并后创建视频失败：文件移回临时文件位置（分片记录仍在），客户端可重试 complete"""
+    try:
+        shutil.move(save_path, temp_path)
+    except OSError as e:
+        # 移不回去时删除，避免上传目录中留下没有视频记录的文件；客户端需重新上传
+        print(f"Warn: 文件移回临时目录失败，已删除: {e}")
+        remove_temp_file(save_path)
+
+
+def remove_temp_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def remove_expired_uploads(session: Session, now: Optional[datetime] = None) -> int:
+    """清理超过 UPLOAD_SESSION_TTL_HOURS 未活动的上传会话及其临时文件，返回清理的会话数"""
+    cutoff = (now or datetime.utcnow()) - timedelta(hours=settings.UPLOAD_SESSION_TTL_HOURS)
+    expired = session.exec(select(UploadSession).where(UploadSession.updated_at < cutoff)).all()
+    for upload in expired:
+        # 已完成的会话临时文件已被移走，删除时忽略不存在的文件
+        remove_temp_file(upload.temp_path)
+    if expired:
+        session.execute(delete(UploadSession).where(UploadSession.upload_id.in_([u.upload_id for u in expired])))
+        session.commit()
+    return len(expired)
+
+
+def remove_expired_uploads_job() -> int:
+    """使用独立的同步会话清理过期上传（含文件删除，在线程池中执行）"""
+    with Session(sync_engine) as session:
+        return remove_expired_uploads(session)
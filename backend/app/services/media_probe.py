@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import subprocess
+from fractions import Fraction
+from typing import Any, Dict, Optional
+
+import cv2
+
+# 上传时探测一次媒体元数据并写入 video_sources（列表接口、缩略图、分析任务都直接使用，不再打开文件）：
+# 优先 ffprobe（容器时长对可变帧率视频也准确、有编码名与码率），没有 ffprobe 时退回 OpenCV。
+# 返回的键与 VideoSource 的列同名。
+
+
+def _empty(size_bytes: int) -> Dict[str, Any]:
+    return {
+        "width": None,
+        "height": None,
+        "video_codec": None,
+        "audio_codec": None,
+        "fps": None,
+        "frame_count": None,
+        "bit_rate": None,
+        "duration": 0.0,
+        "size_bytes": size_bytes,
+    }
+
+
+def _rate(value: Optional[str]) -> Optional[float]:
+    """ffprobe 的帧率形如 30000/1001；0/0 表示未知"""
+    try:
+        rate = Fraction(value or "")
+    except (ValueError, ZeroDivisionError):
+        return None
+    return float(rate) if rate > 0 else None
+
+
+def _number(value: Any, cast=float) -> Optional[Any]:
+    try:
+        return cast(value) if value not in (None, "", "N/A") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _probe_ffprobe(ffprobe: str, path: str, size_bytes: int) -> Optional[Dict[str, Any]]:
+    try:
+        out = subprocess.run(
+            [ffprobe, "-v", "error", "-show_format", "-show_streams", "-of", "json", path],
+            check=True,
+            capture_output=True,
+            timeout=120,
+        ).stdout
+        info = json.loads(out or b"{}")
+    except (subprocess.SubprocessError, OSError, ValueError) as e:
+        print(f"Warn: ffprobe 探测失败，改用 OpenCV: {e}")
+        return None
+
+    streams = info.get("streams") or []
+    video = next((s for s in streams if s.get("codec_type") == "video"), None)
+    if video is None:
+        return None
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+    fmt = info.get("format") or {}
+
+    meta = _empty(size_bytes)
+    # avg_frame_rate 为平均帧率（可变帧率时 r_frame_rate 是时间基推算的上限，不可用于估算帧数）
+    fps = _rate(video.get("avg_frame_rate")) or _rate(video.get("r_frame_rate"))
+    duration = _number(fmt.get("duration")) or _number(video.get("duration")) or 0.0
+    frame_count = _number(video.get("nb_frames"), int)
+    if frame_count is None and fps and duration:
+        # MKV / WebM 等容器不记录帧数，按平均帧率估算
+        frame_count = round(duration * fps)
+
+    meta.update(
+        width=_number(video.get("width"), int),
+        height=_number(video.get("height"), int),
+        video_codec=video.get("codec_name"),
+        audio_codec=audio.get("codec_name") if audio else None,
+        fps=fps,
+        frame_count=frame_count,
+        bit_rate=_number(fmt.get("bit_rate"), int) or (round(size_bytes * 8 / duration) if duration else None),
+        duration=duration,
+    )
+    return meta
+
+
+def _fourcc(code: int) -> Optional[str]:
+    """OpenCV 的 FOURCC 整数 -> 编码标识，e.g., avc1 / fmp4"""
+    text = bytes((code >> 8 * i) & 0xFF for i in range(4)).decode("latin-1").strip("\0 ").lower()
+    return text or None
+
+
+def _probe_opencv(path: str, size_bytes: int) -> Dict[str, Any]:
+    meta = _empty(size_bytes)
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            return meta
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0
+        frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        fourcc = int(cap.get(cv2.CAP_PROP_FOURCC) or 0)
+
+        # 时长取最后一帧的时间戳（可变帧率时比 帧数 / 帧率 准确），定位失败时退回估算
+        duration = frames / fps if fps > 0 else 0.0
+        if frames > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frames - 1)
+            ok, _ = cap.read()
+            last_ms = cap.get(cv2.CAP_PROP_POS_MSEC) if ok else 0
+            if last_ms > 0:
+                duration = last_ms / 1000.0 + (1.0 / fps if fps > 0 else 0.0)
+
+        meta.update(
+            width=int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or None,
+            height=int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or None,
+            video_codec=_fourcc(fourcc),
+            fps=fps or None,
+            frame_count=frames or None,
+            bit_rate=round(size_bytes * 8 / duration) if duration else None,
+            duration=duration,
+        )
+    finally:
+        cap.release()
+    return meta
+
+
+def probe_media(path: str) -> Dict[str, Any]:
+    """探测视频元数据（阻塞调用，在线程池 / 后台任务中执行）"""
+    size_bytes = os.path.getsize(path)
+    ffprobe = shutil.which("ffprobe")
+    meta = _probe_ffprobe(ffprobe, path, size_bytes) if ffprobe else None
+    return meta or _probe_opencv(path, size_bytes)
+
+
+def quality_label(height: Optional[int]) -> str:
+    """按分辨率高度给出清晰度标签（列表页 quality 列）"""
+    if not height:
+        return ""
+    for min_height, label in ((2160, "4K"), (1440, "2K"), (1080, "1080P"), (720, "720P"), (480, "480P")):
+        if height >= min_height:
+            return label
+    return f"{height}P"
@@ -0,0 +1,405 @@
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import struct
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+
+# 可选依赖：未安装时仅生成 gzip 版本，且不提供 msgpack 编码
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+HAS_MSGPACK = msgpack is not None
+
+# 帧偏移索引：每帧一条定长记录 (timestamp: float64, byte_offset: uint64)，按时间递增
+# 定长记录可直接 seek 二分查找，查询窗口时无需读取整个索引或整份 overlays
+_INDEX_RECORD = struct.Struct("<dQ")
+# 索引文件头：(magic, NDJSON 字节数, NDJSON mtime_ns)，占两条记录的长度。
+# NDJSON 与索引分两次替换，读取时核对文件头与所打开的 NDJSON 一致，避免新数据配旧偏移
+_INDEX_HEADER = struct.Struct("<8sQq8x")
+_INDEX_MAGIC = b"OVLIDX01"
+_INDEX_OPEN_ATTEMPTS = 3
+
+# msgpack 编码时 box_norm 坐标量化为整数（0~10000，即万分之一画面精度）
+BOX_QUANT_SCALE = 10000
+
+
+def overlay_artifact_paths(analysis_json_path: str) -> Dict[str, str]:
+    """分析结果 JSON 旁的 overlays 派生产物路径"""
+    base = os.path.splitext(analysis_json_path)[0]
+    return {
+        "ndjson": f"{base}.overlays.ndjson",
+        "index": f"{base}.overlays.idx",
+        # 预压缩的完整 overlays 响应体（与 /dashboard/overlays 的 JSON 响应逐字节一致）
+        "json.gz": f"{base}.overlays.json.gz",
+        "json.br": f"{base}.overlays.json.br",
+        # 紧凑二进制编码（坐标量化）
+        "msgpack.gz": f"{base}.overlays.msgpack.gz",
+        "msgpack.br": f"{base}.overlays.msgpack.br",
+        # 增量编码（见 encode_overlay_delta）
+        "delta.gz": f"{base}.overlays.delta.gz",
+        "delta.br": f"{base}.overlays.delta.br",
+        # 每条轨迹的汇总索引（见 track_index）
+        "tracks": f"{base}.tracks.json",
+    }
+
+
+def _dumps_line(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+def write_overlay_index(
+    analysis_json_path: str,
+    *,
+    header: Dict[str, Any],
+    overlays: List[Dict[str, Any]],
+) -> Dict[str, str]:
+    """写出按帧分行的 overlays（NDJSON）及其帧偏移索引。
+
+    NDJSON 第一行为 header（宽高、fps、zones 等元信息），之后每行一帧。
+    先写临时文件再原子替换，避免并发读取到半截文件。
+    """
+    paths = overlay_artifact_paths(analysis_json_path)
+    tmp_ndjson = _temp_path(paths["ndjson"])
+    tmp_index = _temp_path(paths["index"])
+
+    header = {**header, "frame_count": len(overlays)}
+    try:
+        with open(tmp_ndjson, "wb") as f, open(tmp_index, "wb") as idx:
+            idx.write(bytes(_INDEX_HEADER.size))
+            f.write(_dumps_line(header))
+            for frame in overlays:
+                idx.write(_INDEX_RECORD.pack(float(frame.get("timestamp") or 0.0), f.tell()))
+                f.write(_dumps_line(frame))
+            f.flush()
+            idx.seek(0)
+            idx.write(_index_header(os.fstat(f.fileno())))
+
+        os.replace(tmp_ndjson, paths["ndjson"])
+        os.replace(tmp_index, paths["index"])
+    finally:
+        _remove_quietly(tmp_ndjson)
+        _remove_quietly(tmp_index)
+    return paths
+
+
+def _index_header(ndjson_stat: os.stat_result) -> bytes:
+    return _INDEX_HEADER.pack(_INDEX_MAGIC, ndjson_stat.st_size, ndjson_stat.st_mtime_ns)
+
+
+def _index_matches(idx_file, ndjson_stat: os.stat_result) -> bool:
+    """索引文件头是否对应该 NDJSON（旧格式的索引没有文件头，同样视为不匹配）"""
+    idx_file.seek(0)
+    return idx_file.read(_INDEX_HEADER.size) == _index_header(ndjson_stat)
+
+
+def ensure_overlay_index(analysis_json_path: str) -> Dict[str, str]:
+    """确保索引存在且与 NDJSON 配套；对索引功能上线前生成的旧分析结果，首次访问时补建一次"""
+    paths = overlay_artifact_paths(analysis_json_path)
+    if os.path.exists(paths["ndjson"]) and os.path.exists(paths["index"]):
+        if os.path.getmtime(paths["index"]) >= os.path.getmtime(analysis_json_path):
+            with open(paths["index"], "rb") as idx:
+                if _index_matches(idx, os.stat(paths["ndjson"])):
+                    return paths
+
+    with open(analysis_json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    overlays = data.get("overlays") or data.get("frames") or []
+    header = {k: data.get(k) for k in ("video_id", "width", "height", "fps")}
+    header["zones"] = data.get("zones") or []
+    return write_overlay_index(analysis_json_path, header=header, overlays=overlays)
+
+
+def _seek_record(idx_file, i: int) -> None:
+    idx_file.seek(_INDEX_HEADER.size + i * _INDEX_RECORD.size)
+
+
+def _bisect_timestamp(idx_file, count: int, t: float) -> int:
+    """在索引文件中二分查找第一条 timestamp >= t 的记录下标"""
+    lo, hi = 0, count
+    while lo < hi:
+        mid = (lo + hi) // 2
+        _seek_record(idx_file, mid)
+        ts, _ = _INDEX_RECORD.unpack(idx_file.read(_INDEX_RECORD.size))
+        if ts < t:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def read_overlay_window(
+    analysis_json_path: str,
+    start: float,
+    end: float,
+    *,
+    max_frames: Optional[int] = None,
+) -> Dict[str, Any]:
+    """读取 [start, end) 时间窗口内的 overlays 帧。
+
+    耗时只与窗口内帧数相关（索引二分 O(log n) + 顺序读取窗口内的行），与视频总时长无关。
+    返回 header 元信息、窗口内帧列表，以及下一帧的时间戳（供前端续拉）。
+    """
+    # 打开的两个文件可能恰好落在另一次重建的两次替换之间，不配套时重新打开
+    for _ in range(_INDEX_OPEN_ATTEMPTS):
+        paths = ensure_overlay_index(analysis_json_path)
+        with open(paths["ndjson"], "rb") as f, open(paths["index"], "rb") as idx:
+            if _index_matches(idx, os.fstat(f.fileno())):
+                return _read_window(f, idx, start, end, max_frames)
+    raise RuntimeError("overlays 索引与数据文件不一致")
+
+
+def _read_window(f, idx, start: float, end: float, max_frames: Optional[int]) -> Dict[str, Any]:
+    header = json.loads(f.readline())
+    count = (os.fstat(idx.fileno()).st_size - _INDEX_HEADER.size) // _INDEX_RECORD.size
+
+    first = _bisect_timestamp(idx, count, start)
+    frames: List[Dict[str, Any]] = []
+    next_ts: Optional[float] = None
+
+    if first < count:
+        _seek_record(idx, first)
+        _, offset = _INDEX_RECORD.unpack(idx.read(_INDEX_RECORD.size))
+        f.seek(offset)
+        for line in f:
+            frame = json.loads(line)
+            ts = float(frame.get("timestamp") or 0.0)
+            if ts >= end or (max_frames is not None and len(frames) >= max_frames):
+                next_ts = ts
+                break
+            frames.append(frame)
+
+    return {"header": header, "overlays": frames, "next_timestamp": next_ts}
+
+
+def overlays_response_body(overlays: List[Dict[str, Any]], zones: List[Any]) -> Dict[str, Any]:
+    """/dashboard/overlays 的完整响应体"""
+    return {"code": 0, "message": "ok", "data": {"overlays": overlays, "zones": zones}}
+
+
+def _quantize_box(box: Dict[str, Any]) -> List[int]:
+    return [int(round(float(box.get(k) or 0.0) * BOX_QUANT_SCALE)) for k in ("x", "y", "w", "h")]
+
+
+def _msgpack_body(overlays: List[Dict[str, Any]], zones: List[Any]) -> Dict[str, Any]:
+    """msgpack 版响应体：box_norm 量化为 [x, y, w, h] 整数数组，其余字段保持不变"""
+    frames = []
+    for frame in overlays:
+        objects = []
+        for obj in frame.get("objects") or []:
+            item = {k: v for k, v in obj.items() if k != "box_norm"}
+            item["box"] = _quantize_box(obj.get("box_norm") or {})
+            objects.append(item)
+        frames.append({"frame_id": frame.get("frame_id"), "timestamp": frame.get("timestamp"), "objects": objects})
+    body = overlays_response_body(frames, zones)
+    body["data"]["boxScale"] = BOX_QUANT_SCALE
+    return body
+
+
+def encode_overlay_delta(overlays: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """overlays 增量编码（version 1）。
+
+    - tracks：轨迹 ID 表，每条轨迹只出现一次
+    - states：去重后的状态表 [class, alarm_level, color, zone_id, zoneName]
+      （class 也并入状态表，同一轨迹偶发类别跳变时仍可无损还原）
+    - frames：[frame_id, timestamp, objects]，每个目标为
+      [track_idx, dx, dy, dw, dh] 或 [track_idx, dx, dy, dw, dh, state_idx]
+      box 量化为 BOX_QUANT_SCALE 分之一后，与该轨迹上一次出现时的 box 做差（首次出现相对 0）；
+      state_idx 仅在该轨迹首次出现或状态变化时给出。
+
+    box 在量化精度内还原，其余字段无损。
+    """
+    tracks: List[Any] = []
+    track_index: Dict[Any, int] = {}
+    states: List[List[Any]] = []
+    state_index: Dict[Tuple[Any, ...], int] = {}
+    last_box: Dict[int, List[int]] = {}
+    last_state: Dict[int, int] = {}
+
+    frames = []
+    for frame in overlays:
+        objects = []
+        for obj in frame.get("objects") or []:
+            tid = obj.get("id")
+            ti = track_index.get(tid)
+            if ti is None:
+                ti = track_index[tid] = len(tracks)
+                tracks.append(tid)
+
+            box = _quantize_box(obj.get("box_norm") or {})
+            prev = last_box.get(ti, (0, 0, 0, 0))
+            entry = [ti, box[0] - prev[0], box[1] - prev[1], box[2] - prev[2], box[3] - prev[3]]
+            last_box[ti] = box
+
+            state = (obj.get("class"), obj.get("alarm_level"), obj.get("color"), obj.get("zone_id"), obj.get("zoneName"))
+            si = state_index.get(state)
+            if si is None:
+                si = state_index[state] = len(states)
+                states.append(list(state))
+            if last_state.get(ti) != si:
+                entry.append(si)
+                last_state[ti] = si
+
+            objects.append(entry)
+        frames.append([frame.get("frame_id"), frame.get("timestamp"), objects])
+
+    return {"version": 1, "boxScale": BOX_QUANT_SCALE, "tracks": tracks, "states": states, "frames": frames}
+
+
+def decode_overlay_delta(doc: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """encode_overlay_delta 的逆过程，还原为 overlays 帧列表"""
+    scale = float(doc.get("boxScale") or BOX_QUANT_SCALE)
+    tracks = doc.get("tracks") or []
+    states = doc.get("states") or []
+    last_box: Dict[int, List[int]] = {}
+    last_state: Dict[int, int] = {}
+
+    overlays = []
+    for frame_id, timestamp, entries in doc.get("frames") or []:
+        objects = []
+        for entry in entries:
+            ti = entry[0]
+            prev = last_box.get(ti, [0, 0, 0, 0])
+            box = [prev[k] + entry[k + 1] for k in range(4)]
+            last_box[ti] = box
+            if len(entry) > 5:
+                last_state[ti] = entry[5]
+            cls, alarm_level, color, zone_id, zone_name = states[last_state[ti]]
+            objects.append(
+                {
+                    "id": tracks[ti],
+                    "class": cls,
+                    "box_norm": {"x": box[0] / scale, "y": box[1] / scale, "w": box[2] / scale, "h": box[3] / scale},
+                    "alarm_level": alarm_level,
+                    "color": color,
+                    "zone_id": zone_id,
+                    "zoneName": zone_name,
+                }
+            )
+        overlays.append({"frame_id": frame_id, "timestamp": timestamp, "objects": objects})
+    return overlays
+
+
+def delta_response_body(overlays: List[Dict[str, Any]], zones: List[Any]) -> Dict[str, Any]:
+    return {"code": 0, "message": "ok", "data": {"encoding": "delta", "delta": encode_overlay_delta(overlays), "zones": zones}}
+
+
+def _temp_path(path: str) -> str:
+    """与 path 同目录的唯一临时文件（同一分析结果可能被多个请求 / 任务同时补生成）"""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".", suffix=".tmp")
+    os.close(fd)
+    return tmp
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    tmp = _temp_path(path)
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    finally:
+        _remove_quietly(tmp)
+
+
+def _compressed_formats() -> List[str]:
+    return ["json", "delta", "msgpack"] if msgpack is not None else ["json", "delta"]
+
+
+def _encode_body(fmt: str, overlays: List[Dict[str, Any]], zones: List[Any]) -> bytes:
+    """未压缩的 overlays 响应体（json / delta 为 JSON 文本，msgpack 为二进制）"""
+    if fmt == "msgpack":
+        return msgpack.packb(_msgpack_body(overlays, zones), use_bin_type=True)
+    body = overlays_response_body(overlays, zones) if fmt == "json" else delta_response_body(overlays, zones)
+    return json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _load_overlays(analysis_json_path: str) -> Tuple[List[Dict[str, Any]], List[Any]]:
+    with open(analysis_json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data.get("overlays") or data.get("frames") or [], data.get("zones") or []
+
+
+def write_compressed_overlays(
+    analysis_json_path: str,
+    *,
+    overlays: List[Dict[str, Any]],
+    zones: List[Any],
+    formats: Optional[List[str]] = None,
+) -> Dict[str, str]:
+    """预先生成压缩后的 overlays 响应体（gzip / brotli，JSON / 增量编码 / msgpack），请求时直接回传文件。
+
+    formats 为空时生成全部格式；请求中补生成时只传入所需格式。
+    """
+    paths = overlay_artifact_paths(analysis_json_path)
+    for fmt in formats or _compressed_formats():
+        raw = _encode_body(fmt, overlays, zones)
+        # mtime=0：相同内容产出相同字节，便于比对
+        _write_atomic(paths[f"{fmt}.gz"], gzip.compress(raw, compresslevel=9, mtime=0))
+        if brotli is not None:
+            _write_atomic(paths[f"{fmt}.br"], brotli.compress(raw, quality=9))
+    return paths
+
+
+def ensure_compressed_overlays(analysis_json_path: str, fmt: Optional[str] = None) -> Dict[str, str]:
+    """确保 fmt（默认全部格式）的预压缩产物都存在且不旧于分析结果；旧版本分析结果或产物缺失时补生成一次"""
+    paths = overlay_artifact_paths(analysis_json_path)
+    encodings = ["gz", "br"] if brotli is not None else ["gz"]
+    formats = [fmt] if fmt else _compressed_formats()
+    required = [paths[f"{f}.{enc}"] for f in formats for enc in encodings]
+    source_mtime = os.path.getmtime(analysis_json_path)
+    if all(os.path.exists(p) and os.path.getmtime(p) >= source_mtime for p in required):
+        return paths
+
+    overlays, zones = _load_overlays(analysis_json_path)
+    return write_compressed_overlays(analysis_json_path, overlays=overlays, zones=zones, formats=formats)
+
+
+def overlay_body(analysis_json_path: str, fmt: str) -> bytes:
+    """现场编码未压缩的响应体（预压缩文件不可用时的兜底）"""
+    overlays, zones = _load_overlays(analysis_json_path)
+    return _encode_body(fmt, overlays, zones)
+
+
+def pick_compressed_overlays(analysis_json_path: str, fmt: str, accept_encoding: str) -> Tuple[Optional[str], str]:
+    """按客户端 Accept-Encoding 选择预压缩文件，返回 (文件路径, content-encoding)。
+
+    优先 br，其次 gzip；都不接受时返回 (gzip 文件, "identity")，由调用方解压后回传；
+    预压缩文件不存在或无法补生成（目录不可写、磁盘已满等）时返回 (None, "identity")，
+    由调用方现场编码（见 overlay_body）。
+    """
+    try:
+        paths = ensure_compressed_overlays(analysis_json_path, fmt)
+    except OSError as e:
+        print(f"Warn: 预压缩 overlays 生成失败，改为现场编码: {e}")
+        return None, "identity"
+    accepted = {part.split(";")[0].strip().lower() for part in (accept_encoding or "").split(",")}
+
+    br = paths[f"{fmt}.br"]
+    if "br" in accepted and os.path.exists(br):
+        return br, "br"
+    gz = paths[f"{fmt}.gz"]
+    if not os.path.exists(gz):
+        return None, "identity"
+    return gz, "gzip" if "gzip" in accepted else "identity"
+
+
+def remove_overlay_artifacts(analysis_json_path: str) -> None:
+    for path in overlay_artifact_paths(analysis_json_path).values():
+        if os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import func, select
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.models import AlarmEvent, Zone
+
+
+class RecentAlarmBuffer:
+    """每个视频最近 N 条报警的内存环形缓冲（按视频内时间倒序），供仪表盘高频读取。
+
+    启动时从数据库预热；之后随报警写入同步更新，读取路径不访问数据库。
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._by_video: Dict[str, List[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def _trim(self, items: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # 同一条报警（id 相同）只保留一份
+        unique = {it["id"]: it for it in items}
+        return sorted(unique.values(), key=lambda it: float(it.get("time") or 0.0), reverse=True)[: self.capacity]
+
+    def replace(self, video_id: str, items: Iterable[Dict[str, Any]]) -> None:
+        trimmed = self._trim(items)
+        with self._lock:
+            if trimmed:
+                self._by_video[str(video_id)] = trimmed
+            else:
+                self._by_video.pop(str(video_id), None)
+
+    def add(self, video_id: str, items: Iterable[Dict[str, Any]]) -> None:
+        with self._lock:
+            current = self._by_video.get(str(video_id), [])
+            self._by_video[str(video_id)] = self._trim([*current, *items])
+
+    def event_ids(self) -> List[str]:
+        """缓冲中全部报警的 event_id"""
+        with self._lock:
+            return [it["id"].lstrip("#") for items in self._by_video.values() for it in items]
+
+    def mark(self, event_ids: Iterable[str], *, ack: bool = False) -> None:
+        """将指定报警标记为已读（ack=True 时同时标记为已处理）；替换为新的 dict，不影响已被读取的列表"""
+        ids = {f"#{event_id}" for event_id in event_ids}
+        if not ids:
+            return
+        changes: Dict[str, Any] = {"isRead": True}
+        if ack:
+            changes["status"] = "done"
+        with self._lock:
+            for video_id, items in self._by_video.items():
+                self._by_video[video_id] = [{**it, **changes} if it["id"] in ids else it for it in items]
+
+    def remove_video(self, video_id: str) -> None:
+        with self._lock:
+            self._by_video.pop(str(video_id), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._by_video.clear()
+
+    def latest(self, video_id: str, limit: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._by_video.get(str(video_id), [])[:limit])
+
+
+recent_alarms = RecentAlarmBuffer(settings.RECENT_ALARMS_PER_VIDEO)
+
+
+def recent_alarm_item(alarm: Dict[str, Any], zone_name: Any = None) -> Dict[str, Any]:
+    """列表项（alarm_to_dict 的结果）补充防区名称"""
+    return {**alarm, "zoneName": zone_name or ""}
+
+
+def warm_recent_alarms(session: Session) -> int:
+    """启动预热：一次查询取出每个视频最近 N 条报警（关联防区名称）"""
+    from app.services.alarm_store import alarm_to_dict
+
+    ranked = select(
+        AlarmEvent.event_id,
+        func.row_number()
+        .over(partition_by=AlarmEvent.video_id, order_by=AlarmEvent.video_timestamp.desc())
+        .label("rn"),
+    ).subquery()
+    stmt = (
+        select(AlarmEvent, Zone.name)
+        .join(ranked, ranked.c.event_id == AlarmEvent.event_id)
+        .outerjoin(Zone, Zone.id == AlarmEvent.zone_id)
+        .where(ranked.c.rn <= recent_alarms.capacity)
+    )
+
+    grouped: Dict[str, List[Dict[str, Any]]] = {}
+    for alarm, zone_name in session.execute(stmt).all():
+        grouped.setdefault(str(alarm.video_id), []).append(recent_alarm_item(alarm_to_dict(alarm), zone_name))
+
+    for video_id, items in grouped.items():
+        recent_alarms.replace(video_id, items)
+    return sum(len(v) for v in grouped.values())
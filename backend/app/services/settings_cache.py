@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, Optional, Protocol
+from uuid import UUID
+
+import psycopg
+from sqlalchemy import or_, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import make_url
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.models import SystemSettings, VideoSource
+
+# system_settings 变更通知频道：NOTIFY 随事务提交送达，各 worker 收到后使本进程缓存失效
+NOTIFY_CHANNEL = "system_settings_changed"
+
+_SETTINGS_ID = 1
+
+
+class NotifiedCache(Protocol):
+    """依赖 LISTEN 通知失效的进程内缓存"""
+
+    def invalidate(self) -> None: ...
+
+    def set_listening(self, listening: bool) -> None: ...
+
+
+class SystemSettingsCache:
+    """system_settings 单行配置的进程内缓存（几乎每个视频 / 配置接口都要读当前源）。
+
+    - 读：命中时不访问数据库；未命中时查询一次并回填（查询期间发生失效则不回填）
+    - 写：update_system_settings 在同一事务内写入并 NOTIFY，提交后本进程失效，
+      其他 worker 由 LISTEN 线程收到通知后失效
+    - LISTEN 连接未建立（未启动或断线重连中）时不使用缓存，每次读库，保证不读到其他 worker 写入前的旧值
+    - 其他进程内缓存可通过 watch 注册自己的频道，共用同一条 LISTEN 连接
+    """
+
+    def __init__(self):
+        self._value: Optional[Dict[str, Any]] = None
+        self._generation = 0
+        self._listening = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # 频道 -> 收到通知时失效的缓存
+        self._watchers: Dict[str, NotifiedCache] = {NOTIFY_CHANNEL: self}
+
+    # ---- 读 ----
+
+    def get(self, session: Session) -> SystemSettings:
+        """当前配置（不与会话关联的副本，只读）；配置行不存在时创建"""
+        with self._lock:
+            if self._value is not None and self._listening:
+                return SystemSettings(**self._value)
+            generation = self._generation
+
+        value = self._load(session)
+        with self._lock:
+            if self._generation == generation and self._listening:
+                self._value = value
+        return SystemSettings(**value)
+
+    def _load(self, session: Session) -> Dict[str, Any]:
+        row = session.get(SystemSettings, _SETTINGS_ID, populate_existing=True)
+        if row is None:
+            session.execute(pg_insert(SystemSettings.__table__).values(id=_SETTINGS_ID).on_conflict_do_nothing())
+            session.commit()
+            row = session.get(SystemSettings, _SETTINGS_ID)
+        return row.model_dump()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._value = None
+
+    # ---- LISTEN ----
+
+    def watch(self, channel: str, cache: NotifiedCache) -> None:
+        """注册其他缓存的通知频道（须在 start_listener 之前调用）"""
+        self._watchers[channel] = cache
+
+    def start_listener(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._listen_forever, name="settings-listener", daemon=True)
+        self._thread.start()
+
+    def stop_listener(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def set_listening(self, listening: bool) -> None:
+        with self._lock:
+            self._listening = listening
+            self._generation += 1
+            self._value = None
+
+    def _listen_forever(self) -> None:
+        # 独立的 autocommit 连接（不占用连接池）；断线后每 5 秒重连
+        conninfo = make_url(settings.DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+        while not self._stop.is_set():
+            try:
+                with psycopg.connect(conninfo, autocommit=True) as conn:
+                    for channel in self._watchers:
+                        conn.execute(f"LISTEN {channel}")
+                    # LISTEN 生效之后才启用缓存：此前其他 worker 的写入已反映在随后的读库结果中
+                    self._set_all_listening(True)
+                    while not self._stop.is_set():
+                        for notify in conn.notifies(timeout=1.0):
+                            cache = self._watchers.get(notify.channel)
+                            if cache is not None:
+                                cache.invalidate()
+            except Exception as e:
+                print(f"Warn: system_settings listener disconnected: {e}")
+                self._stop.wait(5)
+            finally:
+                self._set_all_listening(False)
+
+    def _set_all_listening(self, listening: bool) -> None:
+        for cache in self._watchers.values():
+            cache.set_listening(listening)
+
+
+system_settings_cache = SystemSettingsCache()
+
+
+def notify_settings_changed(session: Session) -> None:
+    """在当前事务内发出变更通知（提交时送达；回滚则不送达）"""
+    session.execute(text("SELECT pg_notify(:channel, '')"), {"channel": NOTIFY_CHANNEL})
+
+
+def update_system_settings(session: Session, **values: Any) -> SystemSettings:
+    """写入配置并提交，返回写入后的配置。
+
+    配置行为单条 INSERT ... ON CONFLICT DO UPDATE ... RETURNING（行不存在时按默认值创建）；
+    切换当前源时 is_demo 同步也是单条 UPDATE（只改动前后两个源的行），往返次数与视频数量无关。
+    """
+    if not values:
+        return system_settings_cache.get(session)
+
+    table = SystemSettings.__table__
+    row = (
+        session.execute(
+            pg_insert(table)
+            .values(id=_SETTINGS_ID, **values)
+            .on_conflict_do_update(index_elements=[table.c.id], set_=values)
+            .returning(*table.c)
+        )
+        .mappings()
+        .one()
+    )
+    current: Optional[UUID] = values.get("current_source_id")
+    if current is not None:
+        # 兼容旧逻辑的 is_demo 字段：is_demo = (video_id = 当前源)
+        session.execute(
+            update(VideoSource)
+            .where(or_(VideoSource.is_demo == True, VideoSource.video_id == current))  # noqa: E712
+            .values(is_demo=VideoSource.video_id == current)
+        )
+    notify_settings_changed(session)
+    session.commit()
+    system_settings_cache.invalidate()
+    return SystemSettings(**row)
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+from app.services.analysis_cache import load_json
+from app.services.overlay_store import _write_atomic, overlay_artifact_paths
+
+# 同一轨迹在同一防区内，相邻两次出现间隔不超过该时长（秒）视为连续停留
+ZONE_GAP_SECONDS = 1.0
+
+_LEVEL_RANK = {None: 0, "WARNING": 1, "CRITICAL": 2}
+
+
+def track_index_path(analysis_json_path: str) -> str:
+    return overlay_artifact_paths(analysis_json_path)["tracks"]
+
+
+def build_track_index(overlays: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """由 overlays 汇总每条轨迹：类别、首末出现时间、防区进出区间、代表帧（框面积最大的一帧）"""
+    tracks: Dict[str, Dict[str, Any]] = {}
+    open_zone: Dict[str, Dict[str, Any]] = {}
+
+    def close_zone(track: Dict[str, Any], tid: str) -> None:
+        interval = open_zone.pop(tid, None)
+        if interval:
+            track["zones"].append(interval)
+
+    for frame in overlays:
+        ts = float(frame.get("timestamp") or 0.0)
+        frame_id = frame.get("frame_id")
+        for obj in frame.get("objects") or []:
+            tid = obj.get("id")
+            if tid is None:
+                continue
+            tid = str(tid)
+            box = obj.get("box_norm") or {}
+            area = float(box.get("w") or 0.0) * float(box.get("h") or 0.0)
+            level = obj.get("alarm_level")
+
+            track = tracks.get(tid)
+            if track is None:
+                track = tracks[tid] = {
+                    "id": tid,
+                    "class": obj.get("class"),
+                    "firstTimestamp": ts,
+                    "lastTimestamp": ts,
+                    "firstFrame": frame_id,
+                    "lastFrame": frame_id,
+                    "frameCount": 0,
+                    "maxAlarmLevel": None,
+                    "zones": [],
+                    "representative": None,
+                    "_area": -1.0,
+                }
+            track["lastTimestamp"] = ts
+            track["lastFrame"] = frame_id
+            track["frameCount"] += 1
+            if _LEVEL_RANK.get(level, 0) > _LEVEL_RANK.get(track["maxAlarmLevel"], 0):
+                track["maxAlarmLevel"] = level
+            if area > track["_area"]:
+                track["_area"] = area
+                track["representative"] = {"frameId": frame_id, "timestamp": ts, "box_norm": box}
+
+            # 防区进出区间：同一防区且间隔不超过 ZONE_GAP_SECONDS 则延续，否则结束上一段
+            zone_id = obj.get("zone_id")
+            interval = open_zone.get(tid)
+            if interval and (interval["zoneId"] != zone_id or ts - interval["exit"] > ZONE_GAP_SECONDS):
+                close_zone(track, tid)
+                interval = None
+            if zone_id is not None:
+                if interval is None:
+                    open_zone[tid] = {
+                        "zoneId": zone_id,
+                        "zoneName": obj.get("zoneName"),
+                        "level": level,
+                        "enter": ts,
+                        "exit": ts,
+                    }
+                else:
+                    interval["exit"] = ts
+                    if _LEVEL_RANK.get(level, 0) > _LEVEL_RANK.get(interval["level"], 0):
+                        interval["level"] = level
+
+    for tid, track in tracks.items():
+        close_zone(track, tid)
+        track.pop("_area", None)
+
+    return {"version": 1, "trackCount": len(tracks), "tracks": tracks}
+
+
+def write_track_index(analysis_json_path: str, overlays: List[Dict[str, Any]]) -> str:
+    path = track_index_path(analysis_json_path)
+    # 请求中可能并发补建：每次写入使用唯一的临时文件再原子替换
+    body = json.dumps(build_track_index(overlays), ensure_ascii=False, separators=(",", ":"))
+    _write_atomic(path, body.encode("utf-8"))
+    return path
+
+
+def load_track_index(analysis_json_path: str) -> Dict[str, Any]:
+    """读取轨迹索引（走进程内缓存，按轨迹 ID 直接取）；旧分析结果首次访问时补建"""
+    path = track_index_path(analysis_json_path)
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(analysis_json_path):
+        data = load_json(analysis_json_path)
+        write_track_index(analysis_json_path, data.get("overlays") or [])
+    return load_json(path)
+
+
+def find_tracks(
+    index: Dict[str, Any],
+    *,
+    cls: Optional[str] = None,
+    zone_id: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    items = []
+    for track in (index.get("tracks") or {}).values():
+        if cls and str(track.get("class") or "").lower() != cls.lower():
+            continue
+        if zone_id and not any(z.get("zoneId") == zone_id for z in track.get("zones") or []):
+            continue
+        items.append(track)
+    return sorted(items, key=lambda t: t.get("firstTimestamp") or 0.0)
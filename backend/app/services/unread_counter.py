@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import threading
+from typing import Optional
+
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app.models import AlarmEvent
+from app.services.alarm_query import count_alarms
+from app.services.settings_cache import system_settings_cache
+
+# 报警已读状态变更通知频道：各 worker 收到后使本进程的未读计数失效
+NOTIFY_CHANNEL = "alarm_unread_changed"
+
+
+class UnreadAlarmCounter:
+    """未读报警数的进程内缓存（侧边栏 badge 高频读取）。
+
+    首次读取时 COUNT 一次；之后已知增减量的写操作直接加减，
+    无法确定增减量的写操作（如重算报警时的删除）使缓存失效，下次读取重新 COUNT。
+    写操作在事务内 notify_unread_changed，其他 worker 经 system_settings 的 LISTEN 连接收到后失效；
+    LISTEN 连接未建立时不使用缓存，每次 COUNT。
+    """
+
+    def __init__(self):
+        self._value: Optional[int] = None
+        # 每次失效递增：COUNT 期间若发生写入，则本次结果不回填缓存
+        self._generation = 0
+        self._listening = False
+        self._lock = threading.Lock()
+
+    def get(self, session: Session) -> int:
+        with self._lock:
+            if self._value is not None and self._listening:
+                return self._value
+            generation = self._generation
+
+        value = count_alarms(session, [AlarmEvent.is_read == False])  # noqa: E712
+        with self._lock:
+            if self._generation == generation and self._listening and self._value is None:
+                self._value = value
+        return value
+
+    def adjust(self, delta: int) -> None:
+        with self._lock:
+            self._generation += 1
+            if self._value is not None:
+                self._value = max(self._value + delta, 0)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._value = None
+
+    def set_listening(self, listening: bool) -> None:
+        with self._lock:
+            self._listening = listening
+            self._generation += 1
+            self._value = None
+
+
+unread_counter = UnreadAlarmCounter()
+system_settings_cache.watch(NOTIFY_CHANNEL, unread_counter)
+
+
+def notify_unread_changed(session: Session) -> None:
+    """在当前事务内发出未读计数变更通知（提交时送达；回滚则不送达）"""
+    session.execute(text("SELECT pg_notify(:channel, '')"), {"channel": NOTIFY_CHANNEL})
@@ -2,12 +2,17 @@ from __future__ import annotations
 
 import json
 import os
-from typing import List, Tuple, Dict, Any
+from typing import List, Optional, Tuple, Dict, Any
 from uuid import uuid4
 
 import cv2
 import numpy as np
 
+from app.core.config import settings
+from app.services.analysis_cache import load_json
+from app.services.overlay_store import write_compressed_overlays, write_overlay_index
+from app.services.track_index import write_track_index
+
 
 def point_in_polygon(point: Tuple[float, float], polygon: List[Tuple[float, float]]) -> bool:
     """判断点是否在多边形内（使用 OpenCV pointPolygonTest）。
@@ -42,7 +47,7 @@ def foot_point_from_norm(box_norm: Dict[str, float], width: int, height: int) ->
     return (x1 + x2) / 2.0, y2
 
 
-def analyze_video(video_path: str, video_id: str) -> Dict[str, Any]:
+def analyze_video(video_path: str, video_id: str, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
     第一阶段：原始特征提取 (Trigger: 上传视频后)
 
@@ -51,7 +56,10 @@ def analyze_video(video_path: str, video_id: str) -> Dict[str, Any]:
     - 生成 raw_tracks.json：每帧 timestamp + objects(id, class, box_norm)
     - 不进行任何报警判定
     - 不写入 AlarmEvent 表
+    - metadata 为上传时探测的元数据（media_probe.probe_media）：分辨率 / 帧率 / 帧数 / 时长以其为准，
+      并原样写入 raw_tracks.json，后续处理可据此规划分批、抽帧步长与分段
     """
+    metadata = metadata or {}
 
     # 加载 YOLOv8 模型（使用绝对路径，避免受启动目录 cwd 影响）
     try:
@@ -82,9 +90,9 @@ def analyze_video(video_path: str, video_id: str) -> Dict[str, Any]:
     if not cap.isOpened():
         raise RuntimeError(f"无法打开视频文件: {video_path}")
 
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    fps = cap.get(cv2.CAP_PROP_FPS) or 25
+    width = metadata.get("width") or int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = metadata.get("height") or int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps = metadata.get("fps") or cap.get(cv2.CAP_PROP_FPS) or 25
 
     tracks: List[Dict[str, Any]] = []
 
@@ -170,6 +178,7 @@ def analyze_video(video_path: str, video_id: str) -> Dict[str, Any]:
                 "height": height,
                 "fps": fps,
                 "total_frames": frame_id,
+                "metadata": metadata,
                 "tracks": tracks,
             },
             f,
@@ -209,8 +218,8 @@ def compute_alarms(
     if not os.path.exists(raw_tracks_path):
         raise FileNotFoundError(f"raw_tracks.json 不存在: {raw_tracks_path}")
 
-    with open(raw_tracks_path, "r", encoding="utf-8") as f:
-        raw = json.load(f)
+    # 原始轨迹只读不改，走进程内缓存；反复调整防区保存时无需重复解析
+    raw = load_json(raw_tracks_path)
 
     width = int(raw.get("width") or 0)
     height = int(raw.get("height") or 0)
@@ -234,7 +243,7 @@ def compute_alarms(
 
     # 去抖动与冷却机制参数
     DEBOUNCE_FRAMES = 10  # 连续 N 帧在区内才确认入侵
-    COOLDOWN_SECONDS = 5.0  # 冷却期（秒）
+    COOLDOWN_SECONDS = settings.ALARM_COOLDOWN_SECONDS  # 冷却期（秒），也约束重算时的匹配容差
 
     # 黄色警戒区逗留阈值：连续停留超过该时间才触发（防路人穿越误报）
     WARNING_LOITER_SECONDS = 3.5
@@ -346,6 +355,9 @@ def compute_alarms(
                                 "object_type": obj.get("class"),
                                 "threat_level": "CRITICAL",
                                 "snapshot_path": None,
+                                "track_id": obj_id,
+                                "zone_id": hit_zone_id,
+                                "zone_name": hit_zone_name,
                             }
                         )
                         state["last_core_alarm_ts"] = ts
@@ -374,6 +386,9 @@ def compute_alarms(
                                     "object_type": obj.get("class"),
                                     "threat_level": "WARNING",
                                     "snapshot_path": None,
+                                    "track_id": obj_id,
+                                    "zone_id": hit_zone_id,
+                                    "zone_name": hit_zone_name,
                                 }
                             )
                             state["last_warning_alarm_ts"] = ts
@@ -400,9 +415,21 @@ def compute_alarms(
             },
             f,
             ensure_ascii=False,
-            indent=2,
+            # 紧凑输出：overlays 是最大的产物，缩进会让写入量与耗时成倍增加
+            separators=(",", ":"),
         )
 
+    # 按帧分行 + 帧偏移索引，供仪表盘按时间窗口拉取 overlays
+    write_overlay_index(
+        output_analysis_json_path,
+        header={"video_id": video_id, "width": width, "height": height, "fps": fps, "zones": zones},
+        overlays=overlays,
+    )
+    # 预压缩的完整 overlays 响应体（gzip / brotli / msgpack），接口直接回传文件
+    write_compressed_overlays(output_analysis_json_path, overlays=overlays, zones=zones)
+    # 轨迹汇总索引：按轨迹 ID 直接定位首末出现时间、防区进出区间与代表帧
+    write_track_index(output_analysis_json_path, overlays)
+
     return {
         "analysis_json_path": output_analysis_json_path,
         "alarm_events": alarm_events,
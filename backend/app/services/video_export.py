@@ -0,0 +1,339 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+import cv2
+import numpy as np
+
+from app.core.config import settings
+from app.services.overlay_store import read_overlay_window
+from app.services.video_playback import faststart_mp4
+
+# overlays 中的颜色名 -> OpenCV BGR
+_COLORS_BGR = {
+    "red": (68, 68, 239),
+    "orange": (11, 158, 245),
+    "green": (94, 197, 34),
+}
+_ZONE_COLORS_BGR = {"core": (68, 68, 239), "warning": (11, 158, 245)}
+
+# 每个分段至少的帧数：分段过短时进程启动与 seek 的开销占比过高
+_MIN_SEGMENT_FRAMES = 250
+
+
+@lru_cache(maxsize=1)
+def segment_fourcc() -> str:
+    """分段使用的编码：OpenCV 带 H.264 编码器时用 avc1（浏览器可直接播放），否则退回 mp4v（MPEG-4 Part 2，需 ffmpeg 转码）"""
+    fd, probe = tempfile.mkstemp(suffix=".mp4")
+    os.close(fd)
+    try:
+        writer = cv2.VideoWriter(probe, cv2.VideoWriter_fourcc(*"avc1"), 25, (64, 64))
+        supported = writer.isOpened()
+        writer.release()
+    finally:
+        os.remove(probe)
+    return "avc1" if supported else "mp4v"
+
+
+def plan_segments(start_frame: int, end_frame: int, workers: int) -> List[Tuple[int, int]]:
+    """将 [start_frame, end_frame) 切分为若干连续分段，每个 worker 至少一段"""
+    total = max(end_frame - start_frame, 0)
+    if total == 0:
+        return []
+    count = max(1, min(workers, total // _MIN_SEGMENT_FRAMES))
+    step = -(-total // count)
+    return [(s, min(s + step, end_frame)) for s in range(start_frame, end_frame, step)]
+
+
+def _draw_zones(frame: np.ndarray, zones: List[Dict[str, Any]]) -> None:
+    h, w = frame.shape[:2]
+    for z in zones or []:
+        pts = z.get("points") or []
+        if len(pts) < 3:
+            continue
+        poly = np.array([[float(p[0]) * w, float(p[1]) * h] for p in pts], dtype=np.int32).reshape((-1, 1, 2))
+        cv2.polylines(frame, [poly], True, _ZONE_COLORS_BGR.get(z.get("type"), (68, 68, 239)), 2)
+
+
+def _draw_objects(frame: np.ndarray, objects: List[Dict[str, Any]]) -> None:
+    h, w = frame.shape[:2]
+    for obj in objects or []:
+        box = obj.get("box_norm") or {}
+        x1 = int(float(box.get("x") or 0) * w)
+        y1 = int(float(box.get("y") or 0) * h)
+        x2 = int((float(box.get("x") or 0) + float(box.get("w") or 0)) * w)
+        y2 = int((float(box.get("y") or 0) + float(box.get("h") or 0)) * h)
+        color = _COLORS_BGR.get(obj.get("color"), _COLORS_BGR["green"])
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+
+        # Hershey 字体只支持 ASCII，标签仅用轨迹 ID 与类别
+        label = f"{obj.get('id') or ''} {obj.get('class') or ''}".strip()
+        if label:
+            (tw, th), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
+            top = max(y1 - th - 8, 0)
+            cv2.rectangle(frame, (x1, top), (x1 + tw + 8, top + th + 8), (0, 0, 0), -1)
+            cv2.putText(frame, label, (x1 + 4, top + th + 4), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+
+
+def _render_segment(args: Dict[str, Any]) -> Dict[str, Any]:
+    """子进程：渲染 [start_frame, end_frame) 到独立的分段文件"""
+    fps = args["fps"]
+    start_frame, end_frame = args["start_frame"], args["end_frame"]
+
+    # 只读取本分段时间范围内的 overlays（帧偏移索引，与视频总长无关）
+    window = read_overlay_window(
+        args["analysis_json_path"],
+        start_frame / fps - 1e-6,
+        end_frame / fps,
+    )
+    by_frame = {f.get("frame_id"): f.get("objects") or [] for f in window["overlays"]}
+    zones = window["header"].get("zones") or []
+
+    cap = cv2.VideoCapture(args["video_path"])
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    writer = cv2.VideoWriter(
+        args["output_path"], cv2.VideoWriter_fourcc(*args["fourcc"]), fps, (args["width"], args["height"])
+    )
+
+    written = 0
+    try:
+        for frame_id in range(start_frame, end_frame):
+            ok, frame = cap.read()
+            if not ok:
+                break
+            _draw_zones(frame, zones)
+            _draw_objects(frame, by_frame.get(frame_id, []))
+            writer.write(frame)
+            written += 1
+    finally:
+        cap.release()
+        writer.release()
+
+    return {"output_path": args["output_path"], "frames": written}
+
+
+def _concat_segments(segment_paths: List[str], output_path: str, fps: float, size: Tuple[int, int], fourcc: str) -> str:
+    """拼接分段，返回输出视频的编码（h264 / mpeg4）。
+
+    - 有 ffmpeg：concat demuxer 拼接；分段已是 H.264 时直接拷贝码流，否则用 libx264 转码（参数同播放副本）
+    - 无 ffmpeg：OpenCV 顺序重写，再把 moov 移到文件头；OpenCV 没有 H.264 编码器时输出为 MPEG-4 Part 2
+    """
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg:
+        if fourcc == "avc1":
+            codec_args = ["-c", "copy"]
+        else:
+            codec_args = ["-c:v", "libx264", "-preset", settings.PLAYBACK_PRESET, "-crf", str(settings.PLAYBACK_CRF),
+                          "-pix_fmt", "yuv420p"]
+        list_path = output_path + ".txt"
+        with open(list_path, "w", encoding="utf-8") as f:
+            for p in segment_paths:
+                f.write(f"file '{os.path.abspath(p)}'\n")
+        try:
+            subprocess.run(
+                [ffmpeg, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", list_path,
+                 *codec_args, "-movflags", "+faststart", output_path],
+                check=True,
+            )
+        finally:
+            os.remove(list_path)
+        return "h264"
+
+    if len(segment_paths) == 1:
+        os.replace(segment_paths[0], output_path)
+    else:
+        writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*fourcc), fps, size)
+        try:
+            for p in segment_paths:
+                cap = cv2.VideoCapture(p)
+                while True:
+                    ok, frame = cap.read()
+                    if not ok:
+                        break
+                    writer.write(frame)
+                cap.release()
+        finally:
+            writer.release()
+
+    # OpenCV 写出的 MP4 moov 在文件末尾：移到文件头，浏览器无需下载完即可播放
+    faststart_path = output_path + ".faststart.mp4"
+    try:
+        if faststart_mp4(output_path, faststart_path):
+            os.replace(faststart_path, output_path)
+    except ValueError as e:
+        print(f"Warn: 导出视频 fast-start 处理失败: {e}")
+    if fourcc != "avc1":
+        print("Warn: 未找到 ffmpeg 且 OpenCV 不支持 H.264 编码，导出视频为 MPEG-4 Part 2，浏览器可能无法播放")
+        return "mpeg4"
+    return "h264"
+
+
+def export_annotated_video(
+    *,
+    video_path: str,
+    analysis_json_path: str,
+    output_path: str,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    workers: Optional[int] = None,
+) -> Dict[str, Any]:
+    """将防区、检测框与报警颜色渲染进新视频（可限定 [start, end) 秒）。
+
+    按帧区间切分为多个分段，在进程池中并行渲染后拼接。
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"无法打开视频文件: {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    cap.release()
+
+    start_frame = max(int((start or 0.0) * fps), 0)
+    end_frame = frame_count if end is None else min(int(end * fps), frame_count)
+    if end_frame <= start_frame:
+        raise ValueError("导出时间范围为空")
+
+    workers = workers or os.cpu_count() or 1
+    segments = plan_segments(start_frame, end_frame, workers)
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    base = os.path.splitext(output_path)[0]
+    fourcc = segment_fourcc()
+    tasks = [
+        {
+            "video_path": video_path,
+            "analysis_json_path": analysis_json_path,
+            "output_path": f"{base}.part{i:03d}.mp4",
+            "start_frame": s,
+            "end_frame": e,
+            "fps": fps,
+            "width": width,
+            "height": height,
+            "fourcc": fourcc,
+        }
+        for i, (s, e) in enumerate(segments)
+    ]
+
+    started = time.perf_counter()
+    try:
+        if len(tasks) == 1:
+            # 短片段只有一段：直接在当前进程渲染，省去子进程启动开销
+            results = [_render_segment(tasks[0])]
+        else:
+            # spawn：避免 fork 带着数据库连接池/线程进入子进程
+            ctx = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=len(tasks), mp_context=ctx) as pool:
+                results = list(pool.map(_render_segment, tasks))
+        codec = _concat_segments([r["output_path"] for r in results], output_path, fps, (width, height), fourcc)
+    finally:
+        for t in tasks:
+            if os.path.exists(t["output_path"]):
+                os.remove(t["output_path"])
+    elapsed = time.perf_counter() - started
+
+    frames = sum(r["frames"] for r in results)
+    return {
+        "output_path": output_path,
+        "frames": frames,
+        "segments": len(tasks),
+        "codec": codec,
+        "seconds": round(elapsed, 3),
+        # 渲染速度 / 视频播放速度；>= 1 即快于实时
+        "speed": round((frames / fps) / elapsed, 2) if elapsed > 0 else None,
+    }
+
+
+# 导出任务状态（进程内）：job_id -> {jobId, videoId, status, ...}，按创建顺序；
+# 结束超过 EXPORT_TTL_HOURS 的任务连同导出文件一并清理，已结束的任务超过 EXPORT_MAX_JOBS 时先清理最早的
+_jobs: Dict[str, Dict[str, Any]] = {}
+_job_created: Dict[str, float] = {}
+_jobs_lock = threading.Lock()
+_FINISHED = {"COMPLETED", "FAILED"}
+
+
+# 导出任务队列：最多 EXPORT_MAX_CONCURRENT 个任务同时渲染，避免多个导出各开满 CPU 核数的进程、挤占分析任务
+_export_executor = ThreadPoolExecutor(max_workers=max(settings.EXPORT_MAX_CONCURRENT, 1), thread_name_prefix="export")
+
+
+def submit_export(job: Callable[[], None]) -> None:
+    """把导出任务放入队列（排队期间任务状态保持 PENDING）"""
+    _export_executor.submit(job)
+
+
+def export_output_path(job_id: str) -> str:
+    return str(Path(settings.EXPORT_DIR) / f"{job_id}.mp4")
+
+
+def _remove_file(path: str) -> bool:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def remove_expired_exports(now: Optional[float] = None) -> int:
+    """清理过期 / 超出数量上限的导出任务及其文件，以及导出目录中超过保留时长的文件（含上次运行留下的），返回删除的文件数"""
+    now = now or time.time()
+    cutoff = now - settings.EXPORT_TTL_HOURS * 3600
+    with _jobs_lock:
+        finished = [job_id for job_id, job in _jobs.items() if job["status"] in _FINISHED]
+        expired = [job_id for job_id in finished if _job_created[job_id] < cutoff]
+        overflow = len(_jobs) - len(expired) - settings.EXPORT_MAX_JOBS
+        if overflow > 0:
+            expired += [job_id for job_id in finished if job_id not in expired][:overflow]
+        for job_id in expired:
+            _jobs.pop(job_id, None)
+            _job_created.pop(job_id, None)
+
+    removed = sum(_remove_file(export_output_path(job_id)) for job_id in expired)
+    export_dir = Path(settings.EXPORT_DIR)
+    if export_dir.is_dir():
+        for path in export_dir.iterdir():
+            # 进行中的任务文件一直在写入，mtime 不会早于 cutoff
+            if path.is_file() and path.stat().st_mtime < cutoff and _remove_file(str(path)):
+                removed += 1
+    return removed
+
+
+def create_export_job(video_id: str, start: Optional[float], end: Optional[float]) -> Dict[str, Any]:
+    remove_expired_exports()
+    job = {
+        "jobId": uuid4().hex,
+        "videoId": video_id,
+        "status": "PENDING",
+        "start": start,
+        "end": end,
+        "downloadUrl": None,
+        "error": None,
+        "result": None,
+    }
+    with _jobs_lock:
+        _jobs[job["jobId"]] = job
+        _job_created[job["jobId"]] = time.time()
+    return dict(job)
+
+
+def get_export_job(job_id: str) -> Optional[Dict[str, Any]]:
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        return dict(job) if job else None
+
+
+def update_export_job(job_id: str, **fields: Any) -> None:
+    with _jobs_lock:
+        if job_id in _jobs:
+            _jobs[job_id].update(fields)
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import os
+import shutil
+import struct
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Callable, Optional
+
+from app.core.config import settings
+
+# 播放用副本：浏览器可直接播放（H.264/AAC）且 moov 在 mdat 之前的 MP4（fast-start），
+# 首帧只需请求文件开头的索引与第一段数据，起播时间与文件大小无关。
+# - 源文件已是浏览器可播的 MP4：只把 moov 移到文件头（纯 Python，不需要 ffmpeg；已是 fast-start 则直接用源文件）
+# - 其他格式 / 编码（AVI、MKV、MPEG-4 Part 2 等）：有 ffmpeg 时转码为 H.264/AAC，否则仍播放源文件
+_MP4_EXTS = {".mp4", ".m4v", ".mov"}
+# ffprobe 的编码名与 OpenCV 的 FOURCC（无 ffprobe 时）
+_BROWSER_VIDEO_CODECS = {"h264", "avc1"}
+_BROWSER_AUDIO_CODECS = {"aac", "mp3"}
+
+# moov 内含有 stco / co64（分块偏移表）的容器 atom
+_CONTAINER_ATOMS = {b"moov", b"trak", b"mdia", b"minf", b"stbl"}
+
+# 播放副本生成（转码 / 整文件复制）在独立的单线程中排队执行，
+# 不占用 BackgroundTasks 的顺序队列，上传后的分析任务无需等待转码完成
+_playback_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="playback")
+
+
+def playback_file(video_id: str) -> str:
+    return str(Path(settings.PLAYBACK_DIR) / f"{video_id}.mp4")
+
+
+def _atom_header(buf: bytes, pos: int, end: int):
+    """返回 (类型, 头部长度, atom 总长度)；size=1 为 64 位长度，size=0 表示延伸到末尾"""
+    size, kind = struct.unpack_from(">I4s", buf, pos)
+    header = 8
+    if size == 1:
+        size = struct.unpack_from(">Q", buf, pos + 8)[0]
+        header = 16
+    elif size == 0:
+        size = end - pos
+    if size < header or pos + size > end:
+        raise ValueError(f"MP4 atom 长度不正确: {kind!r}")
+    return kind, header, size
+
+
+def _top_level_atoms(fh: BinaryIO, file_size: int):
+    atoms = []
+    pos = 0
+    while pos + 8 <= file_size:
+        fh.seek(pos)
+        kind, header, size = _atom_header(fh.read(16).ljust(16, b"\0"), 0, file_size - pos)
+        atoms.append((kind, pos, size))
+        pos += size
+    return atoms
+
+
+def _shift_chunk_offsets(moov: bytearray, start: int, end: int, shift: int, before: int) -> None:
+    """moov（长 shift 字节，原位于 before）移到第一个 mdat 之前后，原先位于 moov 之前的媒体数据后移 shift 字节：
+    小于 before 的 stco / co64 偏移加 shift；moov 之后的数据（mdat moov mdat 布局）位置不变"""
+    pos = start
+    while pos + 8 <= end:
+        kind, header, size = _atom_header(moov, pos, end)
+        if kind == b"cmov":
+            raise ValueError("不支持压缩的 moov")
+        if kind in _CONTAINER_ATOMS:
+            _shift_chunk_offsets(moov, pos + header, pos + size, shift, before)
+        elif kind in (b"stco", b"co64"):
+            fmt, width = (">I", 4) if kind == b"stco" else (">Q", 8)
+            # version/flags(4) + entry_count(4) 之后为偏移表
+            count = struct.unpack_from(">I", moov, pos + header + 4)[0]
+            table = pos + header + 8
+            for i in range(count):
+                offset = table + i * width
+                value = struct.unpack_from(fmt, moov, offset)[0]
+                if value >= before:
+                    continue
+                value += shift
+                if kind == b"stco" and value > 0xFFFFFFFF:
+                    raise ValueError("32 位分块偏移溢出")
+                struct.pack_into(fmt, moov, offset, value)
+        pos += size
+
+
+def _copy_range(src: BinaryIO, dst: BinaryIO, pos: int, length: int) -> None:
+    src.seek(pos)
+    while length > 0:
+        data = src.read(min(length, settings.UPLOAD_CHUNK_SIZE))
+        if not data:
+            raise ValueError("文件被截断")
+        dst.write(data)
+        length -= len(data)
+
+
+def faststart_mp4(src_path: str, dst_path: str) -> bool:
+    """把 moov 移到第一个 mdat 之前并修正分块偏移，写入 dst_path（等价于 qt-faststart / -movflags +faststart）。
+
+    源文件已是 fast-start 时不写出，返回 False；结构无法处理时抛出 ValueError。
+    """
+    file_size = os.path.getsize(src_path)
+    with open(src_path, "rb") as fh:
+        atoms = _top_level_atoms(fh, file_size)
+        kinds = [kind for kind, _, _ in atoms]
+        if b"moov" not in kinds or b"mdat" not in kinds:
+            raise ValueError("不是完整的 MP4 文件")
+        if kinds.index(b"moov") < kinds.index(b"mdat"):
+            return False
+
+        _, moov_pos, moov_size = atoms[kinds.index(b"moov")]
+        fh.seek(moov_pos)
+        moov = bytearray(fh.read(moov_size))
+        _, header, _ = _atom_header(moov, 0, moov_size)
+        _shift_chunk_offsets(moov, header, moov_size, moov_size, moov_pos)
+
+        tmp_path = dst_path + ".tmp"
+        os.makedirs(os.path.dirname(dst_path) or ".", exist_ok=True)
+        try:
+            with open(tmp_path, "wb") as out:
+                for kind, pos, size in atoms:
+                    if kind == b"moov":
+                        continue
+                    if kind == b"mdat" and moov is not None:
+                        out.write(moov)
+                        moov = None
+                    _copy_range(fh, out, pos, size)
+            os.replace(tmp_path, dst_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return True
+
+
+def _browser_playable(video_codec: Optional[str], audio_codec: Optional[str]) -> bool:
+    """编码来自上传时探测的元数据；编码未知（探测失败）时按可播放处理，至少保证 fast-start"""
+    if video_codec is None:
+        return True
+    return video_codec in _BROWSER_VIDEO_CODECS and (audio_codec is None or audio_codec in _BROWSER_AUDIO_CODECS)
+
+
+def _transcode(ffmpeg: str, video_path: str, dst_path: str) -> None:
+    scale = f"scale=-2:'min(ih,{settings.PLAYBACK_MAX_HEIGHT})'" if settings.PLAYBACK_MAX_HEIGHT > 0 else "null"
+    tmp_path = dst_path + ".tmp"
+    os.makedirs(os.path.dirname(dst_path) or ".", exist_ok=True)
+    try:
+        subprocess.run(
+            [ffmpeg, "-y", "-loglevel", "error", "-i", video_path,
+             "-map", "0:v:0", "-map", "0:a:0?",
+             "-c:v", "libx264", "-preset", settings.PLAYBACK_PRESET, "-crf", str(settings.PLAYBACK_CRF),
+             "-pix_fmt", "yuv420p", "-vf", scale,
+             "-c:a", "aac", "-b:a", "128k",
+             "-movflags", "+faststart", "-f", "mp4", tmp_path],
+            check=True,
+        )
+        os.replace(tmp_path, dst_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def prepare_playback(
+    video_path: str, video_id: str, video_codec: Optional[str] = None, audio_codec: Optional[str] = None
+) -> Optional[str]:
+    """生成播放用副本，返回其路径（可能就是源文件）；无法生成时返回 None，前端继续播放源文件"""
+    dst_path = playback_file(video_id)
+    if Path(video_path).suffix.lower() in _MP4_EXTS and _browser_playable(video_codec, audio_codec):
+        try:
+            return dst_path if faststart_mp4(video_path, dst_path) else video_path
+        except ValueError as e:
+            print(f"Warn: MP4 fast-start 处理失败，尝试转码: {e}")
+
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        return None
+    _transcode(ffmpeg, video_path, dst_path)
+    return dst_path
+
+
+def submit_playback(job: Callable[[], None]) -> None:
+    """把播放副本生成任务交给独立线程执行"""
+    _playback_executor.submit(job)
+
+
+def remove_playback(video_id: str) -> None:
+    try:
+        os.remove(playback_file(video_id))
+    except FileNotFoundError:
+        pass
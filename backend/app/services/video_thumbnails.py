@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from app.core.config import settings
+
+
+def thumbnail_dir(video_id: str) -> str:
+    return str(Path(settings.THUMBNAIL_DIR) / str(video_id))
+
+
+def static_url(path: Optional[str]) -> Optional[str]:
+    """static/ 下的相对路径 -> /static/... URL"""
+    if not path:
+        return None
+    rel = Path(path).as_posix()
+    return "/" + rel if rel.startswith("static/") else None
+
+
+def poster_url(sprite_index_path: Optional[str]) -> Optional[str]:
+    """封面图与索引 JSON 同目录"""
+    if not sprite_index_path:
+        return None
+    return static_url(str(Path(sprite_index_path).with_name("poster.jpg")))
+
+
+def generate_thumbnail_sprite(video_path: str, video_id: str, metadata: Optional[Dict[str, Any]] = None) -> str:
+    """单次顺序解码抽取关键帧，拼成一张 JPEG 雪碧图并写出时间戳索引，返回索引文件路径。
+
+    抽帧间隔不小于 THUMBNAIL_INTERVAL_SECONDS，长视频自动放大间隔，
+    保证整段视频只有一张雪碧图（悬停拖动只需一次图片请求）。
+    非抽样帧只 grab 不 retrieve，省去像素格式转换与拷贝。
+    metadata 为上传时探测的元数据（media_probe.probe_media），时长以其为准（可变帧率时 帧数 / 帧率 不准）。
+    """
+    metadata = metadata or {}
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"无法打开视频文件: {video_path}")
+
+    fps = metadata.get("fps") or cap.get(cv2.CAP_PROP_FPS) or 25
+    width = metadata.get("width") or int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or 1
+    height = metadata.get("height") or int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or 1
+    duration = metadata.get("duration") or (int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0) / fps if fps > 0 else 0.0)
+
+    columns = settings.THUMBNAIL_SPRITE_COLUMNS
+    max_tiles = columns * settings.THUMBNAIL_SPRITE_ROWS
+    interval = max(settings.THUMBNAIL_INTERVAL_SECONDS, duration / max_tiles if duration else 0.0)
+    step = max(int(round(interval * fps)), 1)
+
+    tile_w = settings.THUMBNAIL_WIDTH
+    tile_h = max(int(round(tile_w * height / width)), 1)
+
+    tiles: List[np.ndarray] = []
+    timestamps: List[float] = []
+    frame_id = 0
+    try:
+        while len(tiles) < max_tiles:
+            if not cap.grab():
+                break
+            if frame_id % step == 0:
+                ok, frame = cap.retrieve()
+                if ok:
+                    tiles.append(cv2.resize(frame, (tile_w, tile_h), interpolation=cv2.INTER_AREA))
+                    timestamps.append(round(frame_id / fps, 3))
+            frame_id += 1
+    finally:
+        cap.release()
+
+    if not tiles:
+        raise RuntimeError("未能从视频中抽取关键帧")
+
+    cols = min(columns, len(tiles))
+    rows = math.ceil(len(tiles) / cols)
+    sheet = np.zeros((rows * tile_h, cols * tile_w, 3), dtype=np.uint8)
+    for i, tile in enumerate(tiles):
+        r, c = divmod(i, cols)
+        sheet[r * tile_h:(r + 1) * tile_h, c * tile_w:(c + 1) * tile_w] = tile
+
+    out_dir = thumbnail_dir(video_id)
+    os.makedirs(out_dir, exist_ok=True)
+    sprite_path = str(Path(out_dir) / "sprite.jpg")
+    poster_path = str(Path(out_dir) / "poster.jpg")
+    quality = [int(cv2.IMWRITE_JPEG_QUALITY), settings.THUMBNAIL_JPEG_QUALITY]
+    cv2.imwrite(sprite_path, sheet, quality)
+    cv2.imwrite(poster_path, tiles[0], quality)
+
+    index: Dict[str, Any] = {
+        "version": 1,
+        "spriteUrl": static_url(sprite_path),
+        "posterUrl": static_url(poster_path),
+        "interval": round(step / fps, 3),
+        "tileWidth": tile_w,
+        "tileHeight": tile_h,
+        "columns": cols,
+        "rows": rows,
+        "duration": duration,
+        # 第 i 个关键帧位于雪碧图第 i // columns 行、第 i % columns 列
+        "timestamps": timestamps,
+    }
+    index_path = str(Path(out_dir) / "index.json")
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+    return index_path
+
+
+def remove_thumbnails(video_id: str) -> None:
+    shutil.rmtree(thumbnail_dir(video_id), ignore_errors=True)
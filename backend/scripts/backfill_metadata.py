@@ -0,0 +1,60 @@
+"""为已有视频重新探测媒体元数据（新上传的视频在上传时探测）
+
+用法（在 backend/ 目录下执行，使用 .env / DATABASE_URL 指向的数据库）：
+  python scripts/backfill_metadata.py            # 只处理尚无分辨率信息的视频
+  python scripts/backfill_metadata.py --all      # 全部重新探测
+
+说明：
+- 有 ffprobe 时用 ffprobe，否则用 OpenCV（见 app/services/media_probe.py）
+- 文件大小、时长一并更新为探测值（迁移 0006 由格式化字符串换算的 size_bytes 只精确到一位小数）
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import update  # noqa: E402
+from sqlmodel import Session, select  # noqa: E402
+
+from app.core.database import sync_engine  # noqa: E402
+from app.models import VideoSource  # noqa: E402
+from app.services.media_probe import probe_media  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="为已有视频重新探测媒体元数据")
+    parser.add_argument("--all", action="store_true", help="已有元数据的视频也重新探测")
+    args = parser.parse_args()
+
+    with Session(sync_engine) as session:
+        stmt = select(VideoSource.video_id, VideoSource.file_path, VideoSource.file_name)
+        if not args.all:
+            stmt = stmt.where(VideoSource.height.is_(None))
+        videos = session.exec(stmt).all()
+
+    failed = 0
+    for video_id, file_path, file_name in videos:
+        try:
+            metadata = probe_media(file_path)
+        except Exception as e:
+            failed += 1
+            print(f"FAIL {file_name}: {e}")
+            continue
+        with Session(sync_engine) as session:
+            session.execute(update(VideoSource).where(VideoSource.video_id == video_id).values(**metadata))
+            session.commit()
+        print(
+            f"ok   {file_name}: {metadata['width']}x{metadata['height']} {metadata['video_codec']} "
+            f"{metadata['fps'] or 0:.2f} fps {metadata['duration']:.1f} s"
+        )
+
+    print(f"{len(videos)} videos, {failed} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""为已有视频补生成播放用 fast-start MP4（新上传的视频由上传后的后台任务生成）
+
+用法（在 backend/ 目录下执行，使用 .env / DATABASE_URL 指向的数据库）：
+  python scripts/backfill_playback.py            # 只处理 playback_path 为空的视频
+  python scripts/backfill_playback.py --all      # 全部重新生成（如调整了 PLAYBACK_* 配置）
+
+说明：
+- 浏览器可播的 MP4 只移动 moov（不需要 ffmpeg）；其他格式需要 PATH 中有 ffmpeg，否则跳过
+- 逐个视频串行处理，可在服务运行期间执行
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlmodel import Session, select  # noqa: E402
+
+from app.core.database import sync_engine  # noqa: E402
+from app.models import VideoSource  # noqa: E402
+from app.services.video_playback import prepare_playback  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="为已有视频补生成播放用 fast-start MP4")
+    parser.add_argument("--all", action="store_true", help="已有播放副本的视频也重新生成")
+    args = parser.parse_args()
+
+    with Session(sync_engine) as session:
+        stmt = select(VideoSource.video_id, VideoSource.file_path, VideoSource.file_name)
+        if not args.all:
+            stmt = stmt.where(VideoSource.playback_path.is_(None))
+        videos = session.exec(stmt).all()
+
+    failed = 0
+    for video_id, file_path, file_name in videos:
+        started = time.perf_counter()
+        try:
+            playback_path = prepare_playback(file_path, str(video_id))
+        except Exception as e:
+            failed += 1
+            print(f"FAIL {file_name}: {e}")
+            continue
+        if not playback_path:
+            print(f"skip {file_name}: 需要 ffmpeg 转码")
+            continue
+        with Session(sync_engine) as session:
+            video = session.get(VideoSource, video_id)
+            if video:
+                video.playback_path = playback_path
+                session.add(video)
+                session.commit()
+        print(f"ok   {file_name} -> {playback_path} ({time.perf_counter() - started:.1f} s)")
+
+    print(f"{len(videos)} videos, {failed} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""报警写入基准：ORM 逐条 add vs 多行 INSERT vs PostgreSQL COPY
+
+用法（在 backend/ 目录下执行，使用 .env / DATABASE_URL 指向的数据库）：
+  python scripts/bench_alarm_insert.py --rows 20000
+  python scripts/bench_alarm_insert.py --rows 50000 --repeat 3
+
+说明：
+- 会临时创建一个 VideoSource 作为外键目标，结束后连同报警记录一起删除
+- 输出每种写入方式的耗时与 rows/s
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+from uuid import uuid4
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import delete  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+from app.core.database import init_db, sync_engine  # noqa: E402
+from app.models import AlarmEvent, VideoSource  # noqa: E402
+from app.services.alarm_store import bulk_insert_alarms, event_to_row  # noqa: E402
+
+
+def _make_events(video_id: str, n: int) -> List[Dict[str, Any]]:
+    started_at = datetime.utcnow()
+    return [
+        {
+            "event_id": str(uuid4()),
+            "video_id": video_id,
+            "video_timestamp": i * 0.04,
+            "occurred_at": started_at + timedelta(seconds=i * 0.04),
+            "object_type": "Person" if i % 3 else "Vehicle",
+            "threat_level": "CRITICAL" if i % 2 else "WARNING",
+            "snapshot_path": None,
+        }
+        for i in range(n)
+    ]
+
+
+def _orm_insert(session: Session, events: List[Dict[str, Any]]) -> None:
+    # 旧实现：每条事件一个 ORM 实例
+    for ev in events:
+        session.add(AlarmEvent(**event_to_row(ev)))
+
+
+def _run(name: str, fn: Callable[[Session], None], video_id, rows: int, repeat: int) -> None:
+    best = None
+    for _ in range(repeat):
+        with Session(sync_engine) as session:
+            session.execute(delete(AlarmEvent).where(AlarmEvent.video_id == video_id))
+            session.commit()
+
+            started = time.perf_counter()
+            fn(session)
+            session.commit()
+            elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{name:<8} rows={rows:<8} best={best:.3f}s  {rows / best:,.0f} rows/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="alarm_events 批量写入基准")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    # 基准只关心写入耗时，关闭 SQL 日志避免刷屏影响计时
+    sync_engine.echo = False
+    init_db()
+
+    with Session(sync_engine) as session:
+        video = VideoSource(file_name="bench.mp4", file_path="bench.mp4")
+        session.add(video)
+        session.commit()
+        video_id = video.video_id
+
+    events = _make_events(str(video_id), args.rows)
+    try:
+        _run("orm", lambda s: _orm_insert(s, events), video_id, args.rows, args.repeat)
+        _run("insert", lambda s: bulk_insert_alarms(s, events, method="insert"), video_id, args.rows, args.repeat)
+        _run("copy", lambda s: bulk_insert_alarms(s, events, method="copy"), video_id, args.rows, args.repeat)
+    finally:
+        with Session(sync_engine) as session:
+            session.execute(delete(AlarmEvent).where(AlarmEvent.video_id == video_id))
+            session.execute(delete(VideoSource).where(VideoSource.video_id == video_id))
+            session.commit()
+
+
+if __name__ == "__main__":
+    main()
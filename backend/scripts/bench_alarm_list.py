@@ -0,0 +1,184 @@
+"""报警列表基准：len(all()) + OFFSET vs COUNT(*) + keyset 分页，以及日期范围过滤的执行计划
+
+用法（在 backend/ 目录下执行，使用 .env / DATABASE_URL 指向的数据库）：
+  python scripts/bench_alarm_list.py --rows 1000000
+  python scripts/bench_alarm_list.py --rows 1000000 --pages 1,100,10000 --skip-legacy
+
+说明：
+- 会临时创建 --videos 个 VideoSource 并用 COPY 写入 --rows 条报警（occurred_at 均匀分布在最近 --days 天），结束后全部删除
+- 对日期范围查询输出 EXPLAIN，出现顺序扫描（Seq Scan）时给出提示
+- 对每个页码分别测量旧实现与新实现（/alarms 接口，TestClient 调用）的响应耗时
+- 旧实现在百万行下需要把全部记录加载为 ORM 对象，耗时与内存都很高，可用 --skip-legacy 跳过
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from uuid import uuid4
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import delete, text  # noqa: E402
+from sqlalchemy.dialects import postgresql  # noqa: E402
+from sqlmodel import Session, select  # noqa: E402
+
+from app.core.database import init_db, sync_engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import AlarmEvent, VideoSource  # noqa: E402
+from app.services.alarm_query import ALARM_ORDER, build_alarm_filters, parse_date_range  # noqa: E402
+from app.services.alarm_store import bulk_insert_alarms  # noqa: E402
+
+_BATCH = 100_000
+
+
+def _make_events(video_ids: List[str], start: int, n: int, started_at: datetime, step: timedelta) -> List[Dict[str, Any]]:
+    return [
+        {
+            "event_id": str(uuid4()),
+            "video_id": video_ids[i % len(video_ids)],
+            "video_timestamp": i * 0.04,
+            "occurred_at": started_at + step * i,
+            "object_type": "Person" if i % 3 else "Vehicle",
+            "threat_level": "CRITICAL" if i % 2 else "WARNING",
+            "snapshot_path": None,
+            "is_read": i % 5 != 0,
+        }
+        for i in range(start, start + n)
+    ]
+
+
+def _explain(session: Session, conditions: List[Any], page_size: int) -> List[str]:
+    stmt = select(AlarmEvent).where(*conditions).order_by(*ALARM_ORDER).limit(page_size + 1)
+    sql = str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    return [row[0] for row in session.execute(text("EXPLAIN " + sql)).all()]
+
+
+def _legacy_page(page: int, page_size: int) -> float:
+    # 旧实现：加载全部匹配记录计数 + OFFSET 分页
+    started = time.perf_counter()
+    with Session(sync_engine) as session:
+        stmt = select(AlarmEvent)
+        total = len(session.exec(stmt).all())
+        session.exec(stmt.offset((page - 1) * page_size).limit(page_size)).all()
+    assert total >= 0
+    return time.perf_counter() - started
+
+
+def _timed(fn: Callable[[], Any], repeat: int) -> float:
+    best: Optional[float] = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best or 0.0
+
+
+def _walk_cursor(client: TestClient, page: int, page_size: int) -> Optional[str]:
+    """沿 nextCursor 翻到第 page 页前一页，返回第 page 页的游标（不计入计时）"""
+    cursor = None
+    params: Dict[str, Any] = {"pageSize": 100, "withTotal": "false"}
+    remaining = (page - 1) * page_size
+    while remaining > 0:
+        params["pageSize"] = min(100, remaining)
+        if cursor:
+            params["cursor"] = cursor
+        cursor = client.get("/api/alarms", params=params).json()["data"]["nextCursor"]
+        remaining -= params["pageSize"]
+    return cursor
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="alarm_events 列表/计数基准")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--page-size", type=int, default=10)
+    parser.add_argument("--pages", default="1,100,1000", help="逗号分隔的页码")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--skip-legacy", action="store_true")
+    parser.add_argument("--videos", type=int, default=10)
+    parser.add_argument("--days", type=int, default=180)
+    args = parser.parse_args()
+
+    sync_engine.echo = False
+    init_db()
+
+    with Session(sync_engine) as session:
+        videos = [VideoSource(file_name=f"bench{i}.mp4", file_path=f"bench{i}.mp4") for i in range(args.videos)]
+        session.add_all(videos)
+        session.commit()
+        video_ids = [v.video_id for v in videos]
+
+    now = datetime.utcnow()
+    started_at = now - timedelta(days=args.days)
+    step = (now - started_at) / max(args.rows, 1)
+    try:
+        started = time.perf_counter()
+        with Session(sync_engine) as session:
+            for offset in range(0, args.rows, _BATCH):
+                n = min(_BATCH, args.rows - offset)
+                events = _make_events([str(v) for v in video_ids], offset, n, started_at, step)
+                bulk_insert_alarms(session, events, method="copy")
+                session.commit()
+            if session.get_bind().dialect.name == "postgresql":
+                session.execute(text(f"ANALYZE {AlarmEvent.__tablename__}"))
+                session.commit()
+        print(f"seeded rows={args.rows:,} in {time.perf_counter() - started:.1f}s")
+
+        with TestClient(app) as client:
+            size = args.page_size
+            print(f"count    exact  {_timed(lambda: client.get('/api/alarms/unread/count'), args.repeat) * 1000:8.1f} ms (unread)")
+            print(f"count    exact  {_timed(lambda: client.get('/api/alarms', params={'pageSize': size}), args.repeat) * 1000:8.1f} ms (page 1 + total)")
+            print(f"count    approx {_timed(lambda: client.get('/api/alarms', params={'pageSize': size, 'approxTotal': 'true'}), args.repeat) * 1000:8.1f} ms (page 1 + total)")
+
+            for page in [int(p) for p in args.pages.split(",") if p.strip()]:
+                offset_ms = _timed(
+                    lambda: client.get("/api/alarms", params={"page": page, "pageSize": size, "withTotal": "false"}),
+                    args.repeat,
+                ) * 1000
+                cursor = _walk_cursor(client, page, size)
+                params = {"pageSize": size, "withTotal": "false", **({"cursor": cursor} if cursor else {})}
+                keyset_ms = _timed(lambda: client.get("/api/alarms", params=params), args.repeat) * 1000
+                line = f"page {page:<8} offset {offset_ms:8.1f} ms   keyset {keyset_ms:8.1f} ms"
+                if not args.skip_legacy:
+                    line += f"   legacy {_timed(lambda: _legacy_page(page, size), 1) * 1000:10.1f} ms"
+                print(line)
+
+            # 日期范围过滤：最近 7 天（全局）与 单视频 + 等级 + 最近 7 天
+            end_day = (now + timedelta(hours=8)).date()
+            start_day = end_day - timedelta(days=6)
+            dates = {"startDate": start_day.isoformat(), "endDate": end_day.isoformat()}
+            start, end = parse_date_range(dates["startDate"], dates["endDate"])
+            cases = [
+                ("range", {}, build_alarm_filters(start=start, end=end)),
+                (
+                    "video+level+range",
+                    {"videoId": str(video_ids[0]), "level": "warning"},
+                    build_alarm_filters("", "warning", start=start, end=end, video_id=video_ids[0]),
+                ),
+            ]
+            for name, extra, conditions in cases:
+                params = {"pageSize": size, **dates, **extra}
+                elapsed = _timed(lambda: client.get("/api/alarms", params=params), args.repeat) * 1000
+                print(f"{name:<18} {elapsed:8.1f} ms (page 1 + total)")
+                if sync_engine.dialect.name == "postgresql":
+                    with Session(sync_engine) as session:
+                        plan = _explain(session, conditions, size)
+                    for row in plan:
+                        print(f"    {row}")
+                    if any("Seq Scan" in row for row in plan):
+                        print("    !! 顺序扫描：请检查 occurred_at 相关索引是否已创建")
+    finally:
+        with Session(sync_engine) as session:
+            session.execute(delete(AlarmEvent).where(AlarmEvent.video_id.in_(video_ids)))
+            session.execute(delete(VideoSource).where(VideoSource.video_id.in_(video_ids)))
+            session.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""接口并发负载测试：单个 uvicorn worker 在不同并发数下的吞吐与延迟
+
+用法（在 backend/ 目录下执行，使用 .env / DATABASE_URL 指向的数据库）：
+  python scripts/bench_async_load.py
+  python scripts/bench_async_load.py --concurrency 1,16,64,256 --duration 10
+  python scripts/bench_async_load.py --db-rtt-ms 5
+  python scripts/bench_async_load.py --app-dir /path/to/other/checkout/backend   # 对比其他版本
+  python scripts/bench_async_load.py --base-url http://127.0.0.1:8000            # 压测已启动的服务
+
+说明：
+- 默认在 --port 上以单 worker 启动 uvicorn（app.main:app，工作目录为 --app-dir），结束后关闭
+- 会临时创建一个 VideoSource 并写入 --seed-rows 条报警，结束后删除
+- 每个并发档位：N 个协程在 --duration 秒内循环请求 --paths 中的接口（轮流），统计 req/s 与 p50/p95/p99
+- “可承载并发”取 p99 不超过 --slo-ms 且无错误的最大档位
+- --db-rtt-ms：服务端经本脚本内的 TCP 代理连接数据库，每次往返增加指定时延（模拟独立的数据库服务器）。
+  同步路由下每个请求在查询期间占用一个线程池线程（默认 40 个），时延越大越能体现两种实现的差异
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.error import URLError
+from urllib.parse import urlsplit
+from urllib.request import urlopen
+from uuid import uuid4
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import delete  # noqa: E402
+from sqlalchemy.engine import make_url  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.database import init_db, sync_engine  # noqa: E402
+from app.models import AlarmEvent, AlarmRollup, SystemSettings, VideoSource  # noqa: E402
+from app.services.alarm_rollup import rebuild_alarm_rollups  # noqa: E402
+from app.services.alarm_store import bulk_insert_alarms  # noqa: E402
+
+DEFAULT_PATHS = (
+    "/api/alarms?pageSize=20",
+    "/api/alarms/unread/count",
+    "/api/videos",
+    "/api/system/status",
+    "/api/dashboard/events?limit=20",
+)
+
+
+def _seed(rows: int) -> str:
+    with Session(sync_engine) as session:
+        video = VideoSource(file_name="loadtest.mp4", file_path="loadtest.mp4")
+        session.add(video)
+        session.commit()
+        video_id = str(video.video_id)
+
+        started_at = datetime.utcnow() - timedelta(days=7)
+        events = [
+            {
+                "event_id": str(uuid4()),
+                "video_id": video_id,
+                "video_timestamp": i * 0.04,
+                "occurred_at": started_at + timedelta(seconds=i),
+                "object_type": "Person" if i % 3 else "Vehicle",
+                "threat_level": "CRITICAL" if i % 2 else "WARNING",
+                "snapshot_path": None,
+                "is_read": i % 5 != 0,
+            }
+            for i in range(rows)
+        ]
+        bulk_insert_alarms(session, events)
+        rebuild_alarm_rollups(session, video.video_id)
+        session.commit()
+    return video_id
+
+
+def _cleanup(video_id: str) -> None:
+    with Session(sync_engine) as session:
+        # /system/status 在未选择当前源时会自动选中最新视频（即本脚本创建的视频）
+        settings_row = session.get(SystemSettings, 1)
+        if settings_row and str(settings_row.current_source_id) == video_id:
+            settings_row.current_source_id = None
+            session.add(settings_row)
+        session.execute(delete(AlarmRollup).where(AlarmRollup.video_id == video_id))
+        session.execute(delete(AlarmEvent).where(AlarmEvent.video_id == video_id))
+        session.execute(delete(VideoSource).where(VideoSource.video_id == video_id))
+        session.commit()
+
+
+class _LatencyProxy:
+    """模拟数据库网络往返时延的 TCP 代理：每个方向的数据延迟 rtt/2 后按序转发（在独立线程的事件循环中运行）"""
+
+    def __init__(self, upstream_host: str, upstream_port: int, rtt_ms: float):
+        self.upstream = (upstream_host, upstream_port)
+        self.delay = rtt_ms / 2000.0
+        self.port = 0
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+
+    async def _pipe(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def send() -> None:
+            while True:
+                due, data = await queue.get()
+                if data is None:
+                    break
+                wait = due - self._loop.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                writer.write(data)
+                await writer.drain()
+            writer.close()
+
+        sender = asyncio.ensure_future(send())
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                queue.put_nowait((self._loop.time() + self.delay, data))
+        except OSError:
+            pass
+        queue.put_nowait((0.0, None))
+        await sender
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        up_reader, up_writer = await asyncio.open_connection(*self.upstream)
+        await asyncio.gather(self._pipe(reader, up_writer), self._pipe(up_reader, writer), return_exceptions=True)
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        server = self._loop.run_until_complete(asyncio.start_server(self._handle, "127.0.0.1", 0))
+        self.port = server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+
+    def start(self) -> int:
+        threading.Thread(target=self._run, daemon=True).start()
+        self._ready.wait()
+        return self.port
+
+
+def _start_server(app_dir: Path, port: int, database_url: Optional[str] = None) -> subprocess.Popen:
+    cmd = [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", "1", "--log-level", "warning"]
+    env = os.environ.copy()
+    if database_url:
+        env["DATABASE_URL"] = database_url
+    # SQL 日志输出会显著拖慢服务端，丢弃
+    proc = subprocess.Popen(cmd, cwd=app_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("uvicorn 启动失败")
+        try:
+            urlopen(f"http://127.0.0.1:{port}/api/system/status", timeout=1.0).close()
+            return proc
+        except (URLError, OSError):
+            time.sleep(0.3)
+    proc.terminate()
+    raise RuntimeError("uvicorn 启动超时")
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+class _Connection:
+    """极简 HTTP/1.1 keep-alive 客户端（asyncio streams）。
+
+    httpx 连接池在数十个并发连接时自身开销就会成为瓶颈（尤其与服务端共用 CPU 时），
+    压测时改用每个协程独占一条连接的裸 HTTP 请求。
+    """
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def get(self, path: str) -> int:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(f"GET {path} HTTP/1.1\r\nHost: {self.host}\r\n\r\n".encode("ascii"))
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        chunked = False
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            name = name.strip().lower()
+            if name == "content-length":
+                length = int(value)
+            elif name == "transfer-encoding" and "chunked" in value:
+                chunked = True
+
+        if chunked:
+            while True:
+                size = int((await self.reader.readline()).strip(), 16)
+                await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        elif length:
+            await self.reader.readexactly(length)
+        return status
+
+    async def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+async def _run_level(base_url: str, paths: List[str], concurrency: int, duration: float, timeout: float) -> Dict[str, Any]:
+    url = urlsplit(base_url)
+    latencies: List[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker(offset: int) -> None:
+        nonlocal errors
+        conn = _Connection(url.hostname or "127.0.0.1", url.port or 80)
+        i = offset
+        try:
+            while time.perf_counter() < deadline:
+                path = paths[i % len(paths)]
+                i += 1
+                started = time.perf_counter()
+                try:
+                    ok = await asyncio.wait_for(conn.get(path), timeout) == 200
+                except (OSError, ValueError, IndexError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+                    ok = False
+                    await conn.close()
+                if ok:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+        finally:
+            await conn.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50": _percentile(latencies, 0.50) * 1000,
+        "p95": _percentile(latencies, 0.95) * 1000,
+        "p99": _percentile(latencies, 0.99) * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="单 worker 接口并发负载测试")
+    parser.add_argument("--base-url", default=None, help="压测已启动的服务；不指定时自行启动 uvicorn")
+    parser.add_argument("--app-dir", default=str(Path(__file__).resolve().parents[1]))
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--concurrency", default="1,8,32,64,128,256")
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--slo-ms", type=float, default=500.0)
+    parser.add_argument("--seed-rows", type=int, default=20_000)
+    parser.add_argument("--paths", default=",".join(DEFAULT_PATHS), help="逗号分隔的 GET 路径")
+    parser.add_argument("--db-rtt-ms", type=float, default=0.0, help="经代理给服务端的数据库连接加上网络往返时延")
+    args = parser.parse_args()
+
+    sync_engine.echo = False
+    init_db()
+    video_id = _seed(args.seed_rows) if args.seed_rows else None
+
+    proc: Optional[subprocess.Popen] = None
+    try:
+        base_url = args.base_url
+        if not base_url:
+            database_url = None
+            if args.db_rtt_ms > 0:
+                # 本机数据库时延接近 0，查询几乎不占用等待时间；加时延模拟数据库在另一台机器上的情况
+                url = make_url(settings.DATABASE_URL)
+                proxy_port = _LatencyProxy(url.host or "localhost", url.port or 5432, args.db_rtt_ms).start()
+                database_url = url.set(host="127.0.0.1", port=proxy_port).render_as_string(hide_password=False)
+            proc = _start_server(Path(args.app_dir), args.port, database_url)
+            base_url = f"http://127.0.0.1:{args.port}"
+
+        paths = [p.strip() for p in args.paths.split(",") if p.strip()]
+        # 预热：连接池、最近报警缓冲、未读计数缓存
+        asyncio.run(_run_level(base_url, paths, 4, 1.0, args.timeout))
+
+        best: Optional[int] = None
+        print(f"{'conc':>6} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+        for level in [int(c) for c in args.concurrency.split(",") if c.strip()]:
+            r = asyncio.run(_run_level(base_url, paths, level, args.duration, args.timeout))
+            print(
+                f"{r['concurrency']:>6} {r['rps']:>9.1f} {r['p50']:>9.1f} {r['p95']:>9.1f} {r['p99']:>9.1f} {r['errors']:>7}"
+            )
+            if r["errors"] == 0 and r["p99"] <= args.slo_ms:
+                best = level
+        print(f"max concurrency within p99 <= {args.slo_ms:.0f} ms: {best if best is not None else '-'}")
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+        if video_id:
+            _cleanup(video_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""上传期间的接口响应测试：上传大文件的同时轮询其他接口，统计其延迟
+
+用法（在 backend/ 目录下执行，使用 .env / DATABASE_URL 指向的数据库）：
+  python scripts/bench_upload_responsiveness.py                      # 上传 2 GB
+  python scripts/bench_upload_responsiveness.py --size-mb 4096 --slo-ms 50
+  python scripts/bench_upload_responsiveness.py --app-dir /path/to/other/checkout/backend   # 对比其他版本
+
+说明：
+- 以单 worker 启动 uvicorn（同 bench_async_load.py），上传内容为按块生成的数据（不是有效视频，分析任务会直接失败）
+- 先空载轮询 --baseline 秒作为基线，再在上传全过程中每 --interval 秒请求一次 --probe-path
+- 上传期间探测请求的最大延迟不超过 --slo-ms 视为通过（退出码 0），否则退出码 1
+- 结束后通过 DELETE /api/videos/{id} 删除上传的视频；磁盘需预留约 2 倍 --size-mb 的空间（临时文件 + 上传目录）
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.request import Request, urlopen
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from bench_async_load import _Connection, _percentile, _start_server  # noqa: E402
+
+_BOUNDARY = "----upload-responsiveness-boundary"
+
+
+async def _upload(host: str, port: int, size: int, chunk_size: int) -> Tuple[int, Dict[str, Any], float]:
+    """流式发送 multipart/form-data（不在内存中构造整个请求体），返回 (状态码, 响应 JSON, 耗时秒)"""
+    head = (
+        f"--{_BOUNDARY}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="responsiveness.mp4"\r\n'
+        "Content-Type: video/mp4\r\n\r\n"
+    ).encode("ascii")
+    tail = f"\r\n--{_BOUNDARY}--\r\n".encode("ascii")
+
+    started = time.perf_counter()
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(
+        (
+            f"POST /api/videos/upload HTTP/1.1\r\nHost: {host}\r\n"
+            f"Content-Type: multipart/form-data; boundary={_BOUNDARY}\r\n"
+            f"Content-Length: {len(head) + size + len(tail)}\r\nConnection: close\r\n\r\n"
+        ).encode("ascii")
+        + head
+    )
+    block = bytes(range(256)) * (chunk_size // 256)
+    sent = 0
+    while sent < size:
+        piece = block[: min(len(block), size - sent)]
+        writer.write(piece)
+        await writer.drain()
+        sent += len(piece)
+    writer.write(tail)
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    while (await reader.readline()) not in (b"\r\n", b""):
+        pass
+    body = await reader.read()
+    writer.close()
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        payload = {"raw": body[:200].decode("latin-1")}
+    return status, payload, time.perf_counter() - started
+
+
+async def _probe(host: str, port: int, path: str, interval: float, stop: asyncio.Event) -> List[float]:
+    conn = _Connection(host, port)
+    latencies: List[float] = []
+    try:
+        while not stop.is_set():
+            started = time.perf_counter()
+            await conn.get(path)
+            latencies.append((time.perf_counter() - started) * 1000)
+            try:
+                await asyncio.wait_for(stop.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        await conn.close()
+    return latencies
+
+
+async def _run(args: argparse.Namespace, host: str, port: int) -> Tuple[List[float], List[float], Tuple]:
+    stop = asyncio.Event()
+    baseline_task = asyncio.create_task(_probe(host, port, args.probe_path, args.interval, stop))
+    await asyncio.sleep(args.baseline)
+    stop.set()
+    baseline = await baseline_task
+
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(_probe(host, port, args.probe_path, args.interval, stop))
+    upload = await _upload(host, port, args.size_mb * 1024 * 1024, args.chunk_kb * 1024)
+    stop.set()
+    during = await probe_task
+    return baseline, during, upload
+
+
+def _summary(label: str, latencies: List[float]) -> str:
+    return (
+        f"{label:<16} n={len(latencies):<6} p50={_percentile(latencies, 0.50):8.1f} ms "
+        f"p99={_percentile(latencies, 0.99):8.1f} ms max={max(latencies, default=0.0):8.1f} ms"
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="上传大文件期间其他接口的响应延迟")
+    parser.add_argument("--app-dir", default=str(Path(__file__).resolve().parents[1]))
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--size-mb", type=int, default=2048)
+    parser.add_argument("--chunk-kb", type=int, default=1024, help="客户端每次发送的字节数")
+    parser.add_argument("--probe-path", default="/api/system/status")
+    parser.add_argument("--interval", type=float, default=0.05, help="探测请求间隔（秒）")
+    parser.add_argument("--baseline", type=float, default=3.0, help="空载基线时长（秒）")
+    parser.add_argument("--slo-ms", type=float, default=100.0)
+    args = parser.parse_args()
+
+    host = "127.0.0.1"
+    proc = _start_server(Path(args.app_dir), args.port)
+    video_id: Optional[str] = None
+    try:
+        baseline, during, (status, payload, elapsed) = asyncio.run(_run(args, host, args.port))
+        video_id = (payload.get("data") or {}).get("id")
+
+        print(f"upload: HTTP {status}, {args.size_mb} MB in {elapsed:.1f} s ({args.size_mb / elapsed:.1f} MB/s)")
+        print(_summary("baseline", baseline))
+        print(_summary("during upload", during))
+        worst = max(during, default=0.0)
+        ok = status == 200 and worst <= args.slo_ms
+        print(f"max latency during upload {worst:.1f} ms {'<=' if ok else '>'} {args.slo_ms:.0f} ms: {'PASS' if ok else 'FAIL'}")
+        return 0 if ok else 1
+    finally:
+        if video_id:
+            urlopen(Request(f"http://{host}:{args.port}/api/videos/{video_id}", method="DELETE"), timeout=30).close()
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""迁移一致性检查：迁移脚本执行后的表结构是否与 app/models.py 一致
+
+用法（在 backend/ 目录下执行，使用 .env / DATABASE_URL 指向的数据库服务器）：
+  python scripts/check_migrations.py
+  python scripts/check_migrations.py --roundtrip      # 另外检查 downgrade base 后能否重新 upgrade
+
+说明：
+- 在同一服务器上临时创建 <库名>_migration_check 数据库，upgrade head 后执行 alembic check，结束后删除
+- 模型有改动但没有对应迁移时（alembic check 检测到差异）以退出码 1 结束，可放在 CI 中执行
+- 修改模型后生成迁移：alembic revision --autogenerate -m "说明"（生成后需人工检查）
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from alembic import command  # noqa: E402
+from alembic.util.exc import CommandError  # noqa: E402
+from sqlalchemy import create_engine, text  # noqa: E402
+from sqlalchemy.engine import make_url  # noqa: E402
+from sqlalchemy.pool import NullPool  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.database import alembic_config  # noqa: E402
+
+
+def _run(url, roundtrip: bool) -> bool:
+    engine = create_engine(url, poolclass=NullPool)
+    try:
+        with engine.connect() as conn:
+            cfg = alembic_config(conn)
+            command.upgrade(cfg, "head")
+            print("✅ upgrade head")
+            if roundtrip:
+                command.downgrade(cfg, "base")
+                command.upgrade(cfg, "head")
+                print("✅ downgrade base -> upgrade head")
+            try:
+                command.check(cfg)
+            except CommandError as exc:
+                print(f"❌ 模型与迁移不一致，请生成新的迁移：{exc}")
+                return False
+            print("✅ 模型与迁移一致")
+            return True
+    finally:
+        engine.dispose()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--roundtrip", action="store_true", help="额外检查 downgrade base 与重新 upgrade")
+    args = parser.parse_args()
+
+    url = make_url(settings.DATABASE_URL)
+    check_db = f"{url.database}_migration_check"
+    # CREATE / DROP DATABASE 不能在事务内执行
+    admin = create_engine(url.set(database="postgres"), poolclass=NullPool, isolation_level="AUTOCOMMIT")
+    try:
+        with admin.connect() as conn:
+            conn.execute(text(f'DROP DATABASE IF EXISTS "{check_db}"'))
+            conn.execute(text(f'CREATE DATABASE "{check_db}"'))
+        try:
+            ok = _run(url.set(database=check_db), args.roundtrip)
+        finally:
+            with admin.connect() as conn:
+                conn.execute(text(f'DROP DATABASE IF EXISTS "{check_db}"'))
+    finally:
+        admin.dispose()
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# 在 backend/ 或仓库根目录执行 pytest 均可导入 app
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,58 @@
+"""重算报警时的就近一对一匹配（_match_nearest）"""
+
+from types import SimpleNamespace
+
+from app.services.alarm_store import _match_nearest
+
+
+def _rows(*timestamps):
+    return [SimpleNamespace(event_id=f"row-{ts}", video_timestamp=ts) for ts in timestamps]
+
+
+def _events(*timestamps):
+    return [{"event_id": f"ev-{ts}", "video_timestamp": ts} for ts in timestamps]
+
+
+def _pairs(existing, events, tolerance=5.0):
+    return sorted((row.video_timestamp, ev["video_timestamp"]) for row, ev in _match_nearest(existing, events, tolerance))
+
+
+def test_tolerance_is_inclusive():
+    assert _pairs(_rows(10.0), _events(15.0)) == [(10.0, 15.0)]
+    assert _pairs(_rows(10.0), _events(5.0)) == [(10.0, 5.0)]
+    assert _pairs(_rows(10.0), _events(15.01)) == []
+
+
+def test_close_points_across_former_bucket_boundary_match():
+    assert _pairs(_rows(4.9), _events(5.1)) == [(4.9, 5.1)]
+
+
+def test_each_row_and_event_used_at_most_once():
+    # 两个事件都离同一条记录最近：只有更近的一个匹配，另一个作为新报警插入
+    assert _pairs(_rows(10.0), _events(10.5, 11.0)) == [(10.0, 10.5)]
+    assert _pairs(_rows(10.0, 10.5), _events(10.2)) == [(10.0, 10.2)]
+
+
+def test_duplicate_timestamps_pair_one_to_one():
+    existing = _rows(3.0, 3.0)
+    events = _events(3.0, 3.0, 3.0)
+    pairs = _match_nearest(existing, events, 5.0)
+    assert len(pairs) == 2
+    assert len({id(row) for row, _ in pairs}) == 2
+    assert len({id(ev) for _, ev in pairs}) == 2
+
+
+def test_nearest_pairs_first_not_input_order():
+    # 贪心按时间差从小到大：8 配 9（差 1），2 配 0（差 2）；按输入顺序配对会得到 0-8 这样的远距离配对
+    assert _pairs(_rows(0.0, 9.0), _events(8.0, 2.0)) == [(0.0, 2.0), (9.0, 8.0)]
+
+
+def test_unequal_group_sizes():
+    assert _pairs(_rows(1.0, 20.0, 40.0), _events(21.0)) == [(20.0, 21.0)]
+    assert _pairs(_rows(21.0), _events(1.0, 20.0, 40.0)) == [(21.0, 20.0)]
+    assert _pairs([], _events(1.0)) == []
+    assert _pairs(_rows(1.0), []) == []
+
+
+def test_zero_tolerance_matches_only_equal_timestamps():
+    assert _pairs(_rows(1.0, 2.0), _events(1.0, 2.5), tolerance=0.0) == [(1.0, 1.0)]
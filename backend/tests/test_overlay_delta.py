@@ -0,0 +1,101 @@
+"""overlays 增量编码（encode_overlay_delta / decode_overlay_delta）的往返测试"""
+
+import json
+
+import pytest
+
+from app.services.overlay_store import BOX_QUANT_SCALE, decode_overlay_delta, encode_overlay_delta
+
+# 量化误差：四舍五入到 1 / BOX_QUANT_SCALE，还原误差不超过半个量化单位
+_BOX_TOLERANCE = 0.5 / BOX_QUANT_SCALE + 1e-12
+
+
+def _obj(track_id, x, y, w, h, *, cls="Person", level="NONE", color="green", zone_id=None, zone_name=None):
+    return {
+        "id": track_id,
+        "class": cls,
+        "box_norm": {"x": x, "y": y, "w": w, "h": h},
+        "alarm_level": level,
+        "color": color,
+        "zone_id": zone_id,
+        "zoneName": zone_name,
+    }
+
+
+def _frames():
+    return [
+        {"frame_id": 0, "timestamp": 0.0, "objects": [_obj("t1", 0.1, 0.2, 0.05, 0.1), _obj("t2", 0.5, 0.5, 0.1, 0.2)]},
+        # t1 移动且进入核心区（状态变化）；t2 本帧消失
+        {
+            "frame_id": 1,
+            "timestamp": 0.04,
+            "objects": [_obj("t1", 0.12345, 0.20001, 0.05, 0.1, level="CRITICAL", color="red", zone_id="z1", zone_name="核心区")],
+        },
+        # 空帧
+        {"frame_id": 2, "timestamp": 0.08, "objects": []},
+        # t2 在别处重新出现（相对上一次出现的 box 做差）；t1 状态不变；新轨迹 t3 类别为 Vehicle
+        {
+            "frame_id": 3,
+            "timestamp": 0.12,
+            "objects": [
+                _obj("t2", 0.9, 0.05, 0.08, 0.15),
+                _obj("t1", 0.13, 0.21, 0.05, 0.1, level="CRITICAL", color="red", zone_id="z1", zone_name="核心区"),
+                _obj("t3", 0.0, 0.99995, 1.0, 0.00004, cls="Vehicle"),
+            ],
+        },
+        # t1 回到初始状态（复用状态表中已有的项）；t3 类别偶发跳变
+        {
+            "frame_id": 4,
+            "timestamp": 0.16,
+            "objects": [_obj("t1", 0.14, 0.22, 0.05, 0.1), _obj("t3", 0.01, 0.9, 0.99, 0.1, cls="Person")],
+        },
+    ]
+
+
+def _assert_round_trip(original, decoded):
+    assert len(decoded) == len(original)
+    for want, got in zip(original, decoded):
+        assert got["frame_id"] == want["frame_id"]
+        assert got["timestamp"] == want["timestamp"]
+        assert len(got["objects"]) == len(want["objects"])
+        for want_obj, got_obj in zip(want["objects"], got["objects"]):
+            assert {k: v for k, v in got_obj.items() if k != "box_norm"} == {
+                k: v for k, v in want_obj.items() if k != "box_norm"
+            }
+            for k in ("x", "y", "w", "h"):
+                assert got_obj["box_norm"][k] == pytest.approx(want_obj["box_norm"][k], abs=_BOX_TOLERANCE)
+
+
+def test_round_trip_within_quantization():
+    frames = _frames()
+    _assert_round_trip(frames, decode_overlay_delta(encode_overlay_delta(frames)))
+
+
+def test_round_trip_through_json():
+    # 增量编码以 JSON 响应体下发，经序列化后仍可还原
+    frames = _frames()
+    doc = json.loads(json.dumps(encode_overlay_delta(frames)))
+    _assert_round_trip(frames, decode_overlay_delta(doc))
+
+
+def test_state_only_sent_on_change():
+    doc = encode_overlay_delta(_frames())
+    t1 = doc["tracks"].index("t1")
+    entries = [entry for _, _, objects in doc["frames"] for entry in objects if entry[0] == t1]
+    # 首次出现、进入核心区、回到初始状态时带 state_idx，状态不变的一帧不带
+    assert [len(entry) for entry in entries] == [6, 6, 5, 6]
+    assert entries[0][5] == entries[3][5]
+
+
+def test_reappearing_track_is_delta_from_last_seen_box():
+    doc = encode_overlay_delta(_frames())
+    t2 = doc["tracks"].index("t2")
+    entries = [entry for _, _, objects in doc["frames"] for entry in objects if entry[0] == t2]
+    assert len(entries) == 2
+    # 第二次出现相对第 0 帧的 box，且状态未变不重复下发
+    assert entries[1][1:5] == [4000, -4500, -200, -500]
+    assert len(entries[1]) == 5
+
+
+def test_empty():
+    assert decode_overlay_delta(encode_overlay_delta([])) == []
@@ -0,0 +1,57 @@
+"""overlays 派生产物（预压缩响应体）的补生成与兜底"""
+
+import json
+
+from app.services import overlay_store
+
+
+def _analysis(tmp_path):
+    path = tmp_path / "video.json"
+    overlays = [{"frame_id": i, "timestamp": i * 0.04, "objects": []} for i in range(3)]
+    path.write_text(json.dumps({"overlays": overlays, "zones": []}), encoding="utf-8")
+    return str(path)
+
+
+def test_ensure_regenerates_only_requested_format(tmp_path):
+    path = _analysis(tmp_path)
+    paths = overlay_store.ensure_compressed_overlays(path, "delta")
+
+    assert overlay_store.pick_compressed_overlays(path, "delta", "gzip") == (paths["delta.gz"], "gzip")
+    assert (tmp_path / "video.overlays.delta.gz").exists()
+    assert not (tmp_path / "video.overlays.json.gz").exists()
+
+
+def test_pick_falls_back_when_artifacts_cannot_be_written(tmp_path, monkeypatch):
+    path = _analysis(tmp_path)
+
+    def fail(*args, **kwargs):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(overlay_store, "_write_atomic", fail)
+    assert overlay_store.pick_compressed_overlays(path, "json", "gzip, br") == (None, "identity")
+    body = json.loads(overlay_store.overlay_body(path, "json"))
+    assert [f["frame_id"] for f in body["data"]["overlays"]] == [0, 1, 2]
+
+
+def test_read_window_uses_index(tmp_path):
+    path = _analysis(tmp_path)
+    window = overlay_store.read_overlay_window(path, 0.04, 0.08)
+    assert [f["frame_id"] for f in window["overlays"]] == [1]
+    assert window["next_timestamp"] == 0.08
+
+
+def test_read_window_rejects_index_from_another_build(tmp_path):
+    path = _analysis(tmp_path)
+    paths = overlay_store.ensure_overlay_index(path)
+    old_index = (tmp_path / "video.overlays.idx").read_bytes()
+
+    # 重建时 NDJSON 已替换、索引尚未替换：帧内容变长，旧偏移会落在行中间
+    frames = [{"frame_id": i, "timestamp": i * 0.04, "objects": [{"id": f"track-{i}"}]} for i in range(3)]
+    overlay_store.write_overlay_index(path, header={}, overlays=frames)
+    (tmp_path / "video.overlays.idx").write_bytes(old_index)
+
+    # 不配套的索引不会被使用：按分析结果重建后再读取
+    window = overlay_store.read_overlay_window(path, 0.04, 0.12)
+    assert [f["frame_id"] for f in window["overlays"]] == [1, 2]
+    with open(paths["index"], "rb") as idx:
+        assert overlay_store._index_matches(idx, (tmp_path / "video.overlays.ndjson").stat())
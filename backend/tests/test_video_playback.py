@@ -0,0 +1,163 @@
+"""faststart_mp4（moov 移到文件头并修正分块偏移）的测试：输出解码后的帧与源文件逐帧一致"""
+
+import struct
+
+import cv2
+import numpy as np
+import pytest
+
+from app.services.video_playback import faststart_mp4
+
+_CONTAINERS = {b"moov", b"trak", b"mdia", b"minf", b"stbl"}
+
+
+def _make_mp4(path, frames=24, size=(96, 64)):
+    rng = np.random.default_rng(7)
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), 12, size)
+    assert writer.isOpened()
+    for _ in range(frames):
+        writer.write(rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8))
+    writer.release()
+
+
+def _decode(path):
+    cap = cv2.VideoCapture(str(path))
+    frames = []
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def _atoms(buf, start=0, end=None):
+    """(类型, 起点, 长度)；测试文件较小，只处理 32 位长度"""
+    end = len(buf) if end is None else end
+    atoms = []
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", buf, pos)
+        atoms.append((kind, pos, size))
+        pos += size
+    return atoms
+
+
+def _rewrite_moov(buf, start, end, offset_fn, to_co64=False):
+    """重建 moov 内的 atom：分块偏移逐个经 offset_fn 变换，to_co64 时 stco 改写为 co64"""
+    out = b""
+    for kind, pos, size in _atoms(buf, start, end):
+        payload = buf[pos + 8 : pos + size]
+        if kind in _CONTAINERS:
+            payload = _rewrite_moov(buf, pos + 8, pos + size, offset_fn, to_co64)
+        elif kind in (b"stco", b"co64"):
+            width = 4 if kind == b"stco" else 8
+            version_flags, count = struct.unpack_from(">II", payload)
+            offsets = [offset_fn(v) for v in struct.unpack_from(f">{count}{'I' if width == 4 else 'Q'}", payload, 8)]
+            if to_co64:
+                kind, width = b"co64", 8
+            payload = struct.pack(">II", version_flags, count) + struct.pack(
+                f">{count}{'I' if width == 4 else 'Q'}", *offsets
+            )
+        out += struct.pack(">I4s", 8 + len(payload), kind) + payload
+    return out
+
+
+def _moov_and_offsets(buf):
+    atoms = {kind: (pos, size) for kind, pos, size in _atoms(buf)}
+    moov_pos, moov_size = atoms[b"moov"]
+    offsets = []
+    _rewrite_moov(buf, moov_pos + 8, moov_pos + moov_size, lambda v: offsets.append(v) or v)
+    return atoms, offsets
+
+
+def _kinds(path):
+    return [kind for kind, _, _ in _atoms(open(path, "rb").read())]
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "source.mp4"
+    _make_mp4(path)
+    # OpenCV 写出的 MP4 moov 在 mdat 之后
+    kinds = _kinds(path)
+    assert kinds.index(b"moov") > kinds.index(b"mdat")
+    return path
+
+
+def _assert_faststart(src, tmp_path, expected_frames):
+    dst = tmp_path / "faststart.mp4"
+    assert faststart_mp4(str(src), str(dst)) is True
+    kinds = _kinds(dst)
+    assert kinds.index(b"moov") < kinds.index(b"mdat")
+
+    frames = _decode(dst)
+    assert len(frames) == len(expected_frames)
+    for want, got in zip(expected_frames, frames):
+        assert np.array_equal(want, got)
+
+    # 已是 fast-start：不再写出
+    assert faststart_mp4(str(dst), str(tmp_path / "again.mp4")) is False
+    assert not (tmp_path / "again.mp4").exists()
+
+
+def test_faststart_keeps_frames(source, tmp_path):
+    _assert_faststart(source, tmp_path, _decode(source))
+
+
+def test_faststart_co64(source, tmp_path):
+    buf = open(source, "rb").read()
+    atoms, _ = _moov_and_offsets(buf)
+    moov_pos, moov_size = atoms[b"moov"]
+    # moov 在末尾，改写其长度不影响媒体数据的偏移
+    body = b"moov" + _rewrite_moov(buf, moov_pos + 8, moov_pos + moov_size, lambda v: v, to_co64=True)
+    co64 = tmp_path / "co64.mp4"
+    co64.write_bytes(buf[:moov_pos] + struct.pack(">I", 4 + len(body)) + body + buf[moov_pos + moov_size :])
+    assert b"co64" in co64.read_bytes() and b"stco" not in co64.read_bytes()
+
+    expected = _decode(source)
+    assert len(_decode(co64)) == len(expected)
+    _assert_faststart(co64, tmp_path, expected)
+
+
+def test_faststart_moov_between_mdats(tmp_path):
+    """ftyp ... mdat moov mdat：moov 之后的媒体数据在移动 moov 后位置不变，偏移不能再加"""
+    # OpenCV（libavformat）约每 1 MB 一个分块：生成多于一个分块的文件，才能在分块边界处拆分 mdat
+    source = tmp_path / "source.mp4"
+    _make_mp4(source, frames=60, size=(320, 240))
+    buf = open(source, "rb").read()
+    atoms, offsets = _moov_and_offsets(buf)
+    mdat_pos, mdat_size = atoms[b"mdat"]
+    moov_pos, moov_size = atoms[b"moov"]
+    assert mdat_pos + mdat_size == moov_pos and len(offsets) > 1
+
+    # 在中间的分块处把 mdat 一分为二，moov 插在两段之间
+    split = sorted(offsets)[len(offsets) // 2]
+    payload_start = mdat_pos + 8
+    first, second = buf[payload_start:split], buf[split:moov_pos]
+    shift = moov_size + 8
+    moov = b"moov" + _rewrite_moov(
+        buf, moov_pos + 8, moov_pos + moov_size, lambda v: v + shift if v >= split else v
+    )
+    layout = tmp_path / "split.mp4"
+    layout.write_bytes(
+        buf[:mdat_pos]
+        + struct.pack(">I4s", 8 + len(first), b"mdat") + first
+        + struct.pack(">I", 4 + len(moov)) + moov
+        + struct.pack(">I4s", 8 + len(second), b"mdat") + second
+        + buf[moov_pos + moov_size :]
+    )
+    assert _kinds(layout)[-3:] == [b"mdat", b"moov", b"mdat"]
+
+    expected = _decode(source)
+    decoded = _decode(layout)
+    assert len(decoded) == len(expected) and all(np.array_equal(a, b) for a, b in zip(expected, decoded))
+    _assert_faststart(layout, tmp_path, expected)
+
+
+def test_rejects_incomplete_file(tmp_path):
+    path = tmp_path / "broken.mp4"
+    path.write_bytes(struct.pack(">I4s", 16, b"ftyp") + b"isom\0\0\0\0")
+    with pytest.raises(ValueError):
+        faststart_mp4(str(path), str(tmp_path / "out.mp4"))
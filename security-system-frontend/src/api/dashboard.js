@@ -1,9 +1,13 @@
 import http from './http'
 
-export const getDashboardEvents = (limit = 20) => http.get('/dashboard/events', { params: { limit } })
+export const getDashboardEvents = (limit = 20, sourceId) => http.get('/dashboard/events', { params: { limit, sourceId } })
 
 export const getDashboardOverlays = (sourceId) => http.get('/dashboard/overlays', { params: { sourceId } })
 
+// 按 [start, end) 时间窗口拉取 overlays（秒）；format=delta 时返回增量编码（见 utils/overlayCodec.js）
+export const getDashboardOverlayWindow = (sourceId, start, end, format = 'delta') =>
+  http.get('/dashboard/overlays/window', { params: { sourceId, start, end, format } })
+
 export const getDashboardZones = (sourceId) => http.get('/zones', { params: { sourceId } })
 
 export const getAlarmsBySourceId = (sourceId, page = 1, pageSize = 1000) =>
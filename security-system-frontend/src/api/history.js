@@ -4,6 +4,27 @@ export const getAlarms = (params) => http.get('/alarms', { params })
 
 export const getAlarmDetail = (id) => http.get(`/alarms/${id}`)
 
+// params: startDate / endDate / videoId / level / bucket(hour|day)
+export const getAlarmStats = (params) => http.get('/alarms/stats', { params })
+
 export const getUnreadAlarmCount = () => http.get('/alarms/unread/count')
 
 export const markAllAlarmsRead = () => http.post('/alarms/mark-all-read')
+
+export const markAlarmRead = (id) => http.post(`/alarms/${id}/read`)
+
+export const ackAlarm = (id) => http.post(`/alarms/${id}/ack`)
+
+// 按过滤条件（同 getAlarms 的 query/level/startDate/endDate/videoId）批量操作
+export const markAlarmsRead = (params) => http.post('/alarms/read', null, { params })
+
+export const ackAlarms = (params) => http.post('/alarms/ack', null, { params })
+
+// 流式导出（浏览器直接下载，不经 axios 缓冲整个文件）
+export const alarmExportUrl = (params = {}) => {
+  const qs = new URLSearchParams()
+  for (const [k, v] of Object.entries(params)) {
+    if (v !== undefined && v !== null && v !== '') qs.append(k, v)
+  }
+  return `/api/alarms/export?${qs.toString()}`
+}
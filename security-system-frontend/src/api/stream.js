@@ -0,0 +1,21 @@
+// 服务端推送（SSE）：按主题订阅 /api/stream/events，返回取消订阅函数
+// handlers: { 'alarm.unread': (msg) => {}, ... }，msg 结构 { id, topic, ts, data, videoId? }
+export const subscribeEvents = (handlers, { videoId, onOpen } = {}) => {
+  const params = new URLSearchParams({ topics: Object.keys(handlers).join(',') })
+  if (videoId) params.set('videoId', videoId)
+
+  const es = new EventSource(`/api/stream/events?${params}`)
+  for (const [topic, fn] of Object.entries(handlers)) {
+    es.addEventListener(topic, (e) => {
+      try {
+        fn(JSON.parse(e.data))
+      } catch (err) {
+        console.warn('[stream] bad message:', err)
+      }
+    })
+  }
+  // 首次连接及断线重连后回调：可在此补拉一次，避免漏掉断线期间的变化
+  if (onOpen) es.addEventListener('open', onOpen)
+
+  return () => es.close()
+}
@@ -12,6 +12,89 @@ export const uploadVideo = (file) => {
   })
 }
 
+// 分片上传：大文件按 chunkSize 切片并行 PUT，断线 / 刷新后按已收到的分片续传，全部到齐后 complete
+const CHUNK_SIZE = 8 * 1024 * 1024
+const CHUNK_CONCURRENCY = 4
+const CHUNK_RETRIES = 3
+
+const resumeKey = (file) => `upload:${file.name}:${file.size}:${file.lastModified}`
+
+const sha256Hex = async (blob) => {
+  // crypto.subtle 仅在安全上下文（https / localhost）可用；不可用时不带校验头，由服务端记录摘要
+  if (!globalThis.crypto?.subtle) return null
+  const digest = await crypto.subtle.digest('SHA-256', await blob.arrayBuffer())
+  return Array.from(new Uint8Array(digest), (b) => b.toString(16).padStart(2, '0')).join('')
+}
+
+const openUploadSession = async (file) => {
+  const saved = localStorage.getItem(resumeKey(file))
+  if (saved) {
+    try {
+      return await http.get(`/videos/uploads/${saved}`)
+    } catch {
+      localStorage.removeItem(resumeKey(file))
+    }
+  }
+  const session = await http.post('/videos/uploads', { fileName: file.name, size: file.size, chunkSize: CHUNK_SIZE })
+  localStorage.setItem(resumeKey(file), session.uploadId)
+  return session
+}
+
+const putChunk = async (session, file, index) => {
+  const offset = index * session.chunkSize
+  const blob = file.slice(offset, Math.min(offset + session.chunkSize, file.size))
+  const sha = await sha256Hex(blob)
+  for (let attempt = 1; ; attempt += 1) {
+    try {
+      return await http.put(`/videos/uploads/${session.uploadId}/chunks/${offset}`, blob, {
+        headers: { 'Content-Type': 'application/octet-stream', ...(sha ? { 'X-Chunk-Sha256': sha } : {}) },
+        timeout: 0,
+      })
+    } catch (e) {
+      if (attempt >= CHUNK_RETRIES || (e.response && e.response.status < 500)) throw e
+    }
+  }
+}
+
+const uploadWithSession = async (session, file, onProgress) => {
+  if (!session.completed) {
+    const received = new Set(session.receivedChunks)
+    const pending = []
+    for (let i = 0; i < session.chunkCount; i += 1) {
+      if (!received.has(i)) pending.push(i)
+    }
+    let done = received.size
+    onProgress?.(done / session.chunkCount)
+
+    const worker = async () => {
+      while (pending.length) {
+        await putChunk(session, file, pending.shift())
+        done += 1
+        onProgress?.(done / session.chunkCount)
+      }
+    }
+    await Promise.all(Array.from({ length: CHUNK_CONCURRENCY }, worker))
+  }
+
+  return http.post(`/videos/uploads/${session.uploadId}/complete`, null, { timeout: 0 })
+}
+
+export const uploadVideoChunked = async (file, { onProgress } = {}) => {
+  const resumed = Boolean(localStorage.getItem(resumeKey(file)))
+  let row
+  try {
+    row = await uploadWithSession(await openUploadSession(file), file, onProgress)
+  } catch (e) {
+    // 续传的会话已失效（已过期，或已完成但生成的视频被删除）：丢弃记录，重新建会话上传一次
+    const status = e?.response?.status
+    if (!resumed || (status !== 404 && status !== 409)) throw e
+    localStorage.removeItem(resumeKey(file))
+    row = await uploadWithSession(await openUploadSession(file), file, onProgress)
+  }
+  localStorage.removeItem(resumeKey(file))
+  return row
+}
+
 export const setDemoVideo = (id) => http.post(`/videos/${id}/set-demo`)
 
 export const deleteVideo = (id) => http.delete(`/videos/${id}`)
@@ -0,0 +1,33 @@
+// overlays 增量编码（version 1）解码，与后端 app/services/overlay_store.py 的 encode_overlay_delta 对应
+// doc: { version, boxScale, tracks: [id], states: [[class, alarm_level, color, zone_id, zoneName]],
+//        frames: [[frame_id, timestamp, [[trackIdx, dx, dy, dw, dh, stateIdx?], ...]]] }
+export const decodeOverlayDelta = (doc) => {
+  const scale = Number(doc?.boxScale) || 10000
+  const tracks = Array.isArray(doc?.tracks) ? doc.tracks : []
+  const states = Array.isArray(doc?.states) ? doc.states : []
+  const lastBox = new Map()
+  const lastState = new Map()
+
+  const frames = Array.isArray(doc?.frames) ? doc.frames : []
+  return frames.map(([frameId, timestamp, entries]) => {
+    const objects = (entries || []).map((entry) => {
+      const ti = entry[0]
+      const prev = lastBox.get(ti) || [0, 0, 0, 0]
+      const box = [prev[0] + entry[1], prev[1] + entry[2], prev[2] + entry[3], prev[3] + entry[4]]
+      lastBox.set(ti, box)
+      if (entry.length > 5) lastState.set(ti, entry[5])
+
+      const [cls, alarmLevel, color, zoneId, zoneName] = states[lastState.get(ti)] || []
+      return {
+        id: tracks[ti],
+        class: cls,
+        box_norm: { x: box[0] / scale, y: box[1] / scale, w: box[2] / scale, h: box[3] / scale },
+        alarm_level: alarmLevel,
+        color,
+        zone_id: zoneId,
+        zoneName,
+      }
+    })
+    return { frame_id: frameId, timestamp, objects }
+  })
+}